@@ -1,15 +1,15 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
+import io
+import os
 
-from sklearn.model_selection import train_test_split
-from sklearn.utils import resample
-from sklearn.linear_model import LogisticRegression
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import accuracy_score, confusion_matrix
-from sklearn.preprocessing import StandardScaler
+# matplotlib/seaborn and scikit-learn are imported by the functions that plot
+# and train, so the data preview renders without waiting for them
+
+from explain import build_explainer, logistic_contributions, forest_leaf_contributions, global_importances
+from forest_store import export_forest, load_forest, forest_apply, forest_predict_proba
+from startup import warm_up
 
 # Define the categorical columns and their mapping
 CATEGORICAL_COLS = {
@@ -18,13 +18,26 @@ CATEGORICAL_COLS = {
     'Family History of Disease': {'options': ["No", "Yes"], 'map': {"No": 0, "Yes": 1}}
 }
 
+# EDA rendering settings: histograms are drawn from precomputed bin counts and
+# the KDE curve is estimated on a random sample once a column gets large.
+HIST_BINS = 30
+KDE_SAMPLE_SIZE = 5000
+KDE_GRID_POINTS = 200
+MAX_PLOTTED_OUTLIERS = 1000
+
+DATA_PATH = 'heart_disease_prediction.csv'
+
+# Trained forests are exported here (one sub-directory per model version) and
+# memory-mapped by every app instance on the host
+FOREST_DIR = "rf_forest"
+
 # ---------------------------
 # Helper Functions
 # ---------------------------
 @st.cache_data
-def load_and_preprocess_data():
+def load_and_preprocess_data(path=DATA_PATH):
     # Load dataset
-    df = pd.read_csv('heart_disease_prediction.csv')
+    df = pd.read_csv(path)
     
     # Fill missing numerical values with median
     num_cols = ['Age', 'Blood Pressure', 'Cholesterol Levels', 'Glucose Levels', 'BMI']
@@ -44,8 +57,117 @@ def load_and_preprocess_data():
     
     return df
 
+@st.cache_data
+def load_data_hash():
+    # Stable fingerprint of the preprocessed data, used to key the EDA caches
+    df = load_and_preprocess_data()
+    return str(pd.util.hash_pandas_object(df, index=True).sum())
+
+@st.cache_data
+def compute_column_summary(data_hash, _df, column):
+    """
+    Precomputes everything the feature plots need for one column: box plot
+    statistics, histogram bin counts and a KDE curve scaled to the histogram.
+    Returns None if the column has no values.
+    """
+    values = _df[column].dropna().to_numpy(dtype=float)
+    if not len(values):
+        return None
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    iqr = q3 - q1
+    low_fence, high_fence = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+    inside = values[(values >= low_fence) & (values <= high_fence)]
+    outliers = values[(values < low_fence) | (values > high_fence)]
+
+    rng = np.random.default_rng(42)
+    if len(outliers) > MAX_PLOTTED_OUTLIERS:
+        outliers = rng.choice(outliers, MAX_PLOTTED_OUTLIERS, replace=False)
+
+    counts, edges = np.histogram(values, bins=HIST_BINS)
+
+    # Gaussian KDE (Scott's rule) on a sample, scaled to histogram counts
+    kde_x, kde_y = None, None
+    sample = values
+    if len(sample) > KDE_SAMPLE_SIZE:
+        sample = rng.choice(sample, KDE_SAMPLE_SIZE, replace=False)
+    std = sample.std(ddof=1) if len(sample) > 1 else 0.0
+    if std > 0:
+        bandwidth = std * len(sample) ** (-1 / 5)
+        kde_x = np.linspace(values.min(), values.max(), KDE_GRID_POINTS)
+        z = (kde_x[:, None] - sample[None, :]) / bandwidth
+        density = np.exp(-0.5 * z ** 2).mean(axis=1) / (bandwidth * np.sqrt(2 * np.pi))
+        kde_y = density * len(values) * (edges[1] - edges[0])
+
+    return {
+        'box': {
+            'med': median, 'q1': q1, 'q3': q3,
+            'whislo': inside.min() if len(inside) else q1,
+            'whishi': inside.max() if len(inside) else q3,
+            'fliers': outliers,
+        },
+        'hist_counts': counts,
+        'hist_edges': edges,
+        'kde_x': kde_x,
+        'kde_y': kde_y,
+    }
+
+@st.cache_data
+def compute_correlation(data_hash, _df):
+    return _df.corr()
+
+def figure_to_png(fig):
+    import matplotlib.pyplot as plt
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", bbox_inches="tight")
+    plt.close(fig)
+    return buf.getvalue()
+
+@st.cache_data
+def render_feature_plots(data_hash, _df, column):
+    import matplotlib.pyplot as plt
+
+    summary = compute_column_summary(data_hash, _df, column)
+    if summary is None:
+        return None
+
+    fig, ax = plt.subplots(1, 2, figsize=(12, 4))
+    # Boxplot from precomputed quartiles
+    box = dict(summary['box'], label="")
+    ax[0].bxp([box], orientation="horizontal", widths=0.6, patch_artist=True,
+              boxprops={'facecolor': 'C0'})
+    ax[0].set_yticks([])
+    ax[0].set_xlabel(column)
+    ax[0].set_title(f"Box Plot of {column}")
+
+    # Histogram with KDE from precomputed bin counts
+    edges = summary['hist_edges']
+    ax[1].stairs(summary['hist_counts'], edges, fill=True, alpha=0.6)
+    if summary['kde_x'] is not None:
+        ax[1].plot(summary['kde_x'], summary['kde_y'])
+    ax[1].set_xlabel(column)
+    ax[1].set_ylabel("Count")
+    ax[1].set_title(f"Histogram of {column}")
+    return figure_to_png(fig)
+
+@st.cache_data
+def render_correlation_heatmap(data_hash, _df):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    sns.heatmap(compute_correlation(data_hash, _df), annot=True, cmap="coolwarm", fmt=".2f", ax=ax)
+    return figure_to_png(fig)
+
 @st.cache_resource
 def train_models(df):
+    from sklearn.model_selection import train_test_split
+    from sklearn.utils import resample
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.metrics import accuracy_score, confusion_matrix
+    from sklearn.preprocessing import StandardScaler
+
     # Separate features and target
     X = df.drop(columns=['Target Variable'])
     y = df['Target Variable']
@@ -99,108 +221,142 @@ def train_models(df):
         'rf_conf_matrix': rf_conf_matrix,
         'features': X_resampled.columns
     }
+    # Explanations are precomputed once per trained model version
+    models['version'] = str(pd.util.hash_pandas_object(df, index=True).sum())
+    models['explainer'] = build_explainer(models, models['version'])
+    # Serve the forest from the compact export instead of the scikit-learn object graph
+    models['forest_path'] = export_forest(models.pop('rf'), os.path.join(FOREST_DIR, models['version']))
     return models
 
+@st.cache_resource
+def load_compact_forest(forest_path):
+    return load_forest(forest_path, mmap=True)
+
+@st.cache_data
+def explain_prediction(model_version, _models, model_name, user_scaled):
+    """
+    Returns per-feature contributions for one scaled input row, cached per
+    model version and input.
+    """
+    explainer = _models['explainer']
+    if model_name == 'logistic':
+        bias, contributions = logistic_contributions(explainer, user_scaled)
+    else:
+        forest = load_compact_forest(_models['forest_path'])
+        bias, contributions = forest_leaf_contributions(explainer, forest_apply(forest, user_scaled))
+    return bias, pd.Series(contributions[0], index=explainer['features'])
+
+def show_explanation(models, model_name, user_scaled, unit):
+    bias, contributions = explain_prediction(models['version'], models, model_name, user_scaled)
+    st.subheader("Why this prediction?")
+    st.write(f"Feature contributions ({unit}, baseline {bias:.3f}); positive values raise the risk.")
+    st.bar_chart(contributions.sort_values())
+    with st.expander("Global feature importances"):
+        importances = pd.Series(global_importances(models['explainer'], model_name))
+        st.bar_chart(importances.sort_values())
+
 # ---------------------------
 # Main App
 # ---------------------------
-st.title("Heart Disease Prediction App")
+def main():
+    st.title("Heart Disease Prediction App")
+    warm_up("matplotlib.pyplot", "seaborn", "sklearn.ensemble", "sklearn.linear_model", "sklearn.model_selection")
 
-# Sidebar for navigation
-page = st.sidebar.selectbox("Navigation", ["Exploratory Data Analysis", "Logistic Regression Prediction", "Random Forest Prediction"])
+    # Sidebar for navigation
+    page = st.sidebar.selectbox("Navigation", ["Exploratory Data Analysis", "Logistic Regression Prediction", "Random Forest Prediction"])
 
-# Load and preprocess data
-df = load_and_preprocess_data()
-st.write("### Data Preview")
-st.dataframe(df.head())
+    # Load and preprocess data
+    df = load_and_preprocess_data()
+    data_hash = load_data_hash()
+    st.write("### Data Preview")
+    st.dataframe(df.head())
 
-if page == "Exploratory Data Analysis":
-    st.header("Exploratory Data Analysis")
-    
-    st.subheader("Feature Visualizations")
-    plot_choice = st.selectbox("Select a feature to visualize", df.columns)
-    
-    fig, ax = plt.subplots(1, 2, figsize=(12, 4))
-    # Boxplot
-    sns.boxplot(x=df[plot_choice], ax=ax[0])
-    ax[0].set_title(f"Box Plot of {plot_choice}")
-    
-    # Histogram with KDE
-    sns.histplot(df[plot_choice], bins=30, kde=True, ax=ax[1])
-    ax[1].set_title(f"Histogram of {plot_choice}")
-    
-    st.pyplot(fig)
-    
-    st.subheader("Correlation Matrix")
-    fig2, ax2 = plt.subplots(figsize=(10, 6))
-    sns.heatmap(df.corr(), annot=True, cmap="coolwarm", fmt=".2f", ax=ax2)
-    st.pyplot(fig2)
-    
-elif page == "Logistic Regression Prediction":
-    st.header("Logistic Regression Prediction")
-    
-    # Train models if not already trained
-    models = train_models(df)
-    scaler = models['scaler']
-    log_model = models['logistic']
-    
-    st.subheader("Model Performance")
-    st.write(f"**Accuracy:** {models['log_accuracy'] * 100:.2f}%")
-    st.write("**Confusion Matrix:**")
-    st.write(models['log_conf_matrix'])
-    
-    st.subheader("Enter Patient Data")
-    input_data = {}
-    # For each feature, present a selectbox for categorical features or a number_input for numeric features.
-    for feature in models['features']:
-        if feature in CATEGORICAL_COLS:
-            # Use selectbox for categorical input
-            option = st.selectbox(f"{feature}", options=CATEGORICAL_COLS[feature]['options'])
-            # Map the option to numeric
-            input_data[feature] = CATEGORICAL_COLS[feature]['map'][option]
-        else:
-            input_data[feature] = st.number_input(f"{feature}", value=float(50))
-    
-    user_df = pd.DataFrame([input_data])
-    user_scaled = scaler.transform(user_df)
-    
-    if st.button("Predict with Logistic Regression"):
-        prediction = log_model.predict(user_scaled)[0]
-        prediction_proba = log_model.predict_proba(user_scaled)[0]
-        if prediction == 1:
-            st.error(f"High Risk of Heart Disease! (Probability: {prediction_proba[1] * 100:.2f}%)")
-        else:
-            st.success(f"Low Risk of Heart Disease (Probability: {prediction_proba[0] * 100:.2f}%)")
-    
-elif page == "Random Forest Prediction":
-    st.header("Random Forest Prediction")
-    
-    # Train models if not already trained
-    models = train_models(df)
-    scaler = models['scaler']
-    rf_model = models['rf']
-    
-    st.subheader("Model Performance")
-    st.write(f"**Accuracy:** {models['rf_accuracy'] * 100:.2f}%")
-    st.write("**Confusion Matrix:**")
-    st.write(models['rf_conf_matrix'])
-    
-    st.subheader("Enter Patient Data")
-    input_data = {}
-    for feature in models['features']:
-        if feature in CATEGORICAL_COLS:
-            option = st.selectbox(f"{feature}", options=CATEGORICAL_COLS[feature]['options'])
-            input_data[feature] = CATEGORICAL_COLS[feature]['map'][option]
-        else:
-            input_data[feature] = st.number_input(f"{feature}", value=float(50))
-    
-    user_df = pd.DataFrame([input_data])
-    user_scaled = scaler.transform(user_df)
-    
-    if st.button("Predict with Random Forest"):
-        prediction = rf_model.predict(user_scaled)[0]
-        prediction_proba = rf_model.predict_proba(user_scaled)[0]
-        if prediction == 1:
-            st.error(f"High Risk of Heart Disease! (Probability: {prediction_proba[1] * 100:.2f}%)")
+    if page == "Exploratory Data Analysis":
+        st.header("Exploratory Data Analysis")
+
+        st.subheader("Feature Visualizations")
+        plot_choice = st.selectbox("Select a feature to visualize", df.columns)
+
+        # Plots are rendered once per (data, column) and served from the cache
+        plots = render_feature_plots(data_hash, df, plot_choice)
+        if plots is None:
+            st.warning(f"{plot_choice} has no values to plot.")
         else:
-            st.success(f"Low Risk of Heart Disease (Probability: {prediction_proba[0] * 100:.2f}%)")
+            st.image(plots)
+
+        st.subheader("Correlation Matrix")
+        st.image(render_correlation_heatmap(data_hash, df))
+
+    elif page == "Logistic Regression Prediction":
+        st.header("Logistic Regression Prediction")
+
+        # Train models if not already trained
+        models = train_models(df)
+        scaler = models['scaler']
+        log_model = models['logistic']
+
+        st.subheader("Model Performance")
+        st.write(f"**Accuracy:** {models['log_accuracy'] * 100:.2f}%")
+        st.write("**Confusion Matrix:**")
+        st.write(models['log_conf_matrix'])
+
+        st.subheader("Enter Patient Data")
+        input_data = {}
+        # For each feature, present a selectbox for categorical features or a number_input for numeric features.
+        for feature in models['features']:
+            if feature in CATEGORICAL_COLS:
+                # Use selectbox for categorical input
+                option = st.selectbox(f"{feature}", options=CATEGORICAL_COLS[feature]['options'])
+                # Map the option to numeric
+                input_data[feature] = CATEGORICAL_COLS[feature]['map'][option]
+            else:
+                input_data[feature] = st.number_input(f"{feature}", value=float(50))
+
+        user_df = pd.DataFrame([input_data])
+        user_scaled = scaler.transform(user_df)
+
+        if st.button("Predict with Logistic Regression"):
+            prediction = log_model.predict(user_scaled)[0]
+            prediction_proba = log_model.predict_proba(user_scaled)[0]
+            if prediction == 1:
+                st.error(f"High Risk of Heart Disease! (Probability: {prediction_proba[1] * 100:.2f}%)")
+            else:
+                st.success(f"Low Risk of Heart Disease (Probability: {prediction_proba[0] * 100:.2f}%)")
+            show_explanation(models, 'logistic', user_scaled, "log-odds")
+
+    elif page == "Random Forest Prediction":
+        st.header("Random Forest Prediction")
+
+        # Train models if not already trained
+        models = train_models(df)
+        scaler = models['scaler']
+        forest = load_compact_forest(models['forest_path'])
+
+        st.subheader("Model Performance")
+        st.write(f"**Accuracy:** {models['rf_accuracy'] * 100:.2f}%")
+        st.write("**Confusion Matrix:**")
+        st.write(models['rf_conf_matrix'])
+
+        st.subheader("Enter Patient Data")
+        input_data = {}
+        for feature in models['features']:
+            if feature in CATEGORICAL_COLS:
+                option = st.selectbox(f"{feature}", options=CATEGORICAL_COLS[feature]['options'])
+                input_data[feature] = CATEGORICAL_COLS[feature]['map'][option]
+            else:
+                input_data[feature] = st.number_input(f"{feature}", value=float(50))
+
+        user_df = pd.DataFrame([input_data])
+        user_scaled = scaler.transform(user_df)
+
+        if st.button("Predict with Random Forest"):
+            prediction_proba = forest_predict_proba(forest, user_scaled)[0]
+            prediction = forest['classes'][prediction_proba.argmax()]
+            if prediction == 1:
+                st.error(f"High Risk of Heart Disease! (Probability: {prediction_proba[1] * 100:.2f}%)")
+            else:
+                st.success(f"Low Risk of Heart Disease (Probability: {prediction_proba[0] * 100:.2f}%)")
+            show_explanation(models, 'rf', user_scaled, "probability")
+
+if __name__ == "__main__":
+    main()
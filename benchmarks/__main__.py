@@ -0,0 +1,200 @@
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Run against the app modules next to this package, whatever the working directory
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(REPO_DIR, "benchmarks", "baseline.json")
+
+# A benchmark regresses when its p50 or p95 is more than `tolerance` slower
+# than the baseline and also slower by at least this many seconds, so that
+# scheduling noise on fast benchmarks is not reported
+MIN_REGRESSION_SECONDS = 0.02
+
+COMPARED_STATS = ("p50", "p95")
+
+def isolate_state(directory):
+    """
+    Points every on-disk store at a scratch directory and makes it the
+    working directory, so runs start cold and leave the checkout untouched.
+    Must run before the app modules are imported.
+    """
+    os.environ.update({
+        "CONTENT_STORE_PATH": os.path.join(directory, "content_store.sqlite3"),
+        "JOB_DB_PATH": os.path.join(directory, "jobs.sqlite3"),
+        "IMAGE_CACHE_DIR": os.path.join(directory, "image_cache"),
+        "QUESTION_BANK_PATH": os.path.join(directory, "question_bank.sqlite3"),
+        "QUIZ_ANALYTICS_DIR": os.path.join(directory, "quiz_analytics"),
+        "METRICS_LOG_PATH": "",
+        "GOOGLE_API_KEY": "benchmark",
+    })
+    os.chdir(directory)
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0, REPO_DIR)
+
+def summarize(durations, items):
+    durations = np.asarray(durations)
+    p50, p95, p99 = np.percentile(durations, [50, 95, 99])
+    return {
+        "iterations": len(durations),
+        "mean": float(durations.mean()),
+        "p50": float(p50),
+        "p95": float(p95),
+        "p99": float(p99),
+        "ops_per_second": float(len(durations) / durations.sum()),
+        "items_per_second": float(len(durations) * items / durations.sum()),
+    }
+
+def run_benchmark(name, config, stub):
+    from benchmarks.suite import BENCHMARKS
+
+    unit, setup = BENCHMARKS[name]
+    # The apps import optional dependencies when first used, so a missing
+    # one can surface in setup or in the first (warm-up) run
+    try:
+        run, items = setup(config)
+        for i in range(config.warmup):
+            run(-1 - i)
+        stub.reset_counts()
+        durations = []
+        for i in range(config.iterations):
+            start = time.perf_counter()
+            run(i)
+            durations.append(time.perf_counter() - start)
+    except ImportError as e:
+        return {"skipped": f"cannot import {e.name or e}"}
+    result = summarize(durations, items)
+    result.update({
+        "unit": unit,
+        "items": items,
+        "llm_calls_per_iteration": stub.requests / config.iterations,
+        "max_llm_calls_in_flight": stub.max_in_flight,
+    })
+    return result
+
+def config_key(config):
+    return {
+        "scale": config.scale, "latency": config.latency, "jitter": config.jitter,
+        "error_rate": config.error_rate, "iterations": config.iterations,
+    }
+
+def compare(results, baseline, tolerance):
+    """
+    Returns {name: {stat: change}} for benchmarks in both runs, where change
+    is the relative slowdown, and the names that regressed.
+    """
+    changes, regressions = {}, []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if "skipped" in result or not base or "skipped" in base:
+            continue
+        changes[name] = {}
+        for stat in COMPARED_STATS:
+            changes[name][stat] = result[stat] / base[stat] - 1 if base[stat] else 0.0
+            if changes[name][stat] > tolerance and result[stat] - base[stat] > MIN_REGRESSION_SECONDS:
+                regressions.append(name)
+        changes[name]["throughput"] = result["items_per_second"] / base["items_per_second"] - 1
+    return changes, sorted(set(regressions))
+
+def print_report(results, changes):
+    header = (
+        f"{'benchmark':<40} {'items/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+        f"{'calls':>6} {'vs baseline':>22}"
+    )
+    print(header)
+    print("-" * len(header))
+    for name, result in results.items():
+        if "skipped" in result:
+            print(f"{name:<40} skipped: {result['skipped']}")
+            continue
+        change = changes.get(name)
+        delta = f"p50 {change['p50']:+.0%} p95 {change['p95']:+.0%}" if change else "no baseline"
+        print(
+            f"{name:<40} {result['items_per_second']:>10.1f} {result['p50'] * 1000:>9.1f} "
+            f"{result['p95'] * 1000:>9.1f} {result['p99'] * 1000:>9.1f} "
+            f"{result['llm_calls_per_iteration']:>6.1f} {delta:>22}"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the app's entry points against a local stub of the Gemini API"
+    )
+    parser.add_argument("patterns", nargs="*", default=["*"], help="Benchmark names or glob patterns")
+    parser.add_argument("--list", action="store_true", help="List the benchmarks and exit")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier for input sizes")
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub seconds per model call")
+    parser.add_argument("--jitter", type=float, default=0.01, help="Extra random stub seconds per call")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of stub calls that fail with 503")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the stub's latency and errors")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Record it on the machine you compare on")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before failing")
+    parser.add_argument("--output", help="Also write the results as JSON to this file")
+    config = parser.parse_args()
+    baseline_path = os.path.abspath(config.baseline)
+    output_path = config.output and os.path.abspath(config.output)
+
+    from benchmarks.suite import BENCHMARKS
+    if config.list:
+        print("\n".join(BENCHMARKS))
+        return 0
+    names = [name for name in BENCHMARKS if any(fnmatch.fnmatch(name, p) for p in config.patterns)]
+    if not names:
+        parser.error(f"no benchmark matches {config.patterns}")
+
+    isolate_state(tempfile.mkdtemp(prefix="benchmarks-"))
+    # Cached functions called outside `streamlit run` warn on every call
+    from streamlit import logger as streamlit_logger
+    streamlit_logger.set_log_level("error")
+    from benchmarks.stub_server import StubServer
+
+    results = {}
+    with StubServer(config.latency, config.jitter, config.error_rate, seed=config.seed) as stub:
+        config.endpoint = stub.endpoint
+        for name in names:
+            print(f"Running {name}...", file=sys.stderr)
+            results[name] = run_benchmark(name, config, stub)
+
+    stored = {}
+    if os.path.exists(baseline_path):
+        with open(baseline_path, encoding="utf-8") as f:
+            stored = json.load(f)
+    comparable = stored.get("config") == config_key(config)
+    if stored and not comparable:
+        print(f"Baseline was recorded with {stored.get('config')}; not comparing", file=sys.stderr)
+    changes, regressions = compare(results, stored.get("results", {}) if comparable else {}, config.tolerance)
+    print_report(results, changes)
+
+    run_record = {
+        "config": config_key(config),
+        "environment": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "results": results,
+    }
+    if comparable and stored.get("environment") != run_record["environment"]:
+        print(f"Baseline was recorded on {stored.get('environment')}; timings may differ", file=sys.stderr)
+    if output_path:
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(run_record, f, indent=2)
+    if config.save_baseline:
+        # Benchmarks skipped here keep their stored results
+        measured = {name: result for name, result in results.items() if "skipped" not in result}
+        run_record["results"] = {**stored["results"], **measured} if comparable else measured
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(run_record, f, indent=2, sort_keys=True)
+        print(f"Saved baseline to {baseline_path}", file=sys.stderr)
+    elif regressions:
+        print(f"Regressed by more than {config.tolerance:.0%}: {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+import io
+import random
+
+import numpy as np
+import pandas as pd
+from fpdf import FPDF
+
+# Synthetic inputs of scalable size. Everything is generated from a seed, so
+# the same scale and seed always give the same documents.
+
+VOCABULARY = (
+    "the a of and to in is that for with as on by this from are be an which it "
+    "learning model data neural network training gradient loss function layer "
+    "python variable class object method database query index table cache server "
+    "patient heart pressure cholesterol glucose risk treatment clinical study result "
+    "project team experience engineer developer design system analysis report skill"
+).split()
+
+JOB_DESCRIPTION = (
+    "We are hiring a data engineer with experience in Python, SQL and cloud data "
+    "pipelines. The role involves designing ETL jobs, maintaining the data "
+    "warehouse and working with analysts on reporting."
+)
+
+def make_text(words, seed=0):
+    """
+    `words` words of sentence-like text.
+    """
+    rng = random.Random(seed)
+    sentences, count = [], 0
+    while count < words:
+        length = min(rng.randint(8, 20), words - count)
+        sentence = " ".join(rng.choice(VOCABULARY) for _ in range(length))
+        sentences.append(sentence.capitalize() + ".")
+        count += length
+    return " ".join(sentences)
+
+def make_transcript(chars, seed=0):
+    """
+    A spoken-style transcript of about `chars` characters, as joined from
+    caption snippets.
+    """
+    return make_text(chars // 5 + 1, seed)[:chars]
+
+def make_pdf(pages, seed=0, name="document.pdf", words_per_page=450):
+    """
+    A text PDF of `pages` pages as a file-like object with a `name`, like a
+    Streamlit upload.
+    """
+    pdf = FPDF()
+    pdf.set_font("Arial", size=11)
+    for page in range(pages):
+        pdf.add_page()
+        pdf.multi_cell(0, 6, make_text(words_per_page, seed * 100003 + page))
+    output = pdf.output(dest="S")
+    if isinstance(output, str):
+        output = output.encode("latin-1")
+    file_obj = io.BytesIO(bytes(output))
+    file_obj.name = name
+    return file_obj
+
+def make_patients(rows, seed=0):
+    """
+    Patient records in the preprocessed schema of app.load_and_preprocess_data,
+    with a target that depends on the features (so the models have something
+    to learn) and roughly a third of patients at risk.
+    """
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "Age": rng.integers(25, 85, rows),
+        "Gender": rng.integers(0, 2, rows),
+        "Blood Pressure": rng.normal(135, 20, rows).round(),
+        "Cholesterol Levels": rng.normal(230, 40, rows).round(),
+        "Glucose Levels": rng.normal(120, 30, rows).round(),
+        "BMI": rng.normal(28, 5, rows).round(1),
+        "Smoking/Alcohol Consumption Status": rng.integers(0, 2, rows),
+        "Family History of Disease": rng.integers(0, 2, rows),
+    })
+    score = (
+        0.04 * (df["Age"] - 55) + 0.03 * (df["Blood Pressure"] - 135) + 0.01 * (df["Cholesterol Levels"] - 230)
+        + 0.8 * df["Smoking/Alcohol Consumption Status"] + 0.6 * df["Family History of Disease"] - 1.0
+    )
+    df["Target Variable"] = (rng.random(rows) < 1 / (1 + np.exp(-score))).astype(int)
+    return df
+
+def make_patient_csv(path, rows, seed=0):
+    """
+    Writes patients in the raw CSV format of heart_disease_prediction.csv
+    (text categories, a few missing values) for load_and_preprocess_data.
+    """
+    df = make_patients(rows, seed)
+    rng = np.random.default_rng(seed + 1)
+    df["Gender"] = df["Gender"].map({0: "Female", 1: "Male"})
+    for column in ("Smoking/Alcohol Consumption Status", "Family History of Disease"):
+        df[column] = df[column].map({0: "No", 1: "Yes"})
+    for column in ("Blood Pressure", "Cholesterol Levels", "BMI"):
+        df.loc[rng.random(rows) < 0.02, column] = np.nan
+    df.to_csv(path, index=False)
+    return path
@@ -0,0 +1,149 @@
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+EMBEDDING_DIMENSIONS = 768
+
+# Rough characters per token, for the usage metadata of stub responses
+CHARS_PER_TOKEN = 4
+
+VOCABULARY = (
+    "model data training result analysis method system feature performance value "
+    "process example concept approach structure pattern learning network layer "
+    "function output input error accuracy summary section topic detail"
+).split()
+
+def _seed(text):
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+def embed(text):
+    """
+    A deterministic unit vector for the text, so retrieval over stub
+    embeddings is reproducible.
+    """
+    vector = np.random.default_rng(_seed(text)).standard_normal(EMBEDDING_DIMENSIONS)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+def reply_for(prompt, words=120):
+    """
+    A deterministic reply for the prompt: a bare rating when one is asked
+    for, otherwise `words` words of bullet points.
+    """
+    rng = random.Random(_seed(prompt))
+    if re.search(r"numerical rating|scale of 1 to 10", prompt, re.IGNORECASE):
+        return str(rng.randint(1, 10))
+    lines = []
+    while sum(len(line.split()) for line in lines) < words:
+        lines.append("- " + " ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(6, 14))).capitalize() + ".")
+    return "\n".join(lines)
+
+def _text(content):
+    return "".join(part.get("text", "") for part in content.get("parts", []))
+
+class StubServer:
+    """
+    Local stand-in for the Gemini REST API (generateContent,
+    streamGenerateContent, embedContent and batchEmbedContents) with
+    configurable latency. Each request waits `latency` seconds plus up to
+    `jitter` more; a fraction `error_rate` of generate calls fail with 503 so
+    the retry path is exercised. Use as a context manager and point the SDK
+    at `endpoint` with llm.configure(transport="rest", api_endpoint=...).
+    """
+
+    def __init__(self, latency=0.05, jitter=0.0, error_rate=0.0, reply_words=120, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.reply_words = reply_words
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.server = None
+
+    @property
+    def endpoint(self):
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                method = self.path.split("?")[0].rsplit(":", 1)[-1]
+                status, payload = stub.handle(method, body)
+                data = json.dumps(payload).encode("utf-8")
+                if method == "streamGenerateContent" and status == 200:
+                    data = b"[" + data + b"]"
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="llm-stub", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def reset_counts(self):
+        with self.lock:
+            self.requests = 0
+            self.max_in_flight = self.in_flight
+
+    def handle(self, method, body):
+        with self.lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            fail = self.random.random() < self.error_rate
+        try:
+            time.sleep(delay)
+            if method in ("generateContent", "streamGenerateContent"):
+                if fail:
+                    return 503, {"error": {"code": 503, "message": "Stub overloaded", "status": "UNAVAILABLE"}}
+                prompt = "".join(_text(content) for content in body.get("contents", []))
+                text = reply_for(prompt, self.reply_words)
+                return 200, {
+                    "candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": "STOP"}],
+                    "usageMetadata": {
+                        "promptTokenCount": max(1, len(prompt) // CHARS_PER_TOKEN),
+                        "candidatesTokenCount": max(1, len(text) // CHARS_PER_TOKEN),
+                    },
+                }
+            if method == "embedContent":
+                return 200, {"embedding": {"values": embed(_text(body.get("content", {})))}}
+            if method == "batchEmbedContents":
+                return 200, {
+                    "embeddings": [{"values": embed(_text(request.get("content", {})))} for request in body.get("requests", [])]
+                }
+            return 404, {"error": {"code": 404, "message": f"Unknown method {method}", "status": "NOT_FOUND"}}
+        finally:
+            with self.lock:
+                self.in_flight -= 1
@@ -0,0 +1,139 @@
+import importlib
+import io
+
+from benchmarks.data import (
+    JOB_DESCRIPTION, make_patient_csv, make_patients, make_pdf, make_text, make_transcript,
+)
+
+# name -> (unit, setup). setup(config) imports what it drives, prepares its
+# inputs and returns (run, items): run(i) performs iteration i and `items` is
+# how many units one iteration processes, for the throughput figure.
+BENCHMARKS = {}
+
+def benchmark(name, unit):
+    def register(setup):
+        BENCHMARKS[name] = (unit, setup)
+        return setup
+    return register
+
+def scaled(n, config):
+    return max(1, round(n * config.scale))
+
+def load(module_name, config):
+    """
+    Imports an app module and routes model calls to the stub server.
+    """
+    module = importlib.import_module(module_name)
+    import llm
+    llm.configure(api_key="benchmark", transport="rest", api_endpoint=config.endpoint)
+    return module
+
+def upload(data, name):
+    file_obj = io.BytesIO(data)
+    file_obj.name = name
+    return file_obj
+
+# -------------------- CHAT WITH PDF --------------------
+@benchmark("chatpdf.get_pdf_text", "pages")
+def pdf_text_extraction(config):
+    chatpdf = load("chatpdf", config)
+    pages = scaled(20, config)
+    data = make_pdf(pages).getvalue()
+    return (lambda i: chatpdf.get_pdf_text([upload(data, "document.pdf")])), pages
+
+@benchmark("chatpdf.get_text_chunks", "chunks")
+def text_chunking(config):
+    chatpdf = load("chatpdf", config)
+    text = make_text(scaled(50000, config))
+    return (lambda i: chatpdf.get_text_chunks(text)), len(chatpdf.get_text_chunks(text))
+
+@benchmark("chatpdf.user_input", "questions")
+def pdf_question(config):
+    chatpdf = load("chatpdf", config)
+    path = chatpdf.get_vector_store(chatpdf.get_text_chunks(make_text(scaled(50000, config))))
+    return (lambda i: chatpdf.user_input(f"What does section {i} say about the training data?", path)), 1
+
+# -------------------- VIDEO SUMMARY --------------------
+@benchmark("demo.generate_summary", "transcripts")
+def video_summary(config):
+    demo = load("demo", config)
+    transcript = make_transcript(scaled(demo.MAX_TRANSCRIPT_LENGTH, config))
+    return (lambda i: demo.generate_summary(transcript)), 1
+
+# -------------------- RESUME RANKING --------------------
+@benchmark("resume.rank_resumes_with_genai", "resumes")
+def resume_ranking(config):
+    resume = load("resume", config)
+    # spaCy is loaded on first use; load it here so that a missing package or
+    # model (which get_nlp cannot download offline) skips the benchmark
+    try:
+        resume.get_nlp()
+    except OSError as e:
+        raise ImportError(str(e), name="en_core_web_sm") from e
+    resumes = [make_pdf(2, seed=k).getvalue() for k in range(scaled(10, config))]
+
+    def run(i):
+        files = [upload(data, f"resume_{k}.pdf") for k, data in enumerate(resumes)]
+        ranking, unrated = resume.rank_resumes_with_genai(JOB_DESCRIPTION, files)
+        assert not unrated, f"Unparsed ratings: {unrated}"
+    return run, len(resumes)
+
+# -------------------- HEART DISEASE MODELS --------------------
+@benchmark("app.load_and_preprocess_data", "rows")
+def patient_loading(config):
+    app = load("app", config)
+    rows = scaled(20000, config)
+    path = make_patient_csv("patients.csv", rows)
+
+    def run(i):
+        app.load_and_preprocess_data.clear()
+        app.load_and_preprocess_data(path)
+    return run, rows
+
+@benchmark("app.train_models", "rows")
+def model_training(config):
+    app = load("app", config)
+    rows = scaled(2000, config)
+    df = make_patients(rows)
+
+    def run(i):
+        app.train_models.clear()
+        app.train_models(df)
+    return run, rows
+
+# -------------------- PDF BUILDERS --------------------
+# Each iteration renders new content, so the PDF cache is never hit
+
+@benchmark("pathGenerator.generate_pdf", "documents")
+def learning_path_pdf(config):
+    path_generator = load("pathGenerator", config)
+    text = make_text(scaled(1500, config))
+    return (lambda i: path_generator.generate_pdf(f"{text}\n\nRevision {i}", "Machine Learning")), 1
+
+@benchmark("notes.generate_pdf", "documents")
+def notes_pdf(config):
+    notes = load("notes", config)
+    text = make_text(scaled(3000, config))
+    return (lambda i: notes.generate_pdf(f"{text}\n\nRevision {i}")), 1
+
+@benchmark("falshcard.generate_pdf_from_flashcards", "documents")
+def flashcards_pdf(config):
+    falshcard = load("falshcard", config)
+    cards = "\n\n".join(
+        f"Q{k + 1}: {make_text(15, seed=2 * k)}\nA: {make_text(30, seed=2 * k + 1)}"
+        for k in range(scaled(30, config))
+    )
+    return (lambda i: falshcard.generate_pdf_from_flashcards(f"{cards}\n\nRevision {i}")), 1
+
+@benchmark("demo.generate_pdf", "documents")
+def video_summary_pdf(config):
+    demo = load("demo", config)
+    text = make_text(scaled(600, config))
+    # No video id in the URL, so no thumbnail is fetched
+    return (lambda i: demo.generate_pdf(f"{text}\n\nRevision {i}", "")), 1
+
+@benchmark("summerizer.generate_pdf", "documents")
+def key_points_pdf(config):
+    summerizer = load("summerizer", config)
+    text = make_text(scaled(600, config))
+    return (lambda i: summerizer.generate_pdf(f"{text}\n\nRevision {i}")), 1
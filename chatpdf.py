@@ -1,18 +1,18 @@
 import streamlit as st
 from dotenv import load_dotenv
-import os
-import google.generativeai as genai
 from PyPDF2 import PdfReader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain.vectorstores import FAISS
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.chains.question_answering import load_qa_chain
-from langchain.prompts import PromptTemplate
+
+import llm
+from faiss_store import build_index, load_index
+from metrics import trace
+from prompt_budget import fit_contexts
+from startup import warm_up
 
 # Load environment variables
 load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+
+# LangChain and FAISS take seconds to import, so they are imported by the
+# functions that use them (and faiss_store), after the page has rendered
 
 # Function to extract text from PDFs
 def get_pdf_text(pdf_docs):
@@ -25,17 +25,26 @@ def get_pdf_text(pdf_docs):
 
 # Function to split text into chunks
 def get_text_chunks(text):
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
     text_splitter = RecursiveCharacterTextSplitter(chunk_size=10000, chunk_overlap=1000)
     return text_splitter.split_text(text)
 
-# Function to create vector embeddings
+# Function to create vector embeddings; returns the index's path
 def get_vector_store(text_chunks):
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-    vector_store = FAISS.from_texts(text_chunks, embedding=embeddings)
-    vector_store.save_local("faiss_index")
+    with trace("chatpdf", "faiss_build", "embedding-001") as span:
+        path = build_index(text_chunks)
+        span.set_usage(prompt="".join(text_chunks))
+    return path
 
-# Function to create the conversational chain
+# Function to create the conversational chain (one per process, so its chat
+# model client is reused across questions and sessions)
+@st.cache_resource
 def get_conversational_chain():
+    from langchain.chains.question_answering import load_qa_chain
+    from langchain.prompts import PromptTemplate
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
     prompt_template = """
     Answer the question as detailed as possible from the provided context.
     If the answer is not in the context, respond with: 'Answer is not available in the context.'\n\n
@@ -45,19 +54,30 @@ def get_conversational_chain():
     """
     
     # Use the correct model
-    model = ChatGoogleGenerativeAI(model="gemini-1.5-pro", temperature=0.3)
+    model = ChatGoogleGenerativeAI(model="gemini-1.5-pro", temperature=0.3, **llm.client_settings())
     prompt = PromptTemplate(template=prompt_template, input_variables=["context", "question"])
     
     return load_qa_chain(model, chain_type="stuff", prompt=prompt)
 
 # Function to answer user questions
-def user_input(user_question):
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-    new_db = FAISS.load_local("faiss_index", embeddings, allow_dangerous_deserialization=True)
-    docs = new_db.similarity_search(user_question)
+def user_input(user_question, index_path):
+    # Held in memory between questions; read from disk only when not held
+    with trace("chatpdf", "faiss_load"):
+        new_db = load_index(index_path)
+    # Includes embedding the question
+    with trace("chatpdf", "faiss_search", "embedding-001"):
+        docs = new_db.similarity_search(user_question)
+    # The retrieved chunks share one token budget; each keeps the sentences
+    # closest to the question
+    for doc, content in zip(docs, fit_contexts([doc.page_content for doc in docs], "chatpdf", query=user_question)):
+        doc.page_content = content
 
     chain = get_conversational_chain()
-    response = chain({"input_documents": docs, "question": user_question}, return_only_outputs=True)
+    with trace("chatpdf", "answer", "gemini-1.5-pro") as span:
+        response = chain({"input_documents": docs, "question": user_question}, return_only_outputs=True)
+        span.set_usage(
+            prompt=user_question + "".join(doc.page_content for doc in docs), text=response["output_text"]
+        )
 
     return response["output_text"]
 
@@ -65,6 +85,8 @@ def user_input(user_question):
 def main():
     st.set_page_config(page_title="Chat with PDF")
     st.title("Chat with PDF  💬📄")
+    warm_up("langchain.text_splitter", "langchain.vectorstores", "langchain_google_genai",
+            "langchain.chains.question_answering")
 
     with st.sidebar:
         st.header("Upload PDF Files")
@@ -74,13 +96,17 @@ def main():
                 with st.spinner("Processing..."):
                     raw_text = get_pdf_text(pdf_docs)
                     text_chunks = get_text_chunks(raw_text)
-                    get_vector_store(text_chunks)
+                    # Each session asks questions of the PDFs it processed
+                    st.session_state["pdf_index"] = get_vector_store(text_chunks)
                     st.success("Processing completed! Now, you can ask questions.")
 
     user_question = st.text_input("Ask a question from the PDF:")
     if user_question:
-        response = user_input(user_question)
-        st.write("**Answer:**", response)
+        if "pdf_index" not in st.session_state:
+            st.warning("Upload and process your PDFs first.")
+        else:
+            response = user_input(user_question, st.session_state["pdf_index"])
+            st.write("**Answer:**", response)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,152 @@
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+from metrics import record_cache
+
+# Shared by every server process on the host (override with CONTENT_STORE_PATH)
+STORE_PATH = os.getenv("CONTENT_STORE_PATH", "content_store.sqlite3")
+
+# How often a worker waiting on another process's generation re-checks the store
+LEASE_POLL_INTERVAL = 0.25
+
+_local = threading.local()
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+# -------------------- SQLITE STORE --------------------
+def _connect():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(STORE_PATH, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS content (key TEXT PRIMARY KEY, value TEXT, updated_at REAL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT, expires_at REAL)"
+        )
+        _local.conn = conn
+    return conn
+
+def get_content(key):
+    """
+    Returns (value, updated_at) for a key, or None if it was never stored.
+    """
+    row = _connect().execute("SELECT value, updated_at FROM content WHERE key = ?", (key,)).fetchone()
+    return (row[0], row[1]) if row else None
+
+def put_content(key, value):
+    updated_at = time.time()
+    _connect().execute(
+        "INSERT OR REPLACE INTO content (key, value, updated_at) VALUES (?, ?, ?)",
+        (key, value, updated_at),
+    )
+    return updated_at
+
+def _owner():
+    # Evaluated per call so forked workers do not inherit their parent's
+    # identity; the thread is included so threads of one process exclude
+    # each other too
+    return f"{os.getpid()}:{threading.get_ident()}"
+
+def acquire_lease(key, ttl):
+    """
+    Claims the right to regenerate `key` across all processes and threads
+    for `ttl` seconds. Returns False while another holds an unexpired lease.
+    """
+    conn = _connect()
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute("SELECT owner, expires_at FROM leases WHERE key = ?", (key,)).fetchone()
+        if row and row[0] != _owner() and row[1] > now:
+            return False
+        conn.execute(
+            "INSERT OR REPLACE INTO leases (key, owner, expires_at) VALUES (?, ?, ?)",
+            (key, _owner(), now + ttl),
+        )
+        return True
+    finally:
+        conn.execute("COMMIT")
+
+def release_lease(key):
+    _connect().execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, _owner()))
+
+# -------------------- REQUEST COALESCING --------------------
+def single_flight(key, fn):
+    """
+    Runs fn() once for concurrent callers with the same key in this process;
+    every caller gets the leader's result (or exception).
+    """
+    with _in_flight_lock:
+        future = _in_flight.get(key)
+        leader = future is None
+        if leader:
+            future = Future()
+            _in_flight[key] = future
+    if not leader:
+        return future.result()
+    try:
+        result = fn()
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _in_flight_lock:
+            _in_flight.pop(key, None)
+
+def fetch_shared(key, fn, max_age, lease_ttl=120, is_valid=None):
+    """
+    Returns (value, updated_at) for `key`, calling fn() only when the shared copy
+    is missing or older than `max_age` seconds. Concurrent callers in a process
+    share one call, and across processes only the lease holder calls fn().
+    While another process holds the lease, callers get the stale copy at once;
+    only when nothing is stored, or when max_age is 0 (a forced refresh), do
+    they wait for the holder's result. Values rejected by `is_valid` are
+    returned but not stored; a waiter then takes over the lease and calls
+    fn() itself.
+    """
+    def load():
+        entry = get_content(key)
+        fresh = entry is not None and time.time() - entry[1] <= max_age
+        record_cache(f"content_store:{key.split(':')[0]}", fresh)
+        if fresh:
+            return entry
+        if not acquire_lease(key, lease_ttl):
+            if entry is not None and max_age > 0:
+                # The lease holder is refreshing it
+                return entry
+            stale_at = entry[1] if entry else None
+            deadline = time.time() + lease_ttl
+            while time.time() < deadline:
+                time.sleep(LEASE_POLL_INTERVAL)
+                entry = get_content(key)
+                if entry is not None and entry[1] != stale_at:
+                    return entry
+                if acquire_lease(key, lease_ttl):
+                    # The holder is gone without storing a value (it was
+                    # rejected by is_valid, or the holder failed): take over,
+                    # unless a value landed in the meantime
+                    entry = get_content(key)
+                    if entry is not None and entry[1] != stale_at:
+                        release_lease(key)
+                        return entry
+                    break
+            else:
+                if entry is not None:
+                    return entry
+        try:
+            value = fn()
+            if is_valid is not None and not is_valid(value):
+                return value, time.time()
+            return value, put_content(key, value)
+        finally:
+            release_lease(key)
+
+    # A forced refresh must not join a call that may serve the stored copy
+    return single_flight(f"{key}:{max_age}", load)
@@ -1,28 +1,53 @@
 import os
 import streamlit as st
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 
-# Attempt to import Google Generative AI (Palm) library
-try:
-    import google.generativeai as palm
-except ImportError:
-    palm = None
+import llm
+from content_store import fetch_shared
+from metrics import record_event, trace
+from startup import warm_up
 
 # ------------------- Configuration -------------------
-# Set your Google Gen AI API key securely; replace "YOUR_API_KEY_HERE" or set the env variable.
-API_KEY = os.getenv("GOOGLE_GEN_AI_API_KEY", "YOUR_API_KEY_HERE")
-if palm is not None:
-    try:
-        palm.configure(api_key=API_KEY)
-    except Exception as e:
-        st.error(f"Error configuring Google Gen AI: {e}")
+# Set GOOGLE_GEN_AI_API_KEY to use a separate key for the dashboard. The SDK
+# has one configuration per process, so when the tools share a process (see
+# launcher.py) that key applies to every tool; unset, the SDK reads
+# GOOGLE_API_KEY like the other tools.
+API_KEY = os.getenv("GOOGLE_GEN_AI_API_KEY")
+
+_palm = None
+_palm_loaded = False
+_palm_lock = threading.Lock()
 
-st.set_page_config(page_title="AI & Tech Dashboard", layout="wide")
+def get_palm():
+    """
+    The Google Generative AI (Palm) library, imported and configured on first
+    use rather than at page load. None if it is not installed.
+    """
+    global _palm, _palm_loaded
+    with _palm_lock:
+        if not _palm_loaded:
+            try:
+                import google.generativeai as palm
+                if API_KEY:
+                    try:
+                        # Keeps the transport and endpoint the other tools use
+                        palm.configure(api_key=API_KEY, **llm.client_settings())
+                    except Exception as e:
+                        record_event("dashboard", "configure_failed", error=str(e))
+                _palm = palm
+            except ImportError:
+                _palm = None
+            _palm_loaded = True
+    return _palm
 
 # ------------------- Helper Functions -------------------
 def refresh_page():
     """Refresh the page if supported; otherwise, prompt the user to manually refresh."""
-    if hasattr(st, "experimental_rerun"):
+    if hasattr(st, "rerun"):
+        st.rerun()
+    elif hasattr(st, "experimental_rerun"):
         st.experimental_rerun()
     else:
         st.warning("Refresh not supported in this version of Streamlit. Please reload your browser page to update content.")
@@ -36,13 +61,16 @@ def fetch_latest_news():
         "Provide a concise and updated summary of the latest news in the AI and tech industry. "
         "Include headlines on AI breakthroughs, newly launched AI tools, and major tech news, each with brief details."
     )
+    palm = get_palm()
     if palm is not None and hasattr(palm, "generate_text"):
         try:
-            response = palm.generate_text(
-                prompt=prompt,
-                temperature=0.7,
-                max_output_tokens=300,
-            )
+            with trace("dashboard", "news", "palm") as span:
+                response = palm.generate_text(
+                    prompt=prompt,
+                    temperature=0.7,
+                    max_output_tokens=300,
+                )
+                span.set_usage(prompt=prompt, text=getattr(response, "result", None))
             if response and hasattr(response, 'result') and response.result:
                 return response.result.strip()
             else:
@@ -66,13 +94,16 @@ def fetch_tech_stack_usage():
         "Provide a detailed, bullet-point summary of the most popular tech stacks currently used in the industry. "
         "Include trends on programming languages, frameworks, and cloud platforms with available statistics."
     )
+    palm = get_palm()
     if palm is not None and hasattr(palm, "generate_text"):
         try:
-            response = palm.generate_text(
-                prompt=prompt,
-                temperature=0.7,
-                max_output_tokens=300,
-            )
+            with trace("dashboard", "tech_stack", "palm") as span:
+                response = palm.generate_text(
+                    prompt=prompt,
+                    temperature=0.7,
+                    max_output_tokens=300,
+                )
+                span.set_usage(prompt=prompt, text=getattr(response, "result", None))
             if response and hasattr(response, 'result') and response.result:
                 return response.result.strip()
             else:
@@ -96,13 +127,16 @@ def fetch_industry_trends():
         "Provide an analysis of the latest industry trends in technology, including emerging technologies, market dynamics, "
         "and predictions for future innovations."
     )
+    palm = get_palm()
     if palm is not None and hasattr(palm, "generate_text"):
         try:
-            response = palm.generate_text(
-                prompt=prompt,
-                temperature=0.7,
-                max_output_tokens=300,
-            )
+            with trace("dashboard", "trends", "palm") as span:
+                response = palm.generate_text(
+                    prompt=prompt,
+                    temperature=0.7,
+                    max_output_tokens=300,
+                )
+                span.set_usage(prompt=prompt, text=getattr(response, "result", None))
             if response and hasattr(response, 'result') and response.result:
                 return response.result.strip()
             else:
@@ -118,59 +152,175 @@ def fetch_industry_trends():
             "- Cybersecurity and data privacy remain critical priorities."
         )
 
-# ------------------- Sidebar Navigation -------------------
-st.sidebar.title("Navigation")
-page = st.sidebar.radio("Select Section", [
-    "Dashboard Overview", "Latest News", "Tech Stack Dashboard", "Industry Trends"
-])
+# ------------------- Background Refresh -------------------
+# Sections are regenerated in the background on this schedule; page views are
+# served from the stored copy and trigger a refresh once it is older than this.
+REFRESH_INTERVAL = 15 * 60  # seconds
+
+SECTION_FETCHERS = {
+    "news": fetch_latest_news,
+    "tech_stack": fetch_tech_stack_usage,
+    "trends": fetch_industry_trends,
+}
 
-# ------------------- Dashboard Header -------------------
-st.title("AI & Tech Dashboard")
-st.markdown(
+def _store_section(store, section, content, updated_at, force):
+    with store["lock"]:
+        previous = store["sections"].get(section)
+        # Keep serving the last good copy if a refresh fails, and the newer
+        # copy if a forced refresh finished first
+        if previous is not None and (content.startswith("Error") or updated_at < previous["updated_at"]):
+            previous["checked_at"] = time.time()
+        else:
+            store["sections"][section] = {"content": content, "updated_at": updated_at, "checked_at": time.time()}
+        # A forced refresh started while this one ran is still in flight
+        if store["in_flight"].get(section, (None, force))[1] == force:
+            store["in_flight"].pop(section, None)
+
+def fetch_section(section, force=False):
     """
-Stay updated with the latest news in AI and technology and view dynamic insights on industry trends and tech stacks.  
-Content is generated and updated dynamically via Google Generative AI.
+    Fetches a section through the cross-process content store, so all server
+    workers share one generation per REFRESH_INTERVAL (or per forced refresh).
     """
-)
-
-# ------------------- Page Content -------------------
-if page == "Dashboard Overview":
-    st.header("Dashboard Overview")
-    st.markdown(
-        "Welcome to the AI & Tech Dashboard. Use the sidebar to navigate between sections. "
-        "Press the refresh buttons to update content when new information arrives."
+    return fetch_shared(
+        f"dashboard:{section}",
+        SECTION_FETCHERS[section],
+        max_age=0 if force else REFRESH_INTERVAL,
+        is_valid=lambda content: not content.startswith("Error"),
     )
-    if st.button("Refresh Dashboard"):
-        refresh_page()
-
-elif page == "Latest News":
-    st.header("Latest News")
-    with st.spinner("Fetching the latest news..."):
-        news_content = fetch_latest_news()
-    st.markdown(news_content)
-    if st.button("Refresh News"):
-        refresh_page()
-
-elif page == "Tech Stack Dashboard":
-    st.header("Tech Stack Dashboard")
-    st.markdown(
-        "Below is an analysis of the most popular tech stacks currently used in the industry, "
-        "including trends on programming languages, frameworks, and cloud platforms."
-    )
-    with st.spinner("Fetching tech stack insights..."):
-        tech_stack_info = fetch_tech_stack_usage()
-    st.markdown(tech_stack_info)
-    if st.button("Refresh Tech Stack Data"):
-        refresh_page()
-
-elif page == "Industry Trends":
-    st.header("Industry Trends")
+
+def _refresh_section(store, section, force):
+    """
+    Fetches a section and stores it before the refresh's future completes,
+    so a caller waiting on the future always finds the section stored.
+    """
+    try:
+        content, updated_at = fetch_section(section, force)
+    except Exception as e:
+        content, updated_at = f"Error: {e}", time.time()
+    _store_section(store, section, content, updated_at, force)
+
+def refresh_sections(store, sections=None, force=False):
+    """
+    Starts refreshing the given sections (all by default) concurrently.
+    A section that is already being refreshed is not fetched twice, except
+    that a forced refresh does not join one that may serve the stored copy.
+    Returns the futures of the in-flight refreshes.
+    """
+    futures = []
+    with store["lock"]:
+        for section in sections or SECTION_FETCHERS:
+            # section -> (future, force) of its in-flight refresh
+            in_flight = store["in_flight"].get(section)
+            if in_flight is None or (force and not in_flight[1]):
+                # The task stores its result under the lock, so it cannot
+                # clear in_flight before the future has been registered
+                in_flight = (store["executor"].submit(_refresh_section, store, section, force), force)
+                store["in_flight"][section] = in_flight
+            futures.append(in_flight[0])
+    return futures
+
+def _refresh_loop(store):
+    while True:
+        wait(refresh_sections(store))
+        time.sleep(REFRESH_INTERVAL)
+
+@st.cache_resource
+def get_section_store():
+    """
+    Process-wide store shared by every session, kept warm by a background thread.
+    """
+    store = {
+        "sections": {},
+        "in_flight": {},
+        "lock": threading.Lock(),
+        # Room for a forced refresh of every section beside a scheduled one
+        "executor": ThreadPoolExecutor(max_workers=2 * len(SECTION_FETCHERS)),
+    }
+    threading.Thread(target=_refresh_loop, args=(store,), daemon=True).start()
+    return store
+
+def get_section(section):
+    """
+    Returns (content, updated_at) for a section (stale-while-revalidate).
+    Only blocks when the section has never been generated.
+    """
+    store = get_section_store()
+    with store["lock"]:
+        entry = store["sections"].get(section)
+    if entry is None:
+        wait(refresh_sections(store, [section]))
+        with store["lock"]:
+            entry = store["sections"][section]
+    elif time.time() - entry["checked_at"] > REFRESH_INTERVAL:
+        refresh_sections(store, [section])
+    return entry["content"], entry["updated_at"]
+
+def show_section(section, spinner_text):
+    with st.spinner(spinner_text):
+        content, updated_at = get_section(section)
+    st.markdown(content)
+    st.caption(f"Last updated: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(updated_at))}")
+
+def refresh_and_rerun(sections=None):
+    with st.spinner("Refreshing content..."):
+        wait(refresh_sections(get_section_store(), sections, force=True))
+    refresh_page()
+
+# ------------------- Page -------------------
+def main():
+    st.set_page_config(page_title="AI & Tech Dashboard", layout="wide")
+    warm_up(get_palm)
+
+    # Sidebar navigation
+    st.sidebar.title("Navigation")
+    page = st.sidebar.radio("Select Section", [
+        "Dashboard Overview", "Latest News", "Tech Stack Dashboard", "Industry Trends"
+    ])
+
+    # Dashboard header
+    st.title("AI & Tech Dashboard")
     st.markdown(
-        "Get insights on the latest trends in the technology industry, including emerging technologies, market dynamics, "
-        "and predictions for future innovations."
+        """
+Stay updated with the latest news in AI and technology and view dynamic insights on industry trends and tech stacks.  
+Content is generated and updated dynamically via Google Generative AI.
+        """
     )
-    with st.spinner("Fetching industry trends..."):
-        trends_info = fetch_industry_trends()
-    st.markdown(trends_info)
-    if st.button("Refresh Industry Trends"):
-        refresh_page()
+
+    # Page content
+    if page == "Dashboard Overview":
+        st.header("Dashboard Overview")
+        st.markdown(
+            "Welcome to the AI & Tech Dashboard. Use the sidebar to navigate between sections. "
+            "Press the refresh buttons to update content when new information arrives."
+        )
+        if st.button("Refresh Dashboard"):
+            refresh_and_rerun()
+
+    elif page == "Latest News":
+        st.header("Latest News")
+        show_section("news", "Fetching the latest news...")
+        if st.button("Refresh News"):
+            refresh_and_rerun(["news"])
+
+    elif page == "Tech Stack Dashboard":
+        st.header("Tech Stack Dashboard")
+        st.markdown(
+            "Below is an analysis of the most popular tech stacks currently used in the industry, "
+            "including trends on programming languages, frameworks, and cloud platforms."
+        )
+        show_section("tech_stack", "Fetching tech stack insights...")
+        if st.button("Refresh Tech Stack Data"):
+            refresh_and_rerun(["tech_stack"])
+
+    elif page == "Industry Trends":
+        st.header("Industry Trends")
+        st.markdown(
+            "Get insights on the latest trends in the technology industry, including emerging technologies, market dynamics, "
+            "and predictions for future innovations."
+        )
+        show_section("trends", "Fetching industry trends...")
+        if st.button("Refresh Industry Trends"):
+            refresh_and_rerun(["trends"])
+
+if __name__ == "__main__":
+    main()
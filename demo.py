@@ -1,17 +1,17 @@
 import streamlit as st
-import os
-import google.generativeai as genai
-from youtube_transcript_api import YouTubeTranscriptApi
-from fpdf import FPDF
-import requests
 from dotenv import load_dotenv
-import tempfile
 import re
-from langdetect import detect
 
-# Load environment variables and configure API key
+import llm
+from image_cache import get_image
+from pdf_renderer import render_pdf, add_title, get_font_family, pdf_text
+from prompt_budget import fit_context
+from job_queue import report_progress
+from job_ui import submit_tracked_job, wait_for_job
+from startup import warm_up
+
+# Load environment variables (the model client reads GOOGLE_API_KEY)
 load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 
 # Language mapping
 LANG_MAP = {
@@ -19,21 +19,6 @@ LANG_MAP = {
     'hi': 'Hindi'
 }
 
-# Ensure NotoSans font file exists
-def ensure_font_file():
-    font_path = "NotoSans-Regular.ttf"
-    if not os.path.exists(font_path):
-        try:
-            font_url = "https://raw.githubusercontent.com/codertimo/FPDF/master/font/NotoSans-Regular.ttf"
-            response = requests.get(font_url)
-            response.raise_for_status()
-            with open(font_path, "wb") as f:
-                f.write(response.content)
-            st.info("Downloaded NotoSans-Regular.ttf successfully.")
-        except Exception as e:
-            st.error(f"Failed to download NotoSans-Regular.ttf: {e}")
-    return font_path
-
 # Extract YouTube video ID from URL
 def extract_video_id(youtube_url):
     regex = r"(?:v=|\/|youtu\.be\/|embed\/|shorts\/)([0-9A-Za-z_-]{11})"
@@ -42,6 +27,8 @@ def extract_video_id(youtube_url):
 
 # Extract transcript from YouTube video
 def extract_transcript(youtube_url):
+    from youtube_transcript_api import YouTubeTranscriptApi
+
     try:
         video_id = extract_video_id(youtube_url)
         if not video_id:
@@ -53,47 +40,64 @@ def extract_transcript(youtube_url):
         return f"Error: {str(e)}"
 
 # Constants to control token usage
-MAX_TRANSCRIPT_LENGTH = 5000  # Process only first 5000 characters of transcript
+MAX_TRANSCRIPT_LENGTH = 5000  # Longer transcripts are answered from a summary
 MAX_CHUNK_SIZE = 1500         # Process in chunks of 1500 characters
 
 # Generate summary with optimized token usage
 def generate_summary(transcript_text):
-    # Truncate transcript to maximum allowed length
-    if len(transcript_text) > MAX_TRANSCRIPT_LENGTH:
-        transcript_text = transcript_text[:MAX_TRANSCRIPT_LENGTH] + "..."
+    # Long transcripts are cut to the passages that best represent the whole
+    # video (within the "video_summary" token budget) rather than to its start
+    transcript_text = fit_context(transcript_text, "video_summary")
     
     try:
+        from langdetect import detect
         detected_lang = detect(transcript_text)
     except Exception:
         detected_lang = 'en'
     language_name = LANG_MAP.get(detected_lang, detected_lang)
     
-    model = genai.GenerativeModel("gemini-1.5-pro")
+    model = llm.get_model("gemini-1.5-pro")
     
     # Agar transcript lamba hai to chhote chunks mein baantein
     if len(transcript_text) > MAX_CHUNK_SIZE:
         chunks = [transcript_text[i:i+MAX_CHUNK_SIZE] for i in range(0, len(transcript_text), MAX_CHUNK_SIZE)]
-        partial_summaries = []
-        for chunk in chunks:
-            prompt = (
-                f"Summarize the following transcript in bullet points in English (max 150 words):\n\n{chunk}"
+        # Parts are summarized concurrently, then combined in transcript order
+        partial_summaries = [None] * len(chunks)
+        summaries = llm.iter_completed(
+            llm.generate(
+                f"Summarize the following transcript in bullet points in English (max 150 words):\n\n{chunk}",
+                tool="video_summary", operation="summarize_part",
             )
-            response = model.generate_content(prompt)
-            partial_summaries.append(response.text)
+            for chunk in chunks
+        )
+        for done, (i, summary) in enumerate(summaries, 1):
+            if isinstance(summary, Exception):
+                raise summary
+            report_progress(0.3 + 0.6 * done / len(chunks), f"Summarized part {done} of {len(chunks)}")
+            partial_summaries[i] = summary
         combined_summary = "\n".join(partial_summaries)
         final_prompt = (
             "Combine the following summaries into a concise overall summary in bullet points in English (max 250 words):\n\n"
             f"{combined_summary}"
         )
-        final_response = model.generate_content(final_prompt)
+        final_response = llm.generate_content(model, final_prompt, tool="video_summary", operation="combine")
         return final_response.text
     else:
         prompt = (
             f"Summarize the following transcript in bullet points in English (max 250 words):\n\n{transcript_text}"
         )
-        response = model.generate_content(prompt)
+        response = llm.generate_content(model, prompt, tool="video_summary", operation="summarize")
         return response.text
 
+# Background job: fetch the transcript and summarize it
+def summarize_video(youtube_url):
+    report_progress(0.1, "Fetching transcript")
+    transcript_text = extract_transcript(youtube_url)
+    if transcript_text.startswith("Error"):
+        return {"error": transcript_text}
+    report_progress(0.3, "Summarizing")
+    return {"transcript_text": transcript_text, "summary": generate_summary(transcript_text)}
+
 # Generate answer for user question with optimized prompt
 def generate_answer(transcript_text, user_question):
     # Agar transcript lamba ho to uska concise summary generate karke use context ke roop mein use karein
@@ -108,56 +112,44 @@ def generate_answer(transcript_text, user_question):
         f"Question: {user_question}\n\n"
         "Answer:"
     )
-    model = genai.GenerativeModel("gemini-1.5-pro")
-    response = model.generate_content(prompt)
+    model = llm.get_model("gemini-1.5-pro")
+    response = llm.generate_content(model, prompt, tool="video_summary", operation="answer")
     return response.text
 
-# Generate PDF of the summary
+# Generate PDF of the summary (returned as bytes)
 def generate_pdf(content, youtube_url):
-    pdf = FPDF()
-    pdf.set_auto_page_break(auto=True, margin=15)
-    pdf.add_page()
+    def layout(pdf):
+        font_name = get_font_family()
+        add_title(pdf, "YouTube Video Summary")
 
-    # Add custom font
-    font_path = ensure_font_file()
-    try:
-        pdf.add_font("NotoSans", "", font_path, uni=True)
-        font_name = "NotoSans"
-    except Exception:
-        font_name = "Arial"
-
-    pdf.set_font(font_name, style='B', size=16)
-    pdf.cell(200, 10, txt="YouTube Video Summary", ln=True, align='C')
-    pdf.ln(10)
-
-    video_id = extract_video_id(youtube_url)
-    if video_id:
-        image_url = f"http://img.youtube.com/vi/{video_id}/0.jpg"
-        try:
-            response = requests.get(image_url, stream=True, timeout=10)
-            response.raise_for_status()
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as temp_image:
-                temp_image.write(response.content)
-                temp_image_path = temp_image.name
-            pdf.image(temp_image_path, x=15, y=30, w=180, h=100)
-            os.remove(temp_image_path)
-        except Exception:
-            pdf.set_font(font_name, size=12)
-            pdf.ln(20)
-            pdf.cell(200, 10, txt="Error fetching video thumbnail.", ln=True, align='C')
-
-    pdf.set_y(140)
-    pdf.set_font(font_name, size=12)
-    pdf.multi_cell(0, 10, content)
-
-    pdf_output_path = "youtube_summary.pdf"
-    pdf.output(pdf_output_path)
-    return pdf_output_path
+        thumbnail_ok = True
+        video_id = extract_video_id(youtube_url)
+        if video_id:
+            image_url = f"http://img.youtube.com/vi/{video_id}/0.jpg"
+            try:
+                thumbnail = get_image(image_url)
+                if thumbnail is None:
+                    raise ValueError("Thumbnail unavailable")
+                pdf.image(thumbnail["path"], x=15, y=30, w=180, h=100)
+            except Exception:
+                thumbnail_ok = False
+                pdf.set_font(font_name, size=12)
+                pdf.ln(20)
+                pdf.cell(200, 10, txt="Error fetching video thumbnail.", ln=True, align='C')
+
+        pdf.set_y(140)
+        pdf.set_font(font_name, size=12)
+        pdf.multi_cell(0, 10, pdf_text(content))
+        # A missing thumbnail may be transient, so that render is not cached
+        return thumbnail_ok
+
+    return render_pdf(layout, content, youtube_url)
 
 # Streamlit UI
 def main():
     st.set_page_config(page_title="YouTube Summarizer")
     st.title("YouTube Video Summarizer 🎥📄")
+    warm_up(llm.SDK_MODULE, "youtube_transcript_api", "langdetect")
 
     youtube_link = st.text_input("Enter YouTube Video Link:")
     if youtube_link:
@@ -171,15 +163,17 @@ def main():
         if not youtube_link:
             st.error("Please enter a YouTube video link.")
         else:
-            with st.spinner("Fetching transcript and summarizing..."):
-                transcript_text = extract_transcript(youtube_link)
-                if transcript_text.startswith("Error"):
-                    st.error(transcript_text)
-                else:
-                    summary = generate_summary(transcript_text)
-                    st.session_state["transcript_text"] = transcript_text
-                    st.session_state["summary"] = summary
-                    st.write(summary)
+            submit_tracked_job("summary_job", "demo:summarize_video", youtube_link)
+
+    # Summaries run in the background job queue and survive reruns and page reloads
+    job = wait_for_job("summary_job", "Fetching transcript and summarizing")
+    if job:
+        if "error" in job["result"]:
+            st.error(job["result"]["error"])
+        else:
+            st.session_state["transcript_text"] = job["result"]["transcript_text"]
+            st.session_state["summary"] = job["result"]["summary"]
+            st.write(job["result"]["summary"])
 
     user_question = st.text_input("Ask a question about the video:")
     if user_question and "transcript_text" in st.session_state:
@@ -188,9 +182,8 @@ def main():
             st.write("**Answer:**", answer)
 
     if st.button("Download Summary as PDF") and "summary" in st.session_state:
-        pdf_file = generate_pdf(st.session_state["summary"], youtube_link)
-        with open(pdf_file, "rb") as file:
-            st.download_button("Download PDF", file, file_name="youtube_summary.pdf")
+        pdf_bytes = generate_pdf(st.session_state["summary"], youtube_link)
+        st.download_button("Download PDF", pdf_bytes, file_name="youtube_summary.pdf", mime="application/pdf")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,139 @@
+import hashlib
+import math
+import re
+from collections import Counter
+
+import numpy as np
+
+CHUNK_CHARS = 1500
+CHUNK_OVERLAP = 200
+
+# Standard Okapi BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "in", "is",
+    "it", "its", "of", "on", "or", "that", "the", "this", "to", "was", "were", "with",
+}
+
+def file_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+def tokenize(text):
+    return [word for word in re.findall(r"[a-z0-9]+", text.lower()) if word not in STOPWORDS and len(word) > 1]
+
+def chunk_text(text, chunk_chars=CHUNK_CHARS, overlap=CHUNK_OVERLAP):
+    """
+    Splits text into chunks of about `chunk_chars`, ending each on a sentence
+    or line boundary where possible and overlapping neighbours slightly so a
+    fact split across a boundary appears whole in one chunk.
+    """
+    text = re.sub(r"[ \t]+", " ", text).strip()
+    chunks, start = [], 0
+    while start < len(text):
+        end = min(start + chunk_chars, len(text))
+        if end < len(text):
+            boundary = max(text.rfind(". ", start, end), text.rfind("\n", start, end))
+            if boundary > start + chunk_chars // 2:
+                end = boundary + 1
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
+class DocumentIndex:
+    """
+    In-memory BM25 index over the chunks of one document. Each term maps to a
+    postings list of (chunk ids, term counts) arrays, so scoring a query is one
+    vectorized update per query term.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.chunk_terms = [Counter(tokenize(chunk)) for chunk in chunks]
+        postings = {}
+        for j, counts in enumerate(self.chunk_terms):
+            for term, count in counts.items():
+                postings.setdefault(term, ([], []))
+                postings[term][0].append(j)
+                postings[term][1].append(count)
+        self.postings = {
+            term: (np.array(ids, dtype=np.int32), np.array(counts, dtype=np.float32))
+            for term, (ids, counts) in postings.items()
+        }
+        lengths = np.array([sum(counts.values()) for counts in self.chunk_terms], dtype=np.float32)
+        self.length_norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(lengths.mean(), 1.0))
+        self.idf = {
+            term: math.log(1 + (len(chunks) - len(ids) + 0.5) / (len(ids) + 0.5))
+            for term, (ids, _) in self.postings.items()
+        }
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def score(self, query):
+        """
+        Returns the BM25 score of every chunk for the query text.
+        """
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            ids, tf = self.postings[term]
+            scores[ids] += self.idf[term] * tf * (BM25_K1 + 1) / (tf + self.length_norm[ids])
+        return scores
+
+    def search(self, query, k=3, exclude=()):
+        """
+        Returns the indices of the k best-scoring chunks with a positive score.
+        """
+        scores = self.score(query)
+        for i in exclude:
+            scores[i] = 0.0
+        best = np.argsort(-scores, kind="stable")[:k]
+        return [int(i) for i in best if scores[i] > 0]
+
+    def key_terms(self, chunk_id, n=8):
+        """
+        The chunk's most distinctive terms (highest tf-idf), used to find
+        related chunks elsewhere in the document.
+        """
+        counts = self.chunk_terms[chunk_id]
+        return sorted(counts, key=lambda term: counts[term] * self.idf[term], reverse=True)[:n]
+
+    def sample_contexts(self, count, focus=None, context_chunks=3, seed=None):
+        """
+        Picks `count` small sets of related chunks to generate questions from.
+        Seeds are the chunks most relevant to `focus` when given, otherwise
+        spread evenly over the document; each seed is joined by the chunks
+        that best match its key terms. Returns lists of chunk indices.
+        """
+        if not self.chunks:
+            return []
+        rng = np.random.default_rng(seed)
+        if focus:
+            seeds = self.search(focus, k=count)
+        else:
+            seeds = []
+        if len(seeds) < count:
+            # Stratified sample: one random chunk from each of `count` equal spans
+            edges = np.linspace(0, len(self.chunks), count + 1)
+            for low, high in zip(edges[:-1], edges[1:]):
+                candidate = int(rng.integers(int(low), max(int(low) + 1, math.ceil(high))))
+                if candidate not in seeds and len(seeds) < count:
+                    seeds.append(candidate)
+        contexts = []
+        for seed_id in seeds:
+            related = self.search(" ".join(self.key_terms(seed_id)), k=context_chunks - 1, exclude=[seed_id])
+            contexts.append(sorted([seed_id] + related))
+        # Very short documents cannot supply one distinct seed per question
+        while contexts and len(contexts) < count:
+            contexts.append(contexts[len(contexts) % len(seeds)])
+        return contexts
+
+def build_index(text):
+    return DocumentIndex(chunk_text(text))
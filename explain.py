@@ -0,0 +1,94 @@
+import numpy as np
+
+# -------------------- EXPLAINER CONSTRUCTION --------------------
+def build_forest_path_contributions(rf_model, positive_class=1):
+    """
+    Precomputes tree-path (Saabas) contributions for every node of every tree.
+    Walking from the root to a node, each split adds the change in the
+    positive-class probability to the feature it split on. Storing the running
+    total per node means a prediction only has to look up the leaves it lands in.
+
+    Returns:
+      - bias (float): Mean root probability across the trees.
+      - node_contributions (ndarray): (total_nodes, n_features) contributions.
+      - node_offsets (ndarray): Index of each tree's root in node_contributions.
+    """
+    class_idx = list(rf_model.classes_).index(positive_class)
+    n_features = rf_model.n_features_in_
+    blocks, offsets, roots = [], [], []
+    offset = 0
+    for estimator in rf_model.estimators_:
+        tree = estimator.tree_
+        values = tree.value[:, 0, :]
+        proba = values[:, class_idx] / values.sum(axis=1)
+        contrib = np.zeros((tree.node_count, n_features))
+        # sklearn numbers nodes depth-first, so a parent is always visited before its children
+        for node in range(tree.node_count):
+            feature = tree.feature[node]
+            for child in (tree.children_left[node], tree.children_right[node]):
+                if child == -1:
+                    continue
+                contrib[child] = contrib[node]
+                contrib[child, feature] += proba[child] - proba[node]
+        blocks.append(contrib)
+        offsets.append(offset)
+        roots.append(proba[0])
+        offset += tree.node_count
+    return float(np.mean(roots)), np.vstack(blocks), np.array(offsets)
+
+def build_explainer(models, model_version):
+    """
+    Builds the explanation data for the trained models once per model version:
+    global feature importances plus everything needed for per-row contributions.
+    """
+    features = list(models['features'])
+    log_model = models['logistic']
+    rf_model = models['rf']
+
+    coef = log_model.coef_[0]
+    rf_bias, rf_node_contributions, rf_node_offsets = build_forest_path_contributions(rf_model)
+
+    return {
+        'version': model_version,
+        'features': features,
+        'logistic': {
+            'coef': coef,
+            'intercept': float(log_model.intercept_[0]),
+            'importance': np.abs(coef) / np.abs(coef).sum(),
+        },
+        'rf': {
+            'bias': rf_bias,
+            'node_contributions': rf_node_contributions,
+            'node_offsets': rf_node_offsets,
+            'importance': rf_model.feature_importances_,
+        },
+    }
+
+# -------------------- PER-ROW CONTRIBUTIONS --------------------
+def logistic_contributions(explainer, X_scaled):
+    """
+    Per-feature contributions to the log-odds for a batch of scaled rows.
+    Because features are standardized, each contribution is measured against
+    an average patient.
+    """
+    X_scaled = np.asarray(X_scaled, dtype=float)
+    return explainer['logistic']['intercept'], X_scaled * explainer['logistic']['coef']
+
+def forest_contributions(explainer, rf_model, X_scaled):
+    """
+    Per-feature contributions to the positive-class probability for a batch of
+    scaled rows. bias + contributions.sum(axis=1) equals predict_proba[:, 1].
+    """
+    leaves = rf_model.apply(np.asarray(X_scaled, dtype=np.float32))
+    return forest_leaf_contributions(explainer, leaves + explainer['rf']['node_offsets'])
+
+def forest_leaf_contributions(explainer, node_ids):
+    """
+    Same as forest_contributions, starting from global leaf indices of shape
+    (n_samples, n_trees), e.g. as returned by forest_store.forest_apply.
+    """
+    rf_info = explainer['rf']
+    return rf_info['bias'], rf_info['node_contributions'][node_ids].mean(axis=1)
+
+def global_importances(explainer, model_name):
+    return dict(zip(explainer['features'], explainer[model_name]['importance']))
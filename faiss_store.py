@@ -0,0 +1,124 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import llm
+from content_store import single_flight
+from metrics import record_cache
+
+# FAISS indexes and the embeddings client they query with, held once per
+# process and shared by every session (and every tool, under launcher.py).
+# Each set of documents gets its own index, saved under INDEX_DIR by a hash
+# of its text, so sessions never answer from each other's documents and a
+# set processed before is not embedded again. LangChain is imported on first use.
+
+EMBEDDING_MODEL = "models/embedding-001"
+INDEX_DIR = "faiss_index"
+# Indexes held in memory, least recently used first out
+MAX_HELD_INDEXES = 8
+
+_lock = threading.Lock()
+_embeddings = None
+# Absolute index path -> (modification time of the saved index, vector store)
+_indexes = OrderedDict()
+
+def _embeddings_class():
+    from langchain_core.embeddings import Embeddings
+
+    class GeminiEmbeddings(Embeddings):
+        """
+        LangChain embeddings that call the SDK through llm.embed_content, so
+        they follow llm.configure (LangChain's own embeddings client drops
+        the transport setting) and are recorded in the metrics.
+        """
+
+        def embed_documents(self, texts):
+            if not texts:
+                return []
+            result = llm.embed_content(
+                "chatpdf", "embed_documents", model=EMBEDDING_MODEL, content=list(texts),
+                task_type="retrieval_document",
+            )
+            return result["embedding"]
+
+        def embed_query(self, text):
+            result = llm.embed_content(
+                "chatpdf", "embed_query", model=EMBEDDING_MODEL, content=text, task_type="retrieval_query"
+            )
+            return result["embedding"]
+
+    return GeminiEmbeddings
+
+def get_embeddings():
+    """
+    The process's embeddings client, created on first use.
+    """
+    global _embeddings
+    with _lock:
+        if _embeddings is None:
+            _embeddings = _embeddings_class()()
+    return _embeddings
+
+def _saved_at(path):
+    try:
+        return os.path.getmtime(os.path.join(path, "index.faiss"))
+    except OSError:
+        return None
+
+def _hold(path, saved_at, store):
+    with _lock:
+        _indexes[os.path.abspath(path)] = (saved_at, store)
+        _indexes.move_to_end(os.path.abspath(path))
+        while len(_indexes) > MAX_HELD_INDEXES:
+            _indexes.popitem(last=False)
+
+def index_path(texts):
+    """
+    Where the index of `texts` is saved: named by a hash of their content.
+    """
+    digest = hashlib.sha256("\0".join(texts).encode("utf-8")).hexdigest()
+    return os.path.join(INDEX_DIR, digest)
+
+def build_index(texts):
+    """
+    Embeds `texts` into an index, saves it and holds it in memory. Returns the
+    index's path, for load_index. Texts that already have a saved index are
+    not embedded again, and concurrent builds of the same texts share one.
+    """
+    path = index_path(texts)
+    saved = _saved_at(path) is not None
+    record_cache("faiss_build", saved)
+    if saved:
+        return path
+
+    def build():
+        from langchain.vectorstores import FAISS
+
+        store = FAISS.from_texts(texts, embedding=get_embeddings())
+        store.save_local(path)
+        _hold(path, _saved_at(path), store)
+        return path
+
+    return single_flight(f"faiss:{path}", build)
+
+def load_index(path):
+    """
+    The index saved at `path`. It is read from disk only when this process
+    does not hold it (or the saved copy changed since it was read).
+    """
+    key = os.path.abspath(path)
+    saved_at = _saved_at(path)
+    with _lock:
+        held = _indexes.get(key)
+        if held is not None and held[0] == saved_at:
+            _indexes.move_to_end(key)
+    record_cache("faiss_index", held is not None and held[0] == saved_at)
+    if held is not None and held[0] == saved_at:
+        return held[1]
+
+    from langchain.vectorstores import FAISS
+
+    store = FAISS.load_local(path, get_embeddings(), allow_dangerous_deserialization=True)
+    _hold(path, saved_at, store)
+    return store
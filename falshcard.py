@@ -1,13 +1,30 @@
 import streamlit as st
-import os
-import google.generativeai as genai
+import re
+import math
+import zlib
 from PyPDF2 import PdfReader
 from dotenv import load_dotenv
-from fpdf import FPDF
 
-# Load environment variables and configure GenAI
+import llm
+from pdf_renderer import render_pdf, add_title, get_font_family, pdf_text
+from job_queue import report_progress
+from prompt_budget import fit_context
+from structured_output import (
+    FLASHCARD_JSON_FORMAT, JSON_GENERATION_CONFIG, JsonArrayStreamParser,
+    validate_flashcard, parse_json_items, stream_response_text,
+)
+from job_ui import submit_tracked_job, wait_for_job
+from startup import warm_up
+
+# Load environment variables (the model client reads GOOGLE_API_KEY)
 load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+
+# Chunked generation settings
+SECTION_CHARS = 8000           # target size of each section sent to the model
+MAX_CONCURRENT_SECTIONS = 8    # concurrent section generations
+OVERGENERATE_FACTOR = 1.5      # ask for extra cards so de-duplication still leaves enough
+SHINGLE_SIZE = 3               # words per shingle for near-duplicate detection
+DUPLICATE_THRESHOLD = 0.6      # Jaccard similarity above which two cards are duplicates
 
 def extract_text_from_pdf(pdf_file):
     """
@@ -21,6 +38,21 @@ def extract_text_from_pdf(pdf_file):
             text += page_text + "\n"
     return text.strip()
 
+def flashcard_prompt(notes_text, num_flashcards):
+    notes_text = fit_context(notes_text, "flashcards")
+    return (
+        "You are a helpful study assistant. Based on the following study notes, generate flashcards "
+        "in a Q&A format. Each flashcard should have a question and a concise answer. Format the output as follows:\n\n"
+        "Flashcard 1:\n"
+        "Q: <question>\n"
+        "A: <answer>\n\n"
+        "Flashcard 2:\n"
+        "Q: <question>\n"
+        "A: <answer>\n\n"
+        "Please generate {} flashcards.\n\n"
+        "Study Notes:\n{}".format(num_flashcards, notes_text)
+    )
+
 def generate_flashcards(notes_text, num_flashcards=10):
     """
     Uses GenAI to generate flashcards (in Q&A format) based on the provided study notes.
@@ -36,49 +68,203 @@ def generate_flashcards(notes_text, num_flashcards=10):
     
     ...
     """
-    prompt = (
-        "You are a helpful study assistant. Based on the following study notes, generate flashcards "
-        "in a Q&A format. Each flashcard should have a question and a concise answer. Format the output as follows:\n\n"
-        "Flashcard 1:\n"
-        "Q: <question>\n"
-        "A: <answer>\n\n"
-        "Flashcard 2:\n"
-        "Q: <question>\n"
-        "A: <answer>\n\n"
-        "Please generate {} flashcards.\n\n"
-        "Study Notes:\n{}".format(num_flashcards, notes_text)
-    )
-    model = genai.GenerativeModel("gemini-1.5-pro")
-    response = model.generate_content(prompt)
+    model = llm.get_model("gemini-1.5-pro")
+    response = llm.generate_content(model, flashcard_prompt(notes_text, num_flashcards), tool="flashcards")
     return response.text
 
-def generate_pdf_from_flashcards(content):
+def flashcard_json_prompt(notes_text, num_flashcards):
+    notes_text = fit_context(notes_text, "flashcards")
+    return (
+        "You are a helpful study assistant. Based on the following study notes, generate "
+        f"{num_flashcards} flashcards. Each flashcard should have a question and a concise answer.\n"
+        f"{FLASHCARD_JSON_FORMAT}\n\n"
+        f"Study Notes:\n{notes_text}"
+    )
+
+def generate_flashcards_structured(notes_text, num_flashcards=10):
+    """
+    Generates flashcards as structured JSON, parsing cards while the response
+    streams and publishing them as partial job results so the UI can show the
+    first cards early. Returns the cards in the same text format as
+    generate_flashcards; if the model ignores the JSON format, its raw text is
+    returned instead of generating again.
+    """
+    model = llm.get_model("gemini-1.5-pro")
+    response = llm.generate_content(
+        model, flashcard_json_prompt(notes_text, num_flashcards), tool="flashcards", operation="generate_structured",
+        generation_config=JSON_GENERATION_CONFIG, stream=True,
+    )
+    parser = JsonArrayStreamParser(validate_flashcard)
+    cards, raw_text = [], []
+    for text in stream_response_text(response):
+        raw_text.append(text)
+        new_cards = parser.feed(text)
+        if new_cards:
+            cards.extend(new_cards)
+            report_progress(min(len(cards) / num_flashcards, 0.99), f"{len(cards)} cards ready",
+                            partial=format_flashcards(cards))
+    if not cards:
+        full_text = "".join(raw_text)
+        cards = parse_json_items(full_text, validate_flashcard)
+        if not cards:
+            return full_text
+    return format_flashcards(cards)
+
+def split_into_sections(notes_text, max_chars=SECTION_CHARS):
+    """
+    Splits notes into sections of at most `max_chars`, breaking on paragraph
+    boundaries where possible (and on sentences for very long paragraphs).
+    """
+    pieces = []
+    for paragraph in re.split(r"\n\s*\n", notes_text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+            continue
+        for sentence in re.split(r"(?<=[.!?])\s+", paragraph):
+            for start in range(0, len(sentence), max_chars):
+                pieces.append(sentence[start:start + max_chars])
+
+    sections, current = [], ""
+    for piece in pieces:
+        if current and len(current) + len(piece) + 2 > max_chars:
+            sections.append(current)
+            current = ""
+        current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        sections.append(current)
+    return sections
+
+# Markdown the model may put around the markers: "**Q:**", "### Q:", "- **A**:"
+_MARKER_PREFIX = r"^[ \t]*(?:[-*#>][ \t]*)*[*_]*"
+_MARKER_SUFFIX = r"[*_]*[ \t]*:[*_]*"
+FLASHCARD_PATTERN = re.compile(
+    rf"{_MARKER_PREFIX}Q{_MARKER_SUFFIX}\s*(.+?)\s*{_MARKER_PREFIX}A{_MARKER_SUFFIX}\s*(.+?)"
+    rf"(?={_MARKER_PREFIX}(?:Flashcard\b|Q{_MARKER_SUFFIX})|\Z)",
+    re.M | re.S | re.I,
+)
+
+def parse_flashcards(flashcards_text):
     """
-    Generates a PDF file containing the flashcards.
+    Extracts (question, answer) pairs from "Q: ... / A: ..." formatted output,
+    including markers decorated with Markdown such as "**Q:**".
     """
-    pdf = FPDF()
-    pdf.set_auto_page_break(auto=True, margin=15)
-    pdf.add_page()
+    return [
+        (q.strip().strip("*_ "), " ".join(a.split()).strip("*_ "))
+        for q, a in FLASHCARD_PATTERN.findall(flashcards_text)
+    ]
+
+def format_flashcards(cards):
+    return "\n\n".join(
+        f"Flashcard {i}:\nQ: {question}\nA: {answer}" for i, (question, answer) in enumerate(cards, 1)
+    )
 
-    # Title
-    pdf.set_font("Arial", style='B', size=16)
-    pdf.cell(200, 10, txt="Generated Flashcards", ln=True, align='C')
-    pdf.ln(10)
+def card_shingles(card):
+    """
+    Hashed word shingles of a card's question, used to spot near-duplicates.
+    """
+    words = re.findall(r"[a-z0-9]+", card[0].lower())
+    if len(words) < SHINGLE_SIZE:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))}
+    return {
+        zlib.crc32(" ".join(words[i:i + SHINGLE_SIZE]).encode("utf-8"))
+        for i in range(len(words) - SHINGLE_SIZE + 1)
+    }
 
-    # Content
-    pdf.set_font("Arial", size=12)
-    pdf.multi_cell(0, 10, content)
+def deduplicate_flashcards(cards):
+    """
+    Drops cards whose question shingles overlap an earlier card's by more
+    than DUPLICATE_THRESHOLD (Jaccard similarity).
+    """
+    kept, kept_shingles = [], []
+    for card in cards:
+        shingles = card_shingles(card)
+        if any(len(shingles & other) / len(shingles | other) > DUPLICATE_THRESHOLD for other in kept_shingles):
+            continue
+        kept.append(card)
+        kept_shingles.append(shingles)
+    return kept
 
-    pdf_output_path = "flashcards.pdf"
-    pdf.output(pdf_output_path)
-    return pdf_output_path
+async def generate_section_cards(section, count, structured=True):
+    """
+    Generates one section's cards as (question, answer) pairs.
+    """
+    if structured:
+        text = await llm.generate(
+            flashcard_json_prompt(section, count), generation_config=JSON_GENERATION_CONFIG,
+            tool="flashcards", operation="section_structured",
+        )
+        cards = parse_json_items(text, validate_flashcard)
+        if cards:
+            return cards
+    else:
+        text = await llm.generate(flashcard_prompt(section, count), tool="flashcards", operation="section")
+    return parse_flashcards(text)
+
+def generate_flashcards_chunked(notes_text, num_flashcards=10, structured=True):
+    """
+    Generates flashcards for long notes by splitting them into sections and
+    generating each section's cards concurrently. Cards are de-duplicated and
+    merged round-robin across sections so the result covers the whole document.
+    When there are more sections than cards requested, evenly spaced sections
+    are used.
+    """
+    sections = split_into_sections(notes_text)
+    if len(sections) > num_flashcards:
+        step = len(sections) / num_flashcards
+        sections = [sections[int(i * step)] for i in range(num_flashcards)]
+
+    total_chars = sum(len(section) for section in sections)
+    counts = [
+        max(1, math.ceil(num_flashcards * OVERGENERATE_FACTOR * len(section) / total_chars))
+        for section in sections
+    ]
+
+    section_cards = [[] for _ in sections]
+    generations = [generate_section_cards(section, count, structured) for section, count in zip(sections, counts)]
+    for done, (i, cards) in enumerate(llm.iter_completed(generations, limit=MAX_CONCURRENT_SECTIONS), 1):
+        if isinstance(cards, Exception):
+            raise cards
+        report_progress(done / len(sections), f"Generated section {done} of {len(sections)}")
+        section_cards[i] = cards
+
+    # Round-robin merge keeps every section represented
+    merged = []
+    for rank in range(max((len(cards) for cards in section_cards), default=0)):
+        merged.extend(cards[rank] for cards in section_cards if rank < len(cards))
+    return format_flashcards(deduplicate_flashcards(merged)[:num_flashcards])
+
+def generate_pdf_from_flashcards(content):
+    """
+    Generates a PDF containing the flashcards and returns it as bytes.
+    """
+    def layout(pdf):
+        add_title(pdf, "Generated Flashcards")
+
+        # Content
+        pdf.set_font(get_font_family(), size=12)
+        pdf.multi_cell(0, 10, pdf_text(content))
+
+    return render_pdf(layout, content)
 
 def flashcard_generator_app():
     st.title("📚 Flashcard Generator")
+    warm_up(llm.SDK_MODULE)
     st.write("Upload your study notes (in PDF format) and generate flashcards to enhance your learning!")
 
     uploaded_pdf = st.file_uploader("Upload a PDF", type=["pdf"])
     num_flashcards = st.number_input("Number of flashcards to generate", min_value=1, max_value=50, value=10)
+    chunked = st.checkbox(
+        "Split long notes into sections and generate them in parallel",
+        value=True,
+        help=f"Used when the notes are longer than {SECTION_CHARS} characters.",
+    )
+    structured = st.checkbox(
+        "Structured output (show cards as they are generated)",
+        value=True,
+    )
 
     if uploaded_pdf:
         with st.spinner("Extracting text from PDF..."):
@@ -86,17 +272,31 @@ def flashcard_generator_app():
         
         if notes_text:
             if st.button("Generate Flashcards"):
-                with st.spinner("Generating flashcards..."):
-                    flashcards = generate_flashcards(notes_text, num_flashcards)
-                    st.subheader("Generated Flashcards")
-                    st.text_area("Flashcards", flashcards, height=400)
-                    
-                    # Generate PDF for download
-                    pdf_path = generate_pdf_from_flashcards(flashcards)
-                    with open(pdf_path, "rb") as f:
-                        st.download_button("Download Flashcards as PDF", f, file_name="flashcards.pdf")
+                if chunked and len(notes_text) > SECTION_CHARS:
+                    submit_tracked_job("flashcards_job", "falshcard:generate_flashcards_chunked",
+                                       notes_text, int(num_flashcards), structured)
+                elif structured:
+                    submit_tracked_job("flashcards_job", "falshcard:generate_flashcards_structured",
+                                       notes_text, int(num_flashcards))
+                else:
+                    submit_tracked_job("flashcards_job", "falshcard:generate_flashcards",
+                                       notes_text, int(num_flashcards))
         else:
             st.error("No text could be extracted from the uploaded PDF.")
 
+    # Generation runs in the background job queue and survives reruns and page reloads
+    job = wait_for_job(
+        "flashcards_job", "Generating flashcards",
+        show_partial=lambda cards: st.text_area("Flashcards so far", cards, height=400, disabled=True),
+    )
+    if job:
+        flashcards = job["result"]
+        st.subheader("Generated Flashcards")
+        st.text_area("Flashcards", flashcards, height=400)
+
+        # Generate PDF for download
+        pdf_bytes = generate_pdf_from_flashcards(flashcards)
+        st.download_button("Download Flashcards as PDF", pdf_bytes, file_name="flashcards.pdf", mime="application/pdf")
+
 if __name__ == "__main__":
     flashcard_generator_app()
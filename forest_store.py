@@ -0,0 +1,111 @@
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+
+# Arrays written per forest; each is a plain .npy file so it can be memory-mapped
+FOREST_ARRAYS = ("feature", "threshold", "left", "right", "value", "roots")
+
+# -------------------- EXPORT --------------------
+def flatten_forest(rf_model):
+    """
+    Flattens every tree of a fitted RandomForestClassifier into contiguous arrays.
+    Child indices are global (offset by the tree's position in the arrays) and
+    are -1 for leaves; values hold class probabilities per node.
+    """
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for estimator in rf_model.estimators_:
+        tree = estimator.tree_
+        is_leaf = tree.children_left == -1
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(tree.threshold)
+        lefts.append(np.where(is_leaf, -1, tree.children_left + offset))
+        rights.append(np.where(is_leaf, -1, tree.children_right + offset))
+        node_values = tree.value[:, 0, :]
+        values.append(node_values / node_values.sum(axis=1, keepdims=True))
+        roots.append(offset)
+        offset += tree.node_count
+        max_depth = max(max_depth, tree.max_depth)
+
+    arrays = {
+        "feature": np.concatenate(features).astype(np.int32),
+        "threshold": np.concatenate(thresholds).astype(np.float64),
+        "left": np.concatenate(lefts).astype(np.int32),
+        "right": np.concatenate(rights).astype(np.int32),
+        "value": np.vstack(values).astype(np.float32),
+        "roots": np.array(roots, dtype=np.int32),
+    }
+    meta = {
+        "n_features": int(rf_model.n_features_in_),
+        "max_depth": int(max_depth),
+        "classes": [c.item() if hasattr(c, "item") else c for c in rf_model.classes_],
+    }
+    return arrays, meta
+
+def export_forest(rf_model, directory):
+    """
+    Writes the flattened forest to `directory` (one .npy per array plus meta.json).
+    The files are written to a temporary directory first and renamed into place,
+    so concurrent app instances exporting the same model never see a partial copy.
+    """
+    if os.path.exists(os.path.join(directory, "meta.json")):
+        return directory
+    arrays, meta = flatten_forest(rf_model)
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix=".forest-")
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), array)
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    try:
+        os.rename(tmp_dir, directory)
+    except OSError:
+        # Another process exported the same model first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return directory
+
+# -------------------- LOADING & PREDICTION --------------------
+def load_forest(directory, mmap=True):
+    """
+    Loads a flattened forest. With mmap=True the arrays are memory-mapped
+    read-only, so every process on the host shares the same physical pages.
+    """
+    with open(os.path.join(directory, "meta.json")) as f:
+        forest = json.load(f)
+    mode = "r" if mmap else None
+    for name in FOREST_ARRAYS:
+        forest[name] = np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mode)
+    return forest
+
+def forest_apply(forest, X):
+    """
+    Returns the global leaf index reached in every tree, shape (n_samples, n_trees).
+    All trees are walked together, one depth level per step.
+    """
+    # Match scikit-learn's split semantics, which compare float32 inputs
+    X = np.asarray(X, dtype=np.float32).astype(np.float64)
+    rows = np.arange(X.shape[0])[:, None]
+    nodes = np.broadcast_to(np.asarray(forest["roots"]), (X.shape[0], len(forest["roots"]))).copy()
+    feature, threshold = forest["feature"], forest["threshold"]
+    left, right = forest["left"], forest["right"]
+    for _ in range(forest["max_depth"]):
+        node_left = left[nodes]
+        active = node_left != -1
+        if not active.any():
+            break
+        go_left = X[rows, feature[nodes]] <= threshold[nodes]
+        nodes = np.where(active, np.where(go_left, node_left, right[nodes]), nodes)
+    return nodes
+
+def forest_predict_proba(forest, X, leaves=None):
+    if leaves is None:
+        leaves = forest_apply(forest, X)
+    return forest["value"][leaves].mean(axis=1)
+
+def forest_predict(forest, X):
+    proba = forest_predict_proba(forest, X)
+    return np.asarray(forest["classes"])[proba.argmax(axis=1)]
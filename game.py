@@ -1,11 +1,29 @@
 import streamlit as st
-import os
-import google.generativeai as genai
+import json
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
-# Load environment variables and configure GenAI API
+import llm
+from content_store import fetch_shared
+from structured_output import JSON_GENERATION_CONFIG, parse_json_object
+from startup import warm_up
+
+# Load environment variables (the model client reads GOOGLE_API_KEY)
 load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+
+# The quest has this many levels
+MAX_LEVEL = 3
+# Background generations shared by all sessions on this server
+PREFETCH_WORKERS = 8
+# Complete quest packs are shared by every player of a subject for this long
+QUEST_PACK_MAX_AGE = 24 * 60 * 60
+
+QUEST_PACK_JSON_FORMAT = (
+    "Respond with a JSON object only, of the form "
+    '{"description": "<library description>", "levels": [{"challenge": "<challenge question>", '
+    '"answer": "<short correct answer>", "hint": "<helpful hint>"}, ...]} '
+    f"with exactly {MAX_LEVEL} levels of increasing difficulty."
+)
 
 def generate_library_description(subject):
     """
@@ -17,8 +35,8 @@ def generate_library_description(subject):
         f"'The Library of Lost Knowledge', where every corner hides secrets related to {subject}. "
         "Describe magical artifacts, dusty tomes, and a secret passage leading to the lost manuscript."
     )
-    model = genai.GenerativeModel("gemini-1.5-pro")
-    response = model.generate_content(prompt)
+    model = llm.get_model("gemini-1.5-pro")
+    response = llm.generate_content(model, prompt, tool="game", operation="description")
     return response.text
 
 def generate_challenge(subject, level):
@@ -35,8 +53,8 @@ def generate_challenge(subject, level):
         "Challenge: <challenge question>\n"
         "Answer: <correct answer>\n"
     )
-    model = genai.GenerativeModel("gemini-1.5-pro")
-    response = model.generate_content(prompt)
+    model = llm.get_model("gemini-1.5-pro")
+    response = llm.generate_content(model, prompt, tool="game", operation="challenge")
     return response.text
 
 def parse_challenge(challenge_text):
@@ -63,12 +81,138 @@ def generate_hint(subject, challenge):
         f"Challenge: {challenge}\n\n"
         "Hint:"
     )
-    model = genai.GenerativeModel("gemini-1.5-pro")
-    response = model.generate_content(prompt)
+    model = llm.get_model("gemini-1.5-pro")
+    response = llm.generate_content(model, prompt, tool="game", operation="hint")
     return response.text
 
+def validate_quest_pack(item):
+    """
+    Normalizes a quest pack to {'description', 'levels': [{'challenge',
+    'answer', 'hint'}, ...]}, with answers lowercased as parse_challenge
+    does. Returns None if the pack is incomplete.
+    """
+    description = str(item.get("description", "")).strip()
+    levels = item.get("levels")
+    if not description or not isinstance(levels, list) or len(levels) < MAX_LEVEL:
+        return None
+    pack_levels = []
+    for level in levels[:MAX_LEVEL]:
+        if not isinstance(level, dict):
+            return None
+        challenge = str(level.get("challenge", "")).strip()
+        answer = str(level.get("answer", "")).strip().lower()
+        if not challenge or not answer:
+            return None
+        pack_levels.append({"challenge": challenge, "answer": answer, "hint": str(level.get("hint", "")).strip() or None})
+    return {"description": description, "levels": pack_levels}
+
+def generate_quest_pack(subject):
+    """
+    Generates the library description and every level's challenge, answer and
+    hint in one structured call. If the response cannot be parsed, the
+    description and challenges are generated concurrently instead (hints are
+    then prefetched during play).
+    """
+    prompt = (
+        f"Create a study quest for a student in the subject {subject}, set in 'The Library of Lost "
+        f"Knowledge', an ancient library where every corner hides secrets related to {subject}. "
+        "Write an immersive, mysterious description of the library with magical artifacts, dusty tomes "
+        "and a secret passage leading to the lost manuscript, and a challenge question for each level "
+        "of the quest within the context of the library.\n" + QUEST_PACK_JSON_FORMAT
+    )
+    model = llm.get_model("gemini-1.5-pro")
+    response = llm.generate_content(
+        model, prompt, tool="game", operation="quest_pack", generation_config=JSON_GENERATION_CONFIG
+    )
+    pack = parse_json_object(response.text, validate_quest_pack)
+    if pack:
+        return pack
+
+    executor = get_prefetch_executor()
+    description = executor.submit(generate_library_description, subject)
+    challenges = [executor.submit(generate_challenge, subject, level) for level in range(1, MAX_LEVEL + 1)]
+    levels = []
+    for future in challenges:
+        challenge, answer = parse_challenge(future.result())
+        levels.append({"challenge": challenge, "answer": answer, "hint": None})
+    return {"description": description.result(), "levels": levels}
+
+def get_quest_pack(subject):
+    """
+    Returns the quest pack for a subject, shared across sessions and server
+    processes. Packs with unparsed levels are used but not shared.
+    """
+    value, _ = fetch_shared(
+        f"game:quest:{' '.join(subject.lower().split())}",
+        lambda: json.dumps(generate_quest_pack(subject)),
+        max_age=QUEST_PACK_MAX_AGE,
+        is_valid=lambda value: all(
+            level["challenge"] and level["answer"] for level in json.loads(value)["levels"]
+        ),
+    )
+    return json.loads(value)
+
+def start_level(level):
+    """
+    Shows the given level's challenge from the quest pack, or from a
+    prefetched/direct generation if the pack does not include it.
+    """
+    subject = st.session_state["subject"]
+    levels = st.session_state.get("levels", [])
+    st.session_state["level"] = level
+    st.session_state.pop("hint", None)
+    if level <= len(levels) and levels[level - 1]["challenge"]:
+        entry = levels[level - 1]
+        challenge, answer = entry["challenge"], entry["answer"]
+        if entry["hint"]:
+            st.session_state["hint"] = entry["hint"]
+    else:
+        challenge, answer = parse_challenge(
+            take_prefetched(("challenge", subject, level), generate_challenge, subject, level)
+        )
+    discard_prefetched()
+    st.session_state["challenge"] = challenge
+    st.session_state["correct_answer"] = answer
+
+@st.cache_resource
+def get_prefetch_executor():
+    return ThreadPoolExecutor(max_workers=PREFETCH_WORKERS)
+
+def prefetch(key, fn, *args):
+    """
+    Starts fn(*args) in the background for this session unless a result for
+    `key` is already pending.
+    """
+    pending = st.session_state.setdefault("prefetch", {})
+    if key not in pending:
+        pending[key] = get_prefetch_executor().submit(fn, *args)
+
+def take_prefetched(key, fn, *args):
+    """
+    Returns the prefetched result for `key`, waiting for it if it is still
+    running, or calls fn(*args) directly if nothing was prefetched (or the
+    prefetch failed).
+    """
+    future = st.session_state.setdefault("prefetch", {}).pop(key, None)
+    if future is not None:
+        try:
+            return future.result()
+        except Exception:
+            pass
+    return fn(*args)
+
+def discard_prefetched(keep=()):
+    """
+    Drops prefetched results that are no longer needed, cancelling those
+    that have not started.
+    """
+    pending = st.session_state.setdefault("prefetch", {})
+    for key in [key for key in pending if key not in keep]:
+        pending.pop(key).cancel()
+
 def library_game():
     st.title("📚 Study Quest: The Library of Lost Knowledge")
+    warm_up(llm.SDK_MODULE)
     st.write(
         "Embark on a quest through an ancient library filled with mysteries and challenges! "
         "Your goal is to recover the legendary lost manuscript by overcoming subject-related challenges. "
@@ -80,14 +224,13 @@ def library_game():
     if st.button("Begin Your Quest") and subject:
         # Initialize session state variables
         st.session_state["subject"] = subject
-        st.session_state["level"] = 1
         st.session_state["completed_levels"] = 0
         st.session_state["game_over"] = False
-        st.session_state["room_description"] = generate_library_description(subject)
-        challenge_text = generate_challenge(subject, st.session_state["level"])
-        challenge, answer = parse_challenge(challenge_text)
-        st.session_state["challenge"] = challenge
-        st.session_state["correct_answer"] = answer
+        with st.spinner("Opening the library..."):
+            pack = get_quest_pack(subject)
+        st.session_state["room_description"] = pack["description"]
+        st.session_state["levels"] = pack["levels"]
+        start_level(1)
 
     if "subject" in st.session_state:
         st.subheader("The Library")
@@ -96,28 +239,35 @@ def library_game():
         st.subheader(f"Challenge Level {st.session_state['level']}")
         st.write(st.session_state["challenge"])
 
+        # Generate the next challenge and this challenge's hint while the player thinks
+        subject, level = st.session_state["subject"], st.session_state["level"]
+        if not st.session_state.get("game_over", False):
+            levels = st.session_state.get("levels", [])
+            if level < MAX_LEVEL and not (level < len(levels) and levels[level]["challenge"]):
+                prefetch(("challenge", subject, level + 1), generate_challenge, subject, level + 1)
+            if "hint" not in st.session_state:
+                prefetch(("hint", subject, level), generate_hint, subject, st.session_state["challenge"])
+
         user_response = st.text_input("Enter your answer to the challenge:", key="user_response")
         if st.button("Submit Answer"):
             if user_response.strip().lower() == st.session_state["correct_answer"]:
                 st.success("Correct! You've overcome this challenge.")
                 st.session_state["completed_levels"] += 1
-                # For this example, let's assume there are 3 levels
-                if st.session_state["level"] >= 3:
+                if st.session_state["level"] >= MAX_LEVEL:
                     st.balloons()
                     st.success("Congratulations! You've recovered the lost manuscript and completed your quest!")
                     st.session_state["game_over"] = True
+                    discard_prefetched()
                 else:
-                    st.session_state["level"] += 1
-                    # Generate the next challenge for the new level
-                    challenge_text = generate_challenge(st.session_state["subject"], st.session_state["level"])
-                    challenge, answer = parse_challenge(challenge_text)
-                    st.session_state["challenge"] = challenge
-                    st.session_state["correct_answer"] = answer
-                    st.experimental_rerun()
+                    start_level(level + 1)
+                    st.rerun()
             else:
                 st.error("Incorrect answer.")
-                hint = generate_hint(st.session_state["subject"], st.session_state["challenge"])
-                st.info(f"Hint: {hint}")
+                if "hint" not in st.session_state:
+                    st.session_state["hint"] = take_prefetched(
+                        ("hint", subject, level), generate_hint, subject, st.session_state["challenge"]
+                    )
+                st.info(f"Hint: {st.session_state['hint']}")
 
     if st.session_state.get("game_over", False):
         st.write("Thank you for playing Study Quest!")
@@ -0,0 +1,237 @@
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import threading
+import time
+import requests
+
+from metrics import record_cache
+
+# -------------------- CONFIGURATION --------------------
+# Override the location with IMAGE_CACHE_DIR; blobs are stored by content hash
+# so the same image served from several URLs is kept once.
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", ".image_cache")
+IMAGE_CACHE_MAX_BYTES = 200 * 1024 * 1024   # evict least recently used beyond this
+IMAGE_CACHE_TTL = 24 * 60 * 60              # serve without revalidation for a day
+IMAGE_TIMEOUT = (3, 10)                     # (connect, read) seconds
+MAX_IMAGE_BYTES = 10 * 1024 * 1024          # skip anything larger than 10 MB
+EVICTION_GRACE_SECONDS = 10 * 60            # never evict a blob used this recently
+HTTP_POOL_SIZE = 8
+
+_http_session = None
+_evict_lock = threading.Lock()
+
+def get_http_session():
+    """
+    Returns a process-wide requests session with a connection pool sized for
+    concurrent image downloads.
+    """
+    global _http_session
+    if _http_session is None:
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update({"User-Agent": "Mozilla/5.0"})
+        _http_session = session
+    return _http_session
+
+# -------------------- IMAGE METADATA --------------------
+def image_dimensions(data):
+    """
+    Reads (width, height) from PNG, GIF or JPEG header bytes without decoding
+    the image. Returns (None, None) for unrecognised formats.
+    """
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+    if data[:6] in (b"GIF87a", b"GIF89a") and len(data) >= 10:
+        return struct.unpack("<HH", data[6:10])
+    if data[:2] == b"\xff\xd8":
+        i = 2
+        while i + 9 < len(data):
+            if data[i] != 0xFF:
+                i += 1
+                continue
+            marker = data[i + 1]
+            if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+                i += 2
+                continue
+            length = struct.unpack(">H", data[i + 2:i + 4])[0]
+            # Start-of-frame markers carry the dimensions
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                height, width = struct.unpack(">HH", data[i + 5:i + 9])
+                return width, height
+            i += 2 + length
+    return None, None
+
+def _suffix_for(content_type, data):
+    if "png" in content_type or data[:4] == b"\x89PNG":
+        return ".png"
+    if "gif" in content_type or data[:3] == b"GIF":
+        return ".gif"
+    return ".jpg"
+
+# -------------------- DISK LAYOUT --------------------
+def _meta_path(url):
+    return os.path.join(IMAGE_CACHE_DIR, "meta", hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+def _blob_path(name):
+    return os.path.join(IMAGE_CACHE_DIR, "blobs", name)
+
+def _atomic_write(path, data, mode="wb"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    with os.fdopen(fd, mode) as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _load_meta(url):
+    try:
+        with open(_meta_path(url)) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not os.path.exists(_blob_path(meta["blob"])):
+        return None
+    return meta
+
+def _touch_blob(name):
+    # A blob's modification time is when it was last used, for eviction;
+    # updating it is cheaper than rewriting the metadata on every hit
+    try:
+        os.utime(_blob_path(name))
+    except OSError:
+        pass
+
+def _save_meta(meta):
+    _atomic_write(_meta_path(meta["url"]), json.dumps(meta), mode="w")
+
+def _to_result(meta):
+    return {
+        "url": meta["url"],
+        "path": _blob_path(meta["blob"]),
+        "content_type": meta["content_type"],
+        "suffix": os.path.splitext(meta["blob"])[1],
+        "width": meta["width"],
+        "height": meta["height"],
+        "size": meta["size"],
+    }
+
+# -------------------- PUBLIC API --------------------
+def get_image(url):
+    """
+    Returns a cached image for `url`, downloading or revalidating it only when
+    needed. Fresh entries are served with no network I/O; stale ones are
+    revalidated with If-None-Match / If-Modified-Since.
+
+    Returns a dict with "url", "path", "content_type", "suffix", "width",
+    "height" and "size", or None if the URL does not serve a non-empty image.
+    """
+    meta = _load_meta(url)
+    now = time.time()
+    fresh = meta is not None and now - meta["fetched_at"] < IMAGE_CACHE_TTL
+    record_cache("image", fresh)
+    if fresh:
+        _touch_blob(meta["blob"])
+        return _to_result(meta)
+
+    headers = {}
+    if meta is not None:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    try:
+        with get_http_session().get(url, stream=True, timeout=IMAGE_TIMEOUT, headers=headers) as resp:
+            if resp.status_code == 304 and meta is not None:
+                meta["fetched_at"] = now
+                _save_meta(meta)
+                _touch_blob(meta["blob"])
+                return _to_result(meta)
+            content_type = resp.headers.get("Content-Type", "").lower()
+            if resp.status_code != 200 or "image" not in content_type:
+                return None
+            chunks, size = [], 0
+            for chunk in resp.iter_content(chunk_size=64 * 1024):
+                size += len(chunk)
+                if size > MAX_IMAGE_BYTES:
+                    return None
+                chunks.append(chunk)
+            etag = resp.headers.get("ETag")
+            last_modified = resp.headers.get("Last-Modified")
+    except Exception:
+        return None
+
+    data = b"".join(chunks)
+    if not data:
+        return None
+    blob = hashlib.sha256(data).hexdigest() + _suffix_for(content_type, data)
+    if os.path.exists(_blob_path(blob)):
+        _touch_blob(blob)
+    else:
+        _atomic_write(_blob_path(blob), data)
+    width, height = image_dimensions(data)
+    meta = {
+        "url": url,
+        "blob": blob,
+        "content_type": content_type,
+        "etag": etag,
+        "last_modified": last_modified,
+        "width": width,
+        "height": height,
+        "size": len(data),
+        "fetched_at": now,
+    }
+    _save_meta(meta)
+    evict_images()
+    return _to_result(meta)
+
+def evict_images(max_bytes=IMAGE_CACHE_MAX_BYTES):
+    """
+    Deletes blobs no entry refers to any more (replaced when their URL was
+    re-fetched with new content), then the least recently used blobs and
+    the entries pointing to them until the rest fit in `max_bytes`. Blobs
+    used in the last EVICTION_GRACE_SECONDS are kept, since get_image may
+    just have returned their path.
+    """
+    with _evict_lock:
+        blobs = {}
+        try:
+            with os.scandir(os.path.join(IMAGE_CACHE_DIR, "blobs")) as it:
+                for entry in it:
+                    if entry.is_file() and not entry.name.startswith(".tmp-"):
+                        stat = entry.stat()
+                        blobs[entry.name] = (stat.st_mtime, stat.st_size)
+        except OSError:
+            return
+        # Blob -> paths of the metadata files that refer to it
+        references = {}
+        meta_dir = os.path.join(IMAGE_CACHE_DIR, "meta")
+        for name in os.listdir(meta_dir) if os.path.isdir(meta_dir) else ():
+            path = os.path.join(meta_dir, name)
+            try:
+                with open(path) as f:
+                    references.setdefault(json.load(f)["blob"], []).append(path)
+            except (OSError, ValueError, KeyError):
+                continue
+
+        now = time.time()
+        total = sum(size for _, size in blobs.values())
+        for name, (used_at, size) in sorted(blobs.items(), key=lambda item: item[1][0]):
+            if name in references and total <= max_bytes:
+                continue
+            if now - used_at < EVICTION_GRACE_SECONDS:
+                continue
+            for path in references.get(name, ()):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            try:
+                os.remove(_blob_path(name))
+            except OSError:
+                continue
+            total -= size
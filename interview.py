@@ -1,45 +1,144 @@
 import streamlit as st
-import os
-import google.generativeai as genai
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
-# Load environment variables and configure the API
+import llm
+from structured_output import (
+    INTERVIEW_JSON_FORMAT, JSON_GENERATION_CONFIG, clean_question, parse_json_items, strip_code_fence,
+    validate_interview_question,
+)
+from question_bank import assemble_questions, count_questions, resolve_topic, top_up
+from startup import warm_up
+
+# Load environment variables (the model client reads GOOGLE_API_KEY)
 load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+
+# Reviews run at most this many at a time in batch mode
+MAX_CONCURRENT_REVIEWS = 6
+
+BATCH_MODE = "Answer all questions, then review them together"
+
+# The bank for a role is topped up in the background once a user has fewer
+# than TOP_UP_FACTOR times their requested number of unseen questions left
+TOP_UP_FACTOR = 2
+TOP_UP_BATCH = 20
+
+def parse_question_lines(text):
+    """
+    Fallback for replies that ignore the JSON format: one question per line,
+    keeping only lines that end in a question mark once numbering is removed,
+    so lead-ins ("Here are 5 questions for...") and headers are dropped.
+    """
+    lines = (clean_question(line) for line in strip_code_fence(text).splitlines())
+    return [line for line in lines if line.endswith("?")]
 
 def generate_interview_questions(role, interview_type, num_questions):
     """
     Uses GenAI to generate a list of interview questions for a given role and interview type.
-    The questions are returned as a list of strings.
+    The questions are returned as a list of at most `num_questions` strings.
     """
     prompt = (
         f"Generate {num_questions} challenging interview questions for a candidate applying for a {role} role "
-        f"for a {interview_type} interview. List one question per line."
+        f"for a {interview_type} interview. " + INTERVIEW_JSON_FORMAT
+    )
+    model = llm.get_model("gemini-1.5-pro")
+    response = llm.generate_content(
+        model, prompt, tool="interview", operation="questions", generation_config=JSON_GENERATION_CONFIG
     )
-    model = genai.GenerativeModel("gemini-1.5-pro")
-    response = model.generate_content(prompt)
-    # Split the output into lines and filter out empty lines.
-    questions = [line.strip() for line in response.text.split("\n") if line.strip()]
-    return questions
+    # Every item is banked and served to later users, so only real questions are kept
+    questions = parse_json_items(response.text, validate_interview_question) or parse_question_lines(response.text)
+    return questions[:num_questions]
 
-def review_answer(question, answer):
+@st.cache_resource
+def get_top_up_executor():
+    return ThreadPoolExecutor(max_workers=2)
+
+def get_interview_questions(role, interview_type, num_questions, seen):
     """
-    Uses GenAI to review the provided answer.
-    The review includes strengths, weaknesses, and suggestions for improvement.
+    Serves questions for a role from the interview question bank (one bank
+    per interview type, with fuzzy role matching), skipping the ids in `seen`.
+    Only the shortfall is generated while the user waits; when the user's
+    unseen stock runs low the bank is topped up in the background.
     """
-    prompt = (
+    bank = f"interview:{interview_type.lower()}"
+
+    def generate(role, count, difficulty):
+        return [{"question": q} for q in generate_interview_questions(role, interview_type, count)]
+
+    items, _ = assemble_questions(bank, role, num_questions, generate, exclude=seen)
+    seen.update(item["id"] for item in items)
+    key = resolve_topic(bank, role)
+    if count_questions(bank, key, exclude=seen) < TOP_UP_FACTOR * num_questions:
+        get_top_up_executor().submit(top_up, bank, key, role, generate, TOP_UP_BATCH)
+    return [item["question"] for item in items]
+
+def review_prompt(question, answer):
+    return (
         f"Review the following interview answer. Provide detailed feedback, "
         f"including strengths, weaknesses, and suggestions for improvement.\n\n"
         f"Question: {question}\n"
         f"Answer: {answer}\n\n"
         "Feedback:"
     )
-    model = genai.GenerativeModel("gemini-1.5-pro")
-    response = model.generate_content(prompt)
+
+def review_answer(question, answer):
+    """
+    Uses GenAI to review the provided answer.
+    The review includes strengths, weaknesses, and suggestions for improvement.
+    """
+    model = llm.get_model("gemini-1.5-pro")
+    response = llm.generate_content(model, review_prompt(question, answer), tool="interview", operation="review")
     return response.text
 
+def review_answers(answers, limit=MAX_CONCURRENT_REVIEWS):
+    """
+    Reviews {index: (question, answer)} concurrently, yielding (index, feedback)
+    as each review completes. A failed review yields its exception as the
+    feedback instead of stopping the others.
+    """
+    indices = list(answers)
+    reviews = [llm.generate(review_prompt(*answers[i]), tool="interview", operation="review") for i in indices]
+    for position, feedback in llm.iter_completed(reviews, limit=limit):
+        yield indices[position], feedback
+
+def show_batch_reviews(questions):
+    """
+    Summary view for batch mode: lists every answer, then fills in the
+    reviews as they complete. Answers that already have feedback are not
+    reviewed again on later reruns.
+    """
+    placeholders = {}
+    for i, q in enumerate(questions):
+        st.markdown(f"**Q{i+1}: {q}**")
+        st.write(f"**Your Answer:** {st.session_state['interview_answers'].get(i, 'No answer provided')}")
+        placeholders[i] = st.empty()
+        if i in st.session_state["interview_feedback"]:
+            placeholders[i].write(f"**Feedback:** {st.session_state['interview_feedback'][i]}")
+        else:
+            placeholders[i].info("Reviewing...")
+
+    pending = {
+        i: (questions[i], answer)
+        for i, answer in st.session_state["interview_answers"].items()
+        if i not in st.session_state["interview_feedback"]
+    }
+    progress = st.progress(0.0, text=f"Reviewed 0 of {len(pending)} answers") if pending else None
+    for done, (i, feedback) in enumerate(review_answers(pending), 1):
+        if isinstance(feedback, Exception):
+            placeholders[i].error(f"Review failed: {feedback}")
+        else:
+            st.session_state["interview_feedback"][i] = feedback
+            placeholders[i].write(f"**Feedback:** {feedback}")
+        progress.progress(done / len(pending), text=f"Reviewed {done} of {len(pending)} answers")
+    if progress:
+        progress.empty()
+    for i in placeholders:
+        if i not in st.session_state["interview_answers"]:
+            placeholders[i].write("**Feedback:** No feedback available")
+
 def interview_prep_app():
     st.title("🚀 Interview Preparation Assistant")
+    warm_up(llm.SDK_MODULE)
     st.write("Prepare for your upcoming interview with AI-generated questions and personalized feedback!")
 
     # Interview setup inputs
@@ -47,50 +146,75 @@ def interview_prep_app():
     interview_type = st.selectbox("Select interview type:", ["Technical", "HR", "Behavioral", "Case Study"])
     num_questions = st.number_input("How many interview questions would you like to practice?", 
                                     min_value=1, max_value=20, value=5)
+    review_mode = st.radio(
+        "Feedback:",
+        ["Review each answer as I go", BATCH_MODE],
+        help="In batch mode all answers are reviewed at once, in parallel, after the last question.",
+    )
 
     # Generate interview questions when button is pressed
     if st.button("Generate Interview Questions") and role:
-        questions = generate_interview_questions(role, interview_type, num_questions)
+        seen = st.session_state.setdefault("seen_interview_ids", set())
+        questions = get_interview_questions(role, interview_type, int(num_questions), seen)
+        if len(questions) < num_questions:
+            st.warning(
+                f"Only {len(questions)} questions could be found for this role "
+                "that you have not already practiced."
+            )
         st.session_state["interview_questions"] = questions
-        st.session_state["current_question_index"] = 0
-        st.session_state["user_answers"] = {}
-        st.session_state["feedback"] = {}
+        st.session_state["interview_question_index"] = 0
+        st.session_state["interview_answers"] = {}
+        st.session_state["interview_feedback"] = {}
+        st.session_state["interview_batch_review"] = review_mode == BATCH_MODE
 
     # If questions have been generated, show the current question
     if "interview_questions" in st.session_state:
         questions = st.session_state["interview_questions"]
-        idx = st.session_state.get("current_question_index", 0)
+        idx = st.session_state.get("interview_question_index", 0)
         if idx < len(questions):
             st.subheader(f"Question {idx + 1} of {len(questions)}")
             current_question = questions[idx]
             st.write(current_question)
             # Each text area uses a key based on the current question index.
-            user_answer = st.text_area("Your Answer:", key=f"answer_{idx}")
+            user_answer = st.text_area("Your Answer:", key=f"interview_answer_{idx}")
             
-            if st.button("Submit Answer", key=f"submit_{idx}"):
+            if st.session_state.get("interview_batch_review"):
+                if st.button("Save Answer and Continue", key=f"interview_submit_{idx}"):
+                    # Reviews are generated together once every question is answered
+                    st.session_state["interview_answers"][idx] = user_answer
+                    st.session_state["interview_question_index"] = idx + 1
+                    st.rerun()
+            elif st.button("Submit Answer", key=f"interview_submit_{idx}"):
                 # Save the user's answer and generate feedback
-                st.session_state["user_answers"][idx] = user_answer
+                st.session_state["interview_answers"][idx] = user_answer
                 feedback = review_answer(current_question, user_answer)
-                st.session_state["feedback"][idx] = feedback
+                st.session_state["interview_feedback"][idx] = feedback
                 st.success("Feedback generated below:")
                 st.write(feedback)
             
             # Provide a "Next Question" button if an answer has been submitted
-            if st.session_state["user_answers"].get(idx):
-                if st.button("Next Question", key=f"next_{idx}"):
-                    st.session_state["current_question_index"] = idx + 1
+            if st.session_state["interview_answers"].get(idx) and not st.session_state.get("interview_batch_review"):
+                if st.button("Next Question", key=f"interview_next_{idx}"):
+                    st.session_state["interview_question_index"] = idx + 1
                     # When the index updates, a new text area with a new key is rendered.
         else:
             st.success("You've completed all the interview questions! Review your answers and feedback below.")
-            for i, q in enumerate(questions):
-                st.markdown(f"**Q{i+1}: {q}**")
-                answer = st.session_state["user_answers"].get(i, "No answer provided")
-                feedback = st.session_state["feedback"].get(i, "No feedback available")
-                st.write(f"**Your Answer:** {answer}")
-                st.write(f"**Feedback:** {feedback}")
+            if st.session_state.get("interview_batch_review"):
+                show_batch_reviews(questions)
+            else:
+                for i, q in enumerate(questions):
+                    st.markdown(f"**Q{i+1}: {q}**")
+                    answer = st.session_state["interview_answers"].get(i, "No answer provided")
+                    feedback = st.session_state["interview_feedback"].get(i, "No feedback available")
+                    st.write(f"**Your Answer:** {answer}")
+                    st.write(f"**Feedback:** {feedback}")
             if st.button("Reset Practice"):
+                # Only this tool's state: under the launcher every tool shares the
+                # session. The record of served questions (seen_interview_ids) is
+                # kept so practice rounds do not repeat.
                 for key in list(st.session_state.keys()):
-                    del st.session_state[key]
+                    if key.startswith("interview_"):
+                        del st.session_state[key]
 
 if __name__ == "__main__":
     interview_prep_app()
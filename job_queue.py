@@ -0,0 +1,218 @@
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+
+# -------------------- CONFIGURATION --------------------
+# Jobs live in a SQLite table shared by the app servers and the workers
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "jobs.sqlite3")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+POLL_INTERVAL = 0.5  # seconds between checks for new jobs in an idle worker
+
+_current_job_id = None
+_workers = []
+_workers_lock = threading.Lock()
+
+# -------------------- JOB TABLE --------------------
+def _connect():
+    conn = sqlite3.connect(JOB_DB_PATH, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            task TEXT NOT NULL,
+            args TEXT NOT NULL,
+            status TEXT NOT NULL,
+            progress REAL DEFAULT 0,
+            message TEXT,
+            result TEXT,
+            partial TEXT,
+            error TEXT,
+            worker_pid INTEGER,
+            created_at REAL,
+            started_at REAL,
+            finished_at REAL
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+    try:
+        # Tables created before partial results were supported
+        conn.execute("ALTER TABLE jobs ADD COLUMN partial TEXT")
+    except sqlite3.OperationalError:
+        pass
+    return conn
+
+def _row_to_job(row):
+    job = dict(row)
+    job["args"] = json.loads(job["args"])
+    job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+    job["partial"] = json.loads(job["partial"]) if job["partial"] is not None else None
+    return job
+
+def submit_job(task, *args, **kwargs):
+    """
+    Queues `task` ("module:function") to run in a worker process with the given
+    JSON-serializable arguments. Returns the job id.
+    """
+    job_id = uuid.uuid4().hex
+    conn = _connect()
+    try:
+        conn.execute(
+            "INSERT INTO jobs (id, task, args, status, created_at) VALUES (?, ?, ?, 'queued', ?)",
+            (job_id, task, json.dumps({"args": args, "kwargs": kwargs}), time.time()),
+        )
+    finally:
+        conn.close()
+    return job_id
+
+def get_job(job_id):
+    """
+    Returns the job as a dict (status is one of queued, running, done, failed),
+    or None if the id is unknown.
+    """
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    finally:
+        conn.close()
+    return _row_to_job(row) if row else None
+
+def list_jobs(task=None, limit=20):
+    conn = _connect()
+    try:
+        if task:
+            rows = conn.execute(
+                "SELECT * FROM jobs WHERE task = ? ORDER BY created_at DESC LIMIT ?", (task, limit)
+            ).fetchall()
+        else:
+            rows = conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+    finally:
+        conn.close()
+    return [_row_to_job(row) for row in rows]
+
+def report_progress(progress, message=None, partial=None):
+    """
+    Records progress (0..1) for the job running in this worker, optionally with
+    a JSON-serializable partial result the UI can show before the job finishes.
+    Does nothing when called outside a job, so task functions can call it
+    unconditionally.
+    """
+    if _current_job_id is None:
+        return
+    conn = _connect()
+    try:
+        conn.execute(
+            "UPDATE jobs SET progress = ?, message = ?, partial = COALESCE(?, partial) WHERE id = ?",
+            (max(0.0, min(1.0, progress)), message,
+             json.dumps(partial) if partial is not None else None, _current_job_id),
+        )
+    finally:
+        conn.close()
+
+# -------------------- WORKERS --------------------
+def _claim_next_job(conn):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+        ).fetchone()
+        if row is not None:
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker_pid = ?, started_at = ? WHERE id = ?",
+                (os.getpid(), time.time(), row["id"]),
+            )
+    finally:
+        conn.execute("COMMIT")
+    return _row_to_job(row) if row else None
+
+def _resolve_task(task):
+    module_name, function_name = task.split(":", 1)
+    return getattr(importlib.import_module(module_name), function_name)
+
+def run_worker():
+    """
+    Worker loop: claims queued jobs one at a time and stores their results.
+    """
+    global _current_job_id
+    conn = _connect()
+    while True:
+        job = _claim_next_job(conn)
+        if job is None:
+            time.sleep(POLL_INTERVAL)
+            continue
+        _current_job_id = job["id"]
+        try:
+            result = _resolve_task(job["task"])(*job["args"]["args"], **job["args"]["kwargs"])
+            conn.execute(
+                "UPDATE jobs SET status = 'done', progress = 1, result = ?, finished_at = ? WHERE id = ?",
+                (json.dumps(result), time.time(), job["id"]),
+            )
+        except Exception as e:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+                (f"{e}\n{traceback.format_exc()}", time.time(), job["id"]),
+            )
+        finally:
+            _current_job_id = None
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    return True
+
+def requeue_orphaned_jobs():
+    """
+    Puts jobs whose worker process died back in the queue.
+    """
+    conn = _connect()
+    try:
+        rows = conn.execute("SELECT id, worker_pid FROM jobs WHERE status = 'running'").fetchall()
+        for row in rows:
+            if row["worker_pid"] is None or not _pid_alive(row["worker_pid"]):
+                conn.execute(
+                    "UPDATE jobs SET status = 'queued', worker_pid = NULL, progress = 0 WHERE id = ? AND status = 'running'",
+                    (row["id"],),
+                )
+    finally:
+        conn.close()
+
+def start_workers(n=JOB_WORKERS):
+    """
+    Starts `n` worker processes for this server process (once; later calls
+    only replace workers that have exited). Workers are spawned rather than
+    forked so they do not inherit the Streamlit server's threads.
+    """
+    with _workers_lock:
+        alive = [p for p in _workers if p.is_alive()]
+        if len(alive) < n:
+            requeue_orphaned_jobs()
+            ctx = multiprocessing.get_context("spawn")
+            for _ in range(n - len(alive)):
+                process = ctx.Process(target=run_worker, daemon=True)
+                process.start()
+                alive.append(process)
+        _workers[:] = alive
+    return len(_workers)
+
+if __name__ == "__main__":
+    # Standalone worker pool: python job_queue.py --workers 8
+    parser = argparse.ArgumentParser(description="Run background job workers.")
+    parser.add_argument("--workers", type=int, default=JOB_WORKERS)
+    options = parser.parse_args()
+    requeue_orphaned_jobs()
+    processes = [multiprocessing.Process(target=run_worker) for _ in range(options.workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
@@ -0,0 +1,54 @@
+import time
+import streamlit as st
+
+from job_queue import get_job, start_workers, submit_job
+
+# While a tracked job is running the page reruns itself at this interval
+JOB_POLL_SECONDS = 1.0
+
+def submit_tracked_job(key, task, *args, **kwargs):
+    """
+    Submits a background job and remembers its id under `key` in the session
+    and in the page URL, so a browser refresh can pick the job up again.
+    """
+    start_workers()
+    job_id = submit_job(task, *args, **kwargs)
+    st.session_state[key] = job_id
+    st.query_params[key] = job_id
+    return job_id
+
+def tracked_job_id(key):
+    return st.session_state.get(key) or st.query_params.get(key)
+
+def clear_tracked_job(key):
+    st.session_state.pop(key, None)
+    if key in st.query_params:
+        del st.query_params[key]
+
+def wait_for_job(key, label, show_partial=None):
+    """
+    Shows the status of the job tracked under `key`. Returns the finished job
+    (with its "result"), or None if there is no job, it failed, or it is still
+    running, in which case the page polls by rerunning. While running, any
+    partial result is passed to show_partial.
+    """
+    job_id = tracked_job_id(key)
+    if not job_id:
+        return None
+    job = get_job(job_id)
+    if job is None:
+        clear_tracked_job(key)
+        return None
+    if job["status"] in ("queued", "running"):
+        # Make sure this server has workers, e.g. after a restart
+        start_workers()
+        status = job["message"] or ("Waiting for a worker" if job["status"] == "queued" else "Working")
+        st.progress(job["progress"] or 0.0, text=f"{label}: {status}...")
+        if show_partial and job["partial"] is not None:
+            show_partial(job["partial"])
+        time.sleep(JOB_POLL_SECONDS)
+        st.rerun()
+    if job["status"] == "failed":
+        st.error(f"{label} failed: {job['error'].splitlines()[0]}")
+        return None
+    return job
@@ -0,0 +1,56 @@
+import importlib
+
+import streamlit as st
+from dotenv import load_dotenv
+
+# Load environment variables (the model client reads GOOGLE_API_KEY)
+load_dotenv()
+
+# Every tool as a page of one app: `streamlit run launcher.py`. The tools
+# then share one process, and with it the model client and its request
+# pool (llm), the Streamlit and content caches, the PDF renderer and its
+# fonts, the FAISS indexes (faiss_store) and one set of job workers,
+# instead of loading their own copies in a server each.
+
+# Section -> (module, entry function, title, icon, URL path)
+TOOLS = {
+    "Study": (
+        ("notes", "ai_notes_generator_app", "Notes Generator", "📝", "notes"),
+        ("falshcard", "flashcard_generator_app", "Flashcards", "📚", "flashcards"),
+        ("quiz", "main", "Quiz Generator", "❓", "quiz"),
+        ("pathGenerator", "main", "Learning Path", "🧭", "learning-path"),
+        ("game", "library_game", "Study Quest", "🎮", "study-quest"),
+        ("chatpdf", "main", "Chat with PDF", "💬", "chat-pdf"),
+    ),
+    "Video": (
+        ("demo", "main", "YouTube Summarizer", "🎥", "youtube-summary"),
+        ("summerizer", "main", "YouTube Key Points", "📌", "youtube-key-points"),
+    ),
+    "Career": (
+        ("interview", "interview_prep_app", "Interview Preparation", "🚀", "interview"),
+        ("resume", "main", "Resume Ranking", "📄", "resume"),
+    ),
+    "Insights": (
+        ("dashboard", "main", "AI & Tech Dashboard", "📰", "dashboard"),
+        ("app", "main", "Heart Disease Prediction", "❤️", "heart-disease"),
+    ),
+}
+
+def tool_page(module, function, title, icon, url_path):
+    """
+    A page running a tool's entry function. The tool's module is imported
+    the first time its page is opened, so the launcher starts as fast as
+    one tool.
+    """
+    def run():
+        getattr(importlib.import_module(module), function)()
+    return st.Page(run, title=title, icon=icon, url_path=url_path)
+
+def main():
+    # Tools that set their own page config override this for their page
+    st.set_page_config(page_title="AI Study Tools", layout="centered")
+    pages = {section: [tool_page(*tool) for tool in tools] for section, tools in TOOLS.items()}
+    st.navigation(pages).run()
+
+if __name__ == "__main__":
+    main()
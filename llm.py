@@ -0,0 +1,252 @@
+import asyncio
+import functools
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+# The Gemini SDK takes about a second to import, so it is imported on first
+# use rather than when a page loads. Unless configure() is called, it
+# configures itself from GOOGLE_API_KEY.
+
+DEFAULT_MODEL = "gemini-1.5-pro"
+
+# Imported on first use (see get_model); apps warm it up as their page renders
+SDK_MODULE = "google.generativeai"
+
+# Requests in flight at once across the whole process (override with LLM_MAX_CONCURRENCY)
+MAX_CONCURRENT_REQUESTS = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+
+# Rate limiting and transient server errors are retried with exponential backoff
+# (see retryable_errors)
+MAX_RETRIES = 2
+RETRY_BACKOFF = 1.0
+
+_loop = None
+_loop_lock = threading.Lock()
+_request_slots = None
+_rest_executor = None
+
+# Transport/endpoint set with configure(); empty means the SDK defaults
+_client_settings = {}
+
+# -------------------- CLIENT SETTINGS --------------------
+def configure(api_key=None, transport=None, api_endpoint=None):
+    """
+    Points the SDK at another transport or endpoint, e.g. transport="rest"
+    where gRPC is blocked, or a local stub server (see benchmarks/).
+    """
+    import google.generativeai as genai
+
+    global _client_settings
+    settings = {}
+    if transport:
+        settings["transport"] = transport
+    if api_endpoint:
+        settings["client_options"] = {"api_endpoint": api_endpoint}
+    genai.configure(api_key=api_key or os.getenv("GOOGLE_API_KEY"), **settings)
+    _client_settings = settings
+
+def client_settings():
+    """
+    The configure() settings as keyword arguments for clients built outside
+    the SDK's default client, e.g. LangChain's Gemini models.
+    """
+    return dict(_client_settings)
+
+def _get_rest_executor():
+    global _rest_executor
+    with _loop_lock:
+        if _rest_executor is None:
+            _rest_executor = ThreadPoolExecutor(MAX_CONCURRENT_REQUESTS, thread_name_prefix="llm-rest")
+    return _rest_executor
+
+# -------------------- EVENT LOOP --------------------
+def get_loop():
+    """
+    Returns the process-wide event loop that all generation runs on, started
+    on a daemon thread the first time it is needed. Keeping one loop for the
+    life of the process lets the SDK reuse its async client, which is bound to
+    the loop it was created on.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="llm-event-loop", daemon=True).start()
+            _loop = loop
+    return _loop
+
+def run(coro, timeout=None):
+    """
+    Sync shim for Streamlit scripts and job workers: runs a coroutine on the
+    shared loop and returns its result. The coroutine is cancelled if the
+    wait times out or is interrupted.
+    """
+    future = asyncio.run_coroutine_threadsafe(coro, get_loop())
+    try:
+        return future.result(timeout)
+    except BaseException:
+        future.cancel()
+        raise
+
+@functools.lru_cache(maxsize=None)
+def retryable_errors():
+    from google.api_core import exceptions as api_exceptions
+
+    return (
+        api_exceptions.ResourceExhausted,
+        api_exceptions.ServiceUnavailable,
+        api_exceptions.DeadlineExceeded,
+        api_exceptions.InternalServerError,
+    )
+
+def get_model(name=DEFAULT_MODEL):
+    """
+    genai.GenerativeModel(name), importing the SDK on first use.
+    """
+    import google.generativeai as genai
+
+    return genai.GenerativeModel(name)
+
+# -------------------- TRACED SYNC CALLS --------------------
+def model_label(model):
+    return getattr(model, "model_name", "-").removeprefix("models/")
+
+def generate_content(model, contents, tool, operation="generate", **kwargs):
+    """
+    model.generate_content(contents, **kwargs), recorded in the metrics under
+    tool/operation. Streamed responses are timed until the stream opens, and
+    only their prompt size is recorded.
+    """
+    with metrics.trace(tool, operation, model_label(model)) as span:
+        response = model.generate_content(contents, **kwargs)
+        if kwargs.get("stream"):
+            span.set_usage(prompt=contents)
+        else:
+            span.set_usage(response, prompt=contents)
+    return response
+
+def embed_content(tool, operation="embed", **kwargs):
+    """
+    genai.embed_content(**kwargs), recorded in the metrics under tool/operation.
+    """
+    import google.generativeai as genai
+
+    with metrics.trace(tool, operation, str(kwargs.get("model", "-")).removeprefix("models/")) as span:
+        result = genai.embed_content(**kwargs)
+        span.set_usage(prompt=kwargs.get("content"))
+    return result
+
+# -------------------- ASYNC API --------------------
+async def generate(prompt, model=DEFAULT_MODEL, generation_config=None, timeout=None, *,
+                   tool, operation="generate"):
+    """
+    Generates a response and returns its text, recording the call in the
+    metrics under tool/operation. At most MAX_CONCURRENT_REQUESTS calls are in
+    flight at once; further calls wait for a slot. Transient errors are
+    retried up to MAX_RETRIES times.
+    """
+    global _request_slots
+    if _request_slots is None:
+        _request_slots = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            async with _request_slots:
+                with metrics.trace(tool, operation, model) as span:
+                    client = get_model(model)
+                    if _client_settings.get("transport") == "rest":
+                        # The SDK's async client has no REST transport, so the
+                        # blocking call runs on a thread instead
+                        call = asyncio.get_running_loop().run_in_executor(
+                            _get_rest_executor(),
+                            functools.partial(client.generate_content, prompt, generation_config=generation_config),
+                        )
+                    else:
+                        call = client.generate_content_async(prompt, generation_config=generation_config)
+                    response = await asyncio.wait_for(call, timeout)
+                    text = response.text
+                    span.set_usage(response, prompt=prompt, text=text)
+            return text
+        except retryable_errors():
+            if attempt == MAX_RETRIES:
+                raise
+            metrics.record_retry(tool, operation)
+            await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+
+async def _limited(awaitable, limit):
+    try:
+        if limit is None:
+            return await awaitable
+        async with limit:
+            return await awaitable
+    except asyncio.CancelledError:
+        # Close coroutines cancelled while waiting for a slot so they are not
+        # reported as never awaited
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise
+
+async def gather(awaitables, limit=None, return_exceptions=False):
+    """
+    Awaits all of `awaitables` with at most `limit` running at once and
+    returns their results in order. Unless return_exceptions is set, the
+    first failure cancels the rest and is raised.
+    """
+    limit = asyncio.Semaphore(limit) if limit else None
+    tasks = [asyncio.ensure_future(_limited(awaitable, limit)) for awaitable in awaitables]
+    try:
+        return await asyncio.gather(*tasks, return_exceptions=return_exceptions)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+# -------------------- SYNC HELPERS --------------------
+def generate_sync(prompt, **kwargs):
+    return run(generate(prompt, **kwargs))
+
+def generate_many(prompts, limit=None, return_exceptions=False, **kwargs):
+    """
+    Generates a response for each prompt concurrently; returns their texts
+    in prompt order.
+    """
+    return run(gather([generate(prompt, **kwargs) for prompt in prompts], limit, return_exceptions))
+
+def iter_completed(awaitables, limit=None):
+    """
+    Runs awaitables (e.g. generate(...) calls) concurrently on the shared loop
+    and yields (index, result) in completion order, so callers can show each
+    result as it arrives. A failed call yields its exception as the result.
+    Closing the generator early cancels whatever is still running.
+    """
+    awaitables = list(awaitables)
+    results = queue.Queue()
+
+    async def run_all():
+        slots = asyncio.Semaphore(limit) if limit else None
+
+        async def run_one(i, awaitable):
+            try:
+                results.put((i, await _limited(awaitable, slots)))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                results.put((i, e))
+
+        await asyncio.gather(*(run_one(i, awaitable) for i, awaitable in enumerate(awaitables)))
+
+    future = asyncio.run_coroutine_threadsafe(run_all(), get_loop())
+    try:
+        for _ in awaitables:
+            while True:
+                try:
+                    yield results.get(timeout=0.1)
+                    break
+                except queue.Empty:
+                    if future.done():
+                        future.result()
+    finally:
+        future.cancel()
@@ -0,0 +1,329 @@
+import argparse
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Every model/embedding/index call and cache lookup is appended here as one JSON
+# line, so calls made by job workers and other server processes can be
+# aggregated too (override with METRICS_LOG_PATH; set it empty to disable)
+METRICS_LOG_PATH = os.getenv("METRICS_LOG_PATH", "metrics.jsonl")
+# Events are buffered and appended by a background thread every
+# METRICS_FLUSH_INTERVAL seconds, or as soon as METRICS_FLUSH_LINES are waiting
+METRICS_FLUSH_INTERVAL = 1.0
+METRICS_FLUSH_LINES = 200
+# Once the log reaches this size it is moved to <path>.1 (replacing the
+# previous one) and a new log is started
+METRICS_LOG_MAX_BYTES = int(os.getenv("METRICS_LOG_MAX_BYTES", 50 * 1024 * 1024))
+
+# When set, this process serves its metrics in Prometheus text format on the port
+METRICS_PORT = os.getenv("METRICS_PORT")
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TOKEN_BUCKETS = (16, 64, 256, 1024, 4096, 16384, 65536, 262144)
+
+# Rough characters per token, used when a response carries no usage metadata
+CHARS_PER_TOKEN = 4
+
+_lock = threading.Lock()
+_log_lock = threading.Lock()
+_server_started = False
+# Log lines not yet written, and whether the thread writing them is running
+_pending = []
+_flush_requested = threading.Event()
+_writer_started = False
+
+# -------------------- REGISTRY --------------------
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """
+        Estimates a quantile as the upper bound of the bucket containing it.
+        """
+        if not self.count:
+            return None
+        target, seen = q * self.count, 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+class Registry:
+    """
+    Histograms and counters keyed by metric name and label values.
+    """
+
+    HISTOGRAMS = {
+        "llm_request_duration_seconds": ("Model, embedding and index call latency", LATENCY_BUCKETS),
+        "llm_prompt_tokens": ("Prompt tokens per call", TOKEN_BUCKETS),
+        "llm_response_tokens": ("Response tokens per call", TOKEN_BUCKETS),
+    }
+    COUNTERS = {
+        "llm_requests_total": "Model, embedding and index calls",
+        "llm_retries_total": "Calls retried after a transient error",
+        "cache_requests_total": "Cache lookups",
+        "events_total": "Other notable events, e.g. unparseable model output",
+    }
+
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        if key not in self.histograms:
+            self.histograms[key] = Histogram(self.HISTOGRAMS[name][1])
+        self.histograms[key].observe(value)
+
+    def increment(self, name, labels, amount=1):
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    def apply(self, event):
+        """
+        Updates the metrics from one logged event (see _emit).
+        """
+        kind = event["type"]
+        if kind == "call":
+            labels = {key: event[key] for key in ("tool", "operation", "model")}
+            self.increment("llm_requests_total", {**labels, "status": event["status"]})
+            self.observe("llm_request_duration_seconds", labels, event["duration"])
+            if event.get("prompt_tokens") is not None:
+                self.observe("llm_prompt_tokens", labels, event["prompt_tokens"])
+            if event.get("response_tokens") is not None:
+                self.observe("llm_response_tokens", labels, event["response_tokens"])
+        elif kind == "retry":
+            self.increment("llm_retries_total", {"tool": event["tool"], "operation": event["operation"]})
+        elif kind == "cache":
+            self.increment("cache_requests_total", {"cache": event["cache"], "result": event["result"]})
+        elif kind == "event":
+            self.increment("events_total", {"tool": event["tool"], "event": event["event"]})
+
+    def render_prometheus(self):
+        lines = []
+        for name, (help_text, _) in self.HISTOGRAMS.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+            for (metric, labels), histogram in sorted(self.histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum:g}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        for name, help_text in self.COUNTERS.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for (metric, labels), value in sorted(self.counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """
+        The metrics as JSON-serializable dicts, with p50/p95 estimates for
+        each histogram.
+        """
+        return {
+            "histograms": [
+                {
+                    "name": name, "labels": dict(labels), "count": h.count, "sum": h.sum,
+                    "p50": h.quantile(0.5), "p95": h.quantile(0.95),
+                }
+                for (name, labels), h in sorted(self.histograms.items())
+            ],
+            "counters": [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self.counters.items())
+            ],
+        }
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (f'{key}="{str(value)}"'.replace("\n", " ") for key, value in labels)
+    return "{" + ",".join(escaped) + "}"
+
+registry = Registry()
+
+def _emit(event):
+    global _server_started, _writer_started
+    event["ts"] = time.time()
+    line = json.dumps(event) + "\n" if METRICS_LOG_PATH else None
+    with _lock:
+        registry.apply(event)
+        start_server = METRICS_PORT and not _server_started
+        _server_started = _server_started or bool(start_server)
+        start_writer = line is not None and not _writer_started
+        _writer_started = _writer_started or start_writer
+        if line is not None:
+            _pending.append(line)
+            if len(_pending) >= METRICS_FLUSH_LINES:
+                _flush_requested.set()
+    if start_server:
+        start_metrics_server(int(METRICS_PORT))
+    if start_writer:
+        threading.Thread(target=_log_writer, name="metrics-log", daemon=True).start()
+        atexit.register(flush_log)
+
+def _log_writer():
+    while True:
+        _flush_requested.wait(METRICS_FLUSH_INTERVAL)
+        _flush_requested.clear()
+        flush_log()
+
+def flush_log():
+    """
+    Appends the buffered events to the metrics log, first rotating the log
+    if it has reached METRICS_LOG_MAX_BYTES.
+    """
+    with _log_lock:
+        with _lock:
+            lines = _pending[:]
+            _pending.clear()
+        if not lines:
+            return
+        try:
+            if os.path.getsize(METRICS_LOG_PATH) >= METRICS_LOG_MAX_BYTES:
+                os.replace(METRICS_LOG_PATH, METRICS_LOG_PATH + ".1")
+        except OSError:
+            pass  # No log yet, or another process rotated it first
+        with open(METRICS_LOG_PATH, "a", encoding="utf-8") as f:
+            f.write("".join(lines))
+
+# -------------------- RECORDING --------------------
+class Span:
+    def __init__(self, tool, operation, model):
+        self.tool = tool
+        self.operation = operation
+        self.model = model
+        self.prompt_tokens = None
+        self.response_tokens = None
+        self.estimated = False
+
+    def set_usage(self, response=None, prompt=None, text=None):
+        """
+        Records token counts from a response's usage metadata, or estimates
+        them from the prompt and response text when there is none.
+        """
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None and getattr(usage, "prompt_token_count", None):
+            self.prompt_tokens = usage.prompt_token_count
+            self.response_tokens = getattr(usage, "candidates_token_count", None)
+            return
+        self.estimated = True
+        if prompt is not None:
+            self.prompt_tokens = len(str(prompt)) // CHARS_PER_TOKEN
+        if text is not None:
+            self.response_tokens = len(str(text)) // CHARS_PER_TOKEN
+
+@contextmanager
+def trace(tool, operation, model="-"):
+    """
+    Times the enclosed call and records it under (tool, operation, model),
+    with status "error" if it raises. Token counts are added with
+    span.set_usage().
+    """
+    span = Span(tool, operation, model)
+    status = "ok"
+    start = time.perf_counter()
+    try:
+        yield span
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        _emit({
+            "type": "call", "tool": tool, "operation": operation, "model": model, "status": status,
+            "duration": time.perf_counter() - start, "prompt_tokens": span.prompt_tokens,
+            "response_tokens": span.response_tokens, "estimated": span.estimated,
+        })
+
+def record_retry(tool, operation):
+    _emit({"type": "retry", "tool": tool, "operation": operation})
+
+def record_cache(cache, hit):
+    _emit({"type": "cache", "cache": cache, "result": "hit" if hit else "miss"})
+
+def record_event(tool, event, **details):
+    _emit({"type": "event", "tool": tool, "event": event, **details})
+
+# -------------------- EXPORT --------------------
+def render_prometheus():
+    with _lock:
+        return registry.render_prometheus()
+
+def snapshot():
+    with _lock:
+        return registry.snapshot()
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def start_metrics_server(port):
+    """
+    Serves this process's metrics on http://0.0.0.0:<port>/ from a daemon
+    thread. Returns False if the port is taken (e.g. by another worker).
+    """
+    try:
+        server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    except OSError:
+        return False
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return True
+
+def load_log(path=METRICS_LOG_PATH):
+    """
+    Rebuilds metrics for all processes from a metrics log and, when there is
+    one, the log it last rotated out.
+    """
+    aggregate = Registry()
+    for log_path in (path + ".1", path):
+        if log_path != path and not os.path.exists(log_path):
+            continue
+        with open(log_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    aggregate.apply(json.loads(line))
+                except (json.JSONDecodeError, KeyError):
+                    continue  # Partially written line
+    return aggregate
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aggregate the metrics log of all app processes")
+    parser.add_argument("path", nargs="?", default=METRICS_LOG_PATH or "metrics.jsonl")
+    parser.add_argument("--format", choices=("prometheus", "json"), default="prometheus")
+    args = parser.parse_args()
+    aggregate = load_log(args.path)
+    if args.format == "json":
+        print(json.dumps(aggregate.snapshot(), indent=2))
+    else:
+        print(aggregate.render_prometheus(), end="")
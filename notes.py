@@ -1,16 +1,17 @@
 import streamlit as st
 import json
-import os
-import requests
-import tempfile
-import re
-import google.generativeai as genai
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from fpdf import FPDF
+
+import llm
+from image_cache import get_image
+from pdf_renderer import render_pdf, add_title, get_font_family, pdf_text
+from job_queue import report_progress
+from job_ui import submit_tracked_job, wait_for_job
+from startup import warm_up
 
 # -------------------- SETUP --------------------
 load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 
 # -------------------- GENAI PROMPT --------------------
 def generate_notes(topic, detail_level):
@@ -30,8 +31,8 @@ def generate_notes(topic, detail_level):
     Output valid JSON with exactly two keys: 'notes' (string) and 'images' (list of URLs).
     """
 
-    model = genai.GenerativeModel("gemini-1.5-pro")
-    response = model.generate_content(prompt)
+    model = llm.get_model("gemini-1.5-pro")
+    response = llm.generate_content(model, prompt, tool="notes")
     return response.text
 
 # -------------------- OUTPUT CLEANING --------------------
@@ -64,177 +65,141 @@ def extract_json_from_text(text):
             return None
     return None
 
-# -------------------- IMAGE VALIDATION --------------------
-def is_valid_image_url(url, timeout=3):
+# -------------------- IMAGE FETCHING --------------------
+IMAGE_FETCH_WORKERS = 8
+
+def fetch_images(urls):
     """
-    Checks if the URL returns status code 200 and the content is an image.
+    Fetches all candidate image URLs concurrently from the shared image cache
+    (one GET per URL on a miss) and returns the valid images in their
+    original order.
     """
-    try:
-        resp = requests.head(url, timeout=timeout)
-        if resp.status_code == 200:
-            content_type = resp.headers.get("Content-Type", "")
-            if "image" in content_type.lower():
-                return True
-    except Exception:
-        pass
-    return False
+    urls = list(dict.fromkeys(url for url in urls if isinstance(url, str)))
+    if not urls:
+        return []
+    with ThreadPoolExecutor(max_workers=min(IMAGE_FETCH_WORKERS, len(urls))) as executor:
+        results = list(executor.map(get_image, urls))
+    return [image for image in results if image is not None]
 
 # -------------------- ENCODING FIX --------------------
 def fix_encoding(text):
     """
-    Replaces common smart punctuation and other Unicode characters
-    with ASCII equivalents to avoid Latin-1 encoding errors in FPDF.
+    Prepares text for the PDF font. With the bundled Unicode font the text is
+    kept as-is (only characters the font cannot hold are dropped); the lossy
+    Latin-1 conversion is applied only if the built-in font is in use.
     """
-    replacements = {
-        "\u201c": '"',  # left double quote
-        "\u201d": '"',  # right double quote
-        "\u2018": "'",  # left single quote
-        "\u2019": "'",  # right single quote
-        "\u2013": "-",  # en dash
-        "\u2014": "-",  # em dash
-        "\u2026": "...",# ellipsis
-    }
-    for orig, repl in replacements.items():
-        text = text.replace(orig, repl)
-    # Replace or remove non-Latin-1 characters
-    text = text.encode("latin-1", "replace").decode("latin-1")
-    return text
+    return pdf_text(text)
 
 # -------------------- PDF GENERATION --------------------
-def fix_encoding(text):
-    """
-    Replaces common smart punctuation and other Unicode characters with ASCII equivalents.
-    """
-    replacements = {
-        "\u201c": '"',
-        "\u201d": '"',
-        "\u2018": "'",
-        "\u2019": "'",
-        "\u2013": "-",
-        "\u2014": "-",
-        "\u2026": "..."
-    }
-    for orig, repl in replacements.items():
-        text = text.replace(orig, repl)
-    text = text.encode("latin-1", "replace").decode("latin-1")
-    return text
-
-def generate_pdf(content, image_urls=None):
+def generate_pdf(content, images=None):
     """
-    Generates a PDF file containing the provided text content and images.
-    Downloads each image (checking the Content-Type header to determine the file suffix)
-    and embeds it in the PDF.
+    Generates a PDF containing the provided text content and images.
+    Images are embedded from the image cache files returned by fetch_images,
+    so building the PDF does no network I/O.
     
     Parameters:
       - content (str): The text content to include in the PDF.
-      - image_urls (list): A list of image URLs.
+      - images (list): Images as returned by fetch_images.
     
     Returns:
-      - pdf_output_path (str): The file path of the generated PDF.
+      - bytes: The rendered PDF document.
     """
-    pdf = FPDF()
-    pdf.set_auto_page_break(auto=True, margin=15)
-    pdf.add_page()
-
-    # Title
-    pdf.set_font("Arial", style='B', size=16)
-    pdf.cell(200, 10, txt="AI Generated Study Notes", ln=True, align='C')
-    pdf.ln(10)
-
-    # Add text content with encoding fixes
-    fixed_content = fix_encoding(content)
-    pdf.set_font("Arial", size=12)
-    pdf.multi_cell(0, 10, fixed_content)
-
-    # Insert images if provided
-    if image_urls:
-        pdf.ln(10)
-        for img_url in image_urls:
-            try:
-                headers = {"User-Agent": "Mozilla/5.0"}
-                response = requests.get(img_url, stream=True, timeout=10, headers=headers)
-                if response.ok:
-                    # Determine the file suffix based on Content-Type header
-                    content_type = response.headers.get("Content-Type", "").lower()
-                    if "image/png" in content_type:
-                        suffix = ".png"
-                    elif "image/jpeg" in content_type or "image/jpg" in content_type:
-                        suffix = ".jpg"
+    def layout(pdf):
+        font_name = get_font_family()
+        add_title(pdf, "AI Generated Study Notes")
+
+        # Add text content with encoding fixes
+        fixed_content = fix_encoding(content)
+        pdf.set_font(font_name, size=12)
+        pdf.multi_cell(0, 10, fixed_content)
+
+        # Insert images if provided
+        if images:
+            pdf.ln(10)
+            width = pdf.w - 2 * pdf.l_margin
+            for image in images:
+                try:
+                    # Cached dimensions let us lay out the image without reading the file
+                    if image["width"] and image["height"]:
+                        height = width * image["height"] / image["width"]
+                        if pdf.get_y() + height > pdf.page_break_trigger:
+                            pdf.add_page()
+                        pdf.image(image["path"], x=15, w=width, h=height)
                     else:
-                        suffix = ".jpg"  # default fallback
+                        pdf.image(image["path"], x=15, w=width)
+                except Exception as e:
+                    pdf.ln(10)
+                    pdf.set_font(font_name, size=12)
+                    pdf.cell(200, 10, txt=f"Error embedding image: {str(e)}", ln=True, align='C')
 
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-                        for chunk in response.iter_content(chunk_size=1024):
-                            tmp.write(chunk)
-                        tmp_path = tmp.name
+    # Image files are named by content hash, so their paths identify the content
+    return render_pdf(layout, content, [image["path"] for image in images or []])
+
+# -------------------- BACKGROUND JOB --------------------
+def generate_study_notes(topic, detail_level):
+    """
+    Background job: generates the notes, parses the JSON output and downloads
+    the images (into the shared image cache).
+    Returns a dict with "notes" and valid "images" URLs, or "error" and "raw".
+    """
+    report_progress(0.1, "Generating notes")
+    cleaned_output = clean_ai_output(generate_notes(topic, detail_level))
+
+    # Attempt JSON parsing
+    try:
+        result_json = json.loads(cleaned_output)
+    except json.JSONDecodeError:
+        result_json = extract_json_from_text(cleaned_output)
+
+    if not result_json:
+        return {"error": "Failed to parse AI output. Here is the raw output:", "raw": cleaned_output}
+
+    report_progress(0.7, "Fetching images")
+    images = fetch_images(result_json.get("images", []))
+    return {
+        "notes": result_json.get("notes", "No notes provided."),
+        "images": [image["url"] for image in images],
+    }
 
-                    # Check if file is non-empty before adding
-                    if os.path.getsize(tmp_path) > 0:
-                        pdf.image(tmp_path, x=15, w=pdf.w - 2 * pdf.l_margin)
-                    else:
-                        pdf.ln(10)
-                        pdf.set_font("Arial", size=12)
-                        pdf.cell(200, 10, txt=f"Error: Downloaded image from {img_url} is empty.", ln=True, align='C')
-                    os.remove(tmp_path)
-                else:
-                    pdf.ln(10)
-                    pdf.set_font("Arial", size=12)
-                    pdf.cell(200, 10, txt=f"Error: Received status code {response.status_code} for image URL: {img_url}", ln=True, align='C')
-            except Exception as e:
-                pdf.ln(10)
-                pdf.set_font("Arial", size=12)
-                pdf.cell(200, 10, txt=f"Error fetching image: {str(e)}", ln=True, align='C')
-
-    pdf_output_path = "ai_study_notes.pdf"
-    pdf.output(pdf_output_path)
-    return pdf_output_path
 # -------------------- MAIN STREAMLIT APP --------------------
 def ai_notes_generator_app():
     st.title("📝 AI-Powered Notes Generator")
+    warm_up(llm.SDK_MODULE)
     st.write("Enter a topic and select the level of detail. The AI will generate comprehensive study notes along with valid images. You can also download the generated notes as a PDF.")
 
     topic = st.text_input("Enter the topic:")
     detail_level = st.selectbox("Select level of detail:", ["Brief", "Moderate", "Detailed"])
 
     if st.button("Generate Notes") and topic:
-        with st.spinner("Generating notes..."):
-            raw_output = generate_notes(topic, detail_level)
-            cleaned_output = clean_ai_output(raw_output)
-
-            # Attempt JSON parsing
-            try:
-                result_json = json.loads(cleaned_output)
-            except json.JSONDecodeError:
-                result_json = extract_json_from_text(cleaned_output)
-            
-            if not result_json:
-                st.error("Failed to parse AI output. Here is the raw output:")
-                st.text(cleaned_output)
-                return
-
-            # Extract notes and images
-            notes = result_json.get("notes", "No notes provided.")
-            images = result_json.get("images", [])
-
-            # Display the notes
-            st.subheader("Generated Notes")
-            st.markdown(notes)
-
-            # Validate and display images
-            st.subheader("Relevant Images")
-            valid_images = []
-            for img_url in images:
-                if is_valid_image_url(img_url):
-                    valid_images.append(img_url)
-                    st.image(img_url, use_column_width=True)
-
-            if not valid_images:
-                st.info("No valid image URLs were provided or found.")
-
-            # Generate the PDF
-            pdf_path = generate_pdf(notes, valid_images)
-            with open(pdf_path, "rb") as f:
-                st.download_button("Download Notes as PDF", f, file_name="ai_study_notes.pdf")
+        submit_tracked_job("notes_job", "notes:generate_study_notes", topic, detail_level)
+
+    # Generation runs in the background job queue and survives reruns and page reloads
+    job = wait_for_job("notes_job", "Generating notes")
+    if not job:
+        return
+    result = job["result"]
+    if "error" in result:
+        st.error(result["error"])
+        st.text(result["raw"])
+        return
+
+    # Display the notes
+    notes = result["notes"]
+    st.subheader("Generated Notes")
+    st.markdown(notes)
+
+    # Display images (already downloaded into the image cache by the job)
+    st.subheader("Relevant Images")
+    valid_images = fetch_images(result["images"])
+    for image in valid_images:
+        st.image(image["path"], use_column_width=True)
+
+    if not valid_images:
+        st.info("No valid image URLs were provided or found.")
+
+    # Generate the PDF
+    pdf_bytes = generate_pdf(notes, valid_images)
+    st.download_button("Download Notes as PDF", pdf_bytes, file_name="ai_study_notes.pdf", mime="application/pdf")
 
 if __name__ == "__main__":
     ai_notes_generator_app()
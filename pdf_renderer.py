@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from fpdf import FPDF
+
+from content_store import single_flight
+from metrics import record_cache
+
+# Rendered documents kept in memory, keyed by a hash of their content
+PDF_CACHE_MAX_ENTRIES = 64
+
+# Unicode font bundled with the repo (DejaVu Sans, see fonts/LICENSE_DEJAVU)
+FONT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts")
+UNICODE_FONT_FAMILY = "DejaVu"
+UNICODE_FONT_FILES = {"": "DejaVuSans.ttf", "B": "DejaVuSans-Bold.ttf"}
+FALLBACK_FONT_FAMILY = "Arial"
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_fonts_available = None
+_fonts_lock = threading.Lock()
+
+# -------------------- FONT & PAGE TEMPLATE --------------------
+def _register_fonts(pdf):
+    """
+    Adds the bundled TTF fonts to a document. pyfpdf parses each TTF once and
+    keeps its metrics in a .pkl file beside it, which later documents load.
+    """
+    for style, filename in UNICODE_FONT_FILES.items():
+        pdf.add_font(UNICODE_FONT_FAMILY, style, os.path.join(FONT_DIR, filename), uni=True)
+
+def unicode_fonts_available():
+    """
+    Whether the bundled fonts load, checked once per process. When they do
+    not, documents use the built-in Latin-1 font.
+    """
+    global _fonts_available
+    with _fonts_lock:
+        if _fonts_available is None:
+            try:
+                _register_fonts(FPDF())
+                _fonts_available = True
+            except Exception:
+                _fonts_available = False
+    return _fonts_available
+
+def get_font_family():
+    return UNICODE_FONT_FAMILY if unicode_fonts_available() else FALLBACK_FONT_FAMILY
+
+def new_document():
+    """
+    Returns an FPDF document from the standard page template: fonts
+    registered, 15mm auto page break and the first page added.
+    """
+    pdf = FPDF()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    if unicode_fonts_available():
+        _register_fonts(pdf)
+    pdf.add_page()
+    return pdf
+
+def add_title(pdf, title):
+    """
+    Writes the centred bold title used at the top of every generated PDF.
+    """
+    pdf.set_font(get_font_family(), style='B', size=16)
+    pdf.cell(0, 10, txt=pdf_text(title), ln=True, align='C')
+    pdf.ln(10)
+
+def pdf_text(text):
+    """
+    Makes text safe for the active font: characters outside the Basic
+    Multilingual Plane (e.g. emoji) are dropped for the Unicode font, and the
+    Latin-1 fallback font replaces anything it cannot encode.
+    """
+    if unicode_fonts_available():
+        return "".join(ch for ch in text if ord(ch) <= 0xFFFF)
+    return text.encode("latin-1", "replace").decode("latin-1")
+
+# -------------------- RENDERING --------------------
+def pdf_to_bytes(pdf):
+    """
+    Serializes an FPDF document in memory (pyfpdf returns a Latin-1 string,
+    fpdf2 a bytearray).
+    """
+    output = pdf.output(dest="S")
+    if isinstance(output, str):
+        output = output.encode("latin-1")
+    return bytes(output)
+
+def content_key(layout, key_parts):
+    payload = json.dumps([layout.__module__, layout.__qualname__, key_parts], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def render_pdf(layout, *key_parts):
+    """
+    Calls layout(pdf) on a document from new_document() and returns the PDF as bytes.
+    Nothing touches the working directory, so concurrent sessions cannot
+    overwrite each other's output. Results are cached by a hash of the layout
+    function and `key_parts`, which must capture everything the layout uses;
+    concurrent identical renders share a single build. A layout that had to
+    fall back (e.g. an image could not be fetched) returns False, and that
+    render is not cached, so a later request can succeed.
+    """
+    key = content_key(layout, key_parts)
+    with _cache_lock:
+        data = _cache.get(key)
+        if data is not None:
+            _cache.move_to_end(key)
+    record_cache("pdf", data is not None)
+    if data is not None:
+        return data
+
+    def build():
+        pdf = new_document()
+        cacheable = layout(pdf) is not False
+        return pdf_to_bytes(pdf), cacheable
+
+    data, cacheable = single_flight(f"pdf:{key}", build)
+    if cacheable:
+        with _cache_lock:
+            _cache[key] = data
+            while len(_cache) > PDF_CACHE_MAX_ENTRIES:
+                _cache.popitem(last=False)
+    return data
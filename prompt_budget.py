@@ -0,0 +1,168 @@
+import math
+import re
+from collections import Counter
+
+from document_index import tokenize
+from metrics import CHARS_PER_TOKEN, record_event
+
+# Most tokens of context (documents, transcripts, notes) each tool may send
+# in one prompt. Instructions and output formats come on top of this.
+TOOL_BUDGETS = {
+    "chatpdf": 4000,          # all retrieved chunks together
+    "flashcards": 6000,       # study notes (a chunked-mode section is ~2000)
+    "quiz": 1500,             # the excerpts behind one PDF question
+    "resume": 1200,           # one resume
+    "job_description": 600,
+    "video_summary": 1250,    # transcript before it is split into parts
+    "summarizer": 750,
+}
+DEFAULT_BUDGET = 2000
+
+# Page labels ("Page 3 of 12", "- 7 -", "3/12") repeat on every page of an
+# extracted PDF; once one has occurred this many times the rest are dropped
+REPEATED_LINE_MIN_COUNT = 3
+PAGE_LABEL = re.compile(r"^(?:page|p\.)?\s*#\s*(?:(?:of|/)\s*#)?$")
+
+# Unpunctuated text (e.g. auto-generated captions) is cut into segments of
+# this many words for sentence selection
+SEGMENT_WORDS = 40
+
+# How much a query term match counts against a sentence's centrality (0..1)
+QUERY_WEIGHT = 2.0
+
+def count_tokens(text):
+    """
+    Estimates the tokens in `text` with the same heuristic the metrics use,
+    without a call to the model's token counter.
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def budget_for(tool):
+    return TOOL_BUDGETS.get(tool, DEFAULT_BUDGET)
+
+# -------------------- COMPRESSION --------------------
+def normalize_whitespace(text):
+    text = re.sub(r"[ \t\r\f\v]+", " ", text)
+    text = "\n".join(line.strip() for line in text.split("\n"))
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+def _page_label_key(line):
+    """
+    The line with its numbers replaced by "#" if it is a page label, else None.
+    """
+    key = re.sub(r"\d+", "#", line.lower()).strip(" -–—|·.")
+    return key if PAGE_LABEL.match(key) else None
+
+def dedupe_lines(text):
+    """
+    Drops repeated lines: exact repeats (ignoring case), and page labels
+    such as "Page 3 of 12" once that label has occurred
+    REPEATED_LINE_MIN_COUNT times. Lines that merely share a pattern, like
+    table rows or numbered steps, are all kept. Blank lines are kept.
+    """
+    lines = text.split("\n")
+    labels = Counter(_page_label_key(line) for line in lines if line)
+    seen, seen_labels, kept = set(), set(), []
+    for line in lines:
+        if not line:
+            kept.append(line)
+            continue
+        key = line.lower()
+        label = _page_label_key(line)
+        if key in seen:
+            continue
+        if label is not None and labels[label] >= REPEATED_LINE_MIN_COUNT and label in seen_labels:
+            continue
+        seen.add(key)
+        seen_labels.add(label)
+        kept.append(line)
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(kept)).strip()
+
+def compress(text):
+    """
+    Normalizes whitespace and drops repeated lines; no content is selected
+    away. fit_context only does this to text that is over its budget.
+    """
+    return dedupe_lines(normalize_whitespace(text))
+
+def _segments(text):
+    """
+    Splits text into (paragraph number, sentence) pairs, cutting sentences
+    without punctuation into SEGMENT_WORDS-word pieces.
+    """
+    segments = []
+    for paragraph_id, paragraph in enumerate(text.split("\n")):
+        for sentence in re.split(r"(?<=[.!?])\s+", paragraph):
+            words = sentence.split()
+            if len(words) > 2 * SEGMENT_WORDS:
+                for start in range(0, len(words), SEGMENT_WORDS):
+                    segments.append((paragraph_id, " ".join(words[start:start + SEGMENT_WORDS])))
+            elif words:
+                segments.append((paragraph_id, sentence))
+    return segments
+
+def select_sentences(text, budget, query=None):
+    """
+    Extractive pre-selection: keeps the sentences that best represent the
+    text (whose terms are most frequent across it) and, when a query is
+    given, that share the most terms with it, until `budget` tokens are
+    used. Kept sentences stay in their original order.
+    """
+    segments = _segments(text)
+    terms = [tokenize(sentence) for _, sentence in segments]
+    frequency = Counter(term for sentence_terms in terms for term in set(sentence_terms))
+    top = max(frequency.values(), default=1)
+    query_terms = set(tokenize(query)) if query else set()
+    scores = []
+    for sentence_terms in terms:
+        unique = set(sentence_terms)
+        centrality = sum(frequency[term] for term in unique) / (top * len(unique)) if unique else 0.0
+        relevance = len(unique & query_terms) / len(query_terms) if query_terms else 0.0
+        scores.append(centrality + QUERY_WEIGHT * relevance)
+
+    keep, used = set(), 0
+    for i in sorted(range(len(segments)), key=lambda i: -scores[i]):
+        cost = count_tokens(segments[i][1]) + 1
+        if used + cost <= budget:
+            keep.add(i)
+            used += cost
+    paragraphs = {}
+    for i in sorted(keep):
+        paragraph_id, sentence = segments[i]
+        paragraphs.setdefault(paragraph_id, []).append(sentence)
+    return "\n".join(" ".join(sentences) for sentences in paragraphs.values())
+
+def fit_context(text, tool, query=None, budget=None):
+    """
+    Prepares context for a prompt. Text within the tool's token budget is
+    only whitespace-normalized. Text over it is compressed and, if it is
+    still over, cut down to the sentences that best fit the budget (see
+    select_sentences).
+    """
+    budget = budget_for(tool) if budget is None else budget
+    # Text that fits is sent whole, only with its whitespace normalized
+    normalized = normalize_whitespace(text)
+    if count_tokens(normalized) <= budget:
+        return normalized
+    compressed = dedupe_lines(normalized)
+    if count_tokens(compressed) <= budget:
+        return compressed
+    selected = select_sentences(compressed, budget, query)
+    record_event(
+        tool, "context_trimmed", tokens_before=count_tokens(text), tokens_after=count_tokens(selected), budget=budget
+    )
+    return selected
+
+def fit_contexts(texts, tool, query=None, budget=None):
+    """
+    fit_context for several pieces of context sharing one budget (e.g.
+    retrieved chunks). Pieces are fitted smallest first, and whatever a
+    piece leaves of its equal share goes to the pieces after it.
+    """
+    texts = [normalize_whitespace(text) for text in texts]
+    remaining = budget_for(tool) if budget is None else budget
+    fitted = [None] * len(texts)
+    for n, i in enumerate(sorted(range(len(texts)), key=lambda i: len(texts[i]))):
+        fitted[i] = fit_context(texts[i], tool, query, remaining // (len(texts) - n))
+        remaining -= count_tokens(fitted[i])
+    return fitted
@@ -0,0 +1,310 @@
+import json
+import difflib
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+import llm
+from content_store import acquire_lease, release_lease
+from metrics import record_cache
+
+# Generated questions kept for reuse (override with QUESTION_BANK_PATH)
+BANK_PATH = os.getenv("QUESTION_BANK_PATH", "question_bank.sqlite3")
+
+DIFFICULTIES = ("easy", "medium", "hard")
+
+EMBEDDING_MODEL = "models/embedding-001"
+# A new topic phrasing reuses a banked topic when the keywords mostly overlap,
+# when it is a near spelling of one (e.g. "data scientst"), or, failing that,
+# when their embeddings are this similar. Topics whose keywords differ in a
+# version or level ("Python 2"/"Python 3", "C"/"C++", "Engineer II") are
+# never merged.
+KEYWORD_MATCH_THRESHOLD = 0.75
+FUZZY_MATCH_CUTOFF = 0.85
+EMBEDDING_MATCH_THRESHOLD = 0.92
+
+# Longest a background top-up may hold its topic before another process may retry
+TOP_UP_LEASE_TTL = 300
+
+# Generated items that repeat banked questions are dropped, so a request may
+# come up short; the shortfall is regenerated at most this many times
+MAX_GENERATION_ROUNDS = 3
+
+STOPWORDS = {
+    "a", "an", "and", "the", "of", "in", "on", "for", "to", "with", "about",
+    "basics", "introduction", "intro", "quiz", "questions", "question",
+}
+
+_local = threading.local()
+
+# -------------------- SQLITE STORE --------------------
+def _connect():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(BANK_PATH, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS topics (
+                bank TEXT,
+                topic_key TEXT,
+                topic TEXT,
+                keyword_count INTEGER,
+                embedding BLOB,
+                PRIMARY KEY (bank, topic_key)
+            )
+            """
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS topic_keywords (bank TEXT, keyword TEXT, topic_key TEXT)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS topic_keywords_keyword ON topic_keywords (bank, keyword)")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS questions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                bank TEXT,
+                topic_key TEXT,
+                difficulty TEXT,
+                fingerprint TEXT,
+                item TEXT,
+                created_at REAL,
+                UNIQUE (bank, topic_key, fingerprint)
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS questions_topic ON questions (bank, topic_key, difficulty)")
+        _local.conn = conn
+    return conn
+
+# -------------------- TOPIC INDEX --------------------
+def topic_keywords(topic):
+    words = re.findall(r"[a-z0-9+#]+", topic.lower())
+    return sorted({word for word in words if word not in STOPWORDS}) or sorted(set(words))
+
+def topic_key(topic):
+    """
+    Normalizes a topic so that "Intro to Python Basics" and "python" share a key.
+    """
+    return " ".join(topic_keywords(topic))
+
+def embed_topic(topic):
+    """
+    Returns a unit-length embedding for the topic, or None if the embedding
+    service is unavailable (topic matching then relies on keywords alone).
+    """
+    try:
+        result = llm.embed_content(
+            "question_bank", operation="embed_topic",
+            model=EMBEDDING_MODEL, content=topic, task_type="retrieval_query",
+        )
+    except Exception:
+        return None
+    vector = np.asarray(result["embedding"], dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else None
+
+def _is_qualifier(word):
+    # Versions, levels and symbols: "3", "c++", "c#", "ii"
+    return not word.isalpha() or re.fullmatch(r"[ivx]+", word) is not None
+
+def _differs_in_qualifiers(key, other):
+    """
+    Whether two topic keys differ in a keyword that is a version, level or
+    symbol, which makes them distinct topics however similar they look.
+    """
+    return any(_is_qualifier(word) for word in set(key.split()) ^ set(other.split()))
+
+def _is_respelling(key, other):
+    """
+    Whether `other` is `key` with some words misspelled: the same number of
+    keywords, each equal or (for plain words) a close spelling.
+    """
+    words, other_words = key.split(), other.split()
+    if len(words) != len(other_words):
+        return False
+    for word, other_word in zip(words, other_words):
+        if word == other_word:
+            continue
+        if _is_qualifier(word) or _is_qualifier(other_word):
+            return False
+        if difflib.SequenceMatcher(None, word, other_word).ratio() < FUZZY_MATCH_CUTOFF:
+            return False
+    return True
+
+def _match_by_keywords(conn, bank, keywords):
+    if not keywords:
+        return None
+    placeholders = ",".join("?" * len(keywords))
+    rows = conn.execute(
+        f"""
+        SELECT k.topic_key, COUNT(*), t.keyword_count
+        FROM topic_keywords k JOIN topics t ON t.bank = k.bank AND t.topic_key = k.topic_key
+        WHERE k.bank = ? AND k.keyword IN ({placeholders})
+        GROUP BY k.topic_key
+        """,
+        (bank, *keywords),
+    ).fetchall()
+    best, best_score = None, 0.0
+    for key, shared, count in rows:
+        score = shared / (len(keywords) + count - shared)
+        if score > best_score and not _differs_in_qualifiers(" ".join(keywords), key):
+            best, best_score = key, score
+    return best if best_score >= KEYWORD_MATCH_THRESHOLD else None
+
+def _match_by_spelling(conn, bank, key):
+    keys = [row[0] for row in conn.execute("SELECT topic_key FROM topics WHERE bank = ?", (bank,))]
+    candidates = difflib.get_close_matches(key, keys, n=5, cutoff=FUZZY_MATCH_CUTOFF)
+    return next((candidate for candidate in candidates if _is_respelling(key, candidate)), None)
+
+def _match_by_embedding(conn, bank, key, embedding):
+    rows = [
+        row for row in conn.execute(
+            "SELECT topic_key, embedding FROM topics WHERE bank = ? AND embedding IS NOT NULL", (bank,)
+        )
+        if not _differs_in_qualifiers(key, row[0])
+    ]
+    if embedding is None or not rows:
+        return None
+    matrix = np.frombuffer(b"".join(row[1] for row in rows), dtype=np.float32).reshape(len(rows), -1)
+    if matrix.shape[1] != embedding.shape[0]:
+        return None
+    scores = matrix @ embedding
+    best = int(np.argmax(scores))
+    return rows[best][0] if scores[best] >= EMBEDDING_MATCH_THRESHOLD else None
+
+def resolve_topic(bank, topic):
+    """
+    Maps a topic as typed by the user to the key of an equivalent banked topic,
+    registering it as a new topic if there is none. Exact and keyword matches
+    and near spellings are answered from the local index; the embedding
+    service is only called for phrasings the bank has not seen.
+    """
+    conn = _connect()
+    key = topic_key(topic)
+    if conn.execute("SELECT 1 FROM topics WHERE bank = ? AND topic_key = ?", (bank, key)).fetchone():
+        return key
+    keywords = topic_keywords(topic)
+    match = _match_by_keywords(conn, bank, keywords) or _match_by_spelling(conn, bank, key)
+    if match:
+        return match
+    embedding = embed_topic(topic)
+    match = _match_by_embedding(conn, bank, key, embedding)
+    if match:
+        return match
+    conn.execute(
+        "INSERT OR IGNORE INTO topics (bank, topic_key, topic, keyword_count, embedding) VALUES (?, ?, ?, ?, ?)",
+        (bank, key, topic.strip(), len(keywords), embedding.tobytes() if embedding is not None else None),
+    )
+    conn.executemany(
+        "INSERT INTO topic_keywords (bank, keyword, topic_key) VALUES (?, ?, ?)",
+        [(bank, keyword, key) for keyword in keywords],
+    )
+    return key
+
+def topic_name(bank, key):
+    """
+    The topic as first entered for a resolved key, for display.
+    """
+    row = _connect().execute("SELECT topic FROM topics WHERE bank = ? AND topic_key = ?", (bank, key)).fetchone()
+    return row[0] if row else key
+
+# -------------------- QUESTIONS --------------------
+def question_fingerprint(text):
+    return hashlib.sha1(" ".join(re.findall(r"\w+", text.lower())).encode("utf-8")).hexdigest()
+
+def add_questions(bank, key, items, difficulty, text_field="question"):
+    """
+    Stores generated items (JSON-serializable dicts) under a resolved topic key.
+    Items whose text is already banked for the topic are skipped. Items
+    generated without a difficulty are stored with difficulty None, so they
+    are only served when no difficulty is asked for. Returns the stored items
+    with their bank ids.
+    """
+    conn = _connect()
+    stored = []
+    now = time.time()
+    for item in items:
+        cursor = conn.execute(
+            """
+            INSERT OR IGNORE INTO questions (bank, topic_key, difficulty, fingerprint, item, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (bank, key, difficulty, question_fingerprint(item[text_field]), json.dumps(item), now),
+        )
+        if cursor.rowcount:
+            stored.append({**item, "id": cursor.lastrowid})
+    return stored
+
+def sample_questions(bank, key, count, difficulty=None, exclude=()):
+    """
+    Returns up to `count` random banked items for the topic, skipping the ids
+    in `exclude` (e.g. questions this user has already seen).
+    """
+    exclude = list(exclude)
+    query = "SELECT id, item FROM questions WHERE bank = ? AND topic_key = ?"
+    params = [bank, key]
+    if difficulty:
+        query += " AND difficulty = ?"
+        params.append(difficulty)
+    if exclude:
+        query += f" AND id NOT IN ({','.join('?' * len(exclude))})"
+        params.extend(exclude)
+    query += " ORDER BY random() LIMIT ?"
+    params.append(count)
+    return [{**json.loads(item), "id": question_id} for question_id, item in _connect().execute(query, params)]
+
+def count_questions(bank, key, difficulty=None, exclude=()):
+    exclude = list(exclude)
+    query = "SELECT COUNT(*) FROM questions WHERE bank = ? AND topic_key = ?"
+    params = [bank, key]
+    if difficulty:
+        query += " AND difficulty = ?"
+        params.append(difficulty)
+    if exclude:
+        query += f" AND id NOT IN ({','.join('?' * len(exclude))})"
+        params.extend(exclude)
+    return _connect().execute(query, params).fetchone()[0]
+
+def assemble_questions(bank, topic, count, generate, difficulty=None, exclude=()):
+    """
+    Builds a set of `count` questions for a topic from the bank, calling
+    generate(topic, shortfall, difficulty) only for the questions the bank
+    cannot supply. Newly generated items are banked for later quizzes; items
+    that repeat banked questions are dropped and the remaining shortfall is
+    regenerated, up to MAX_GENERATION_ROUNDS calls. Fewer than `count` items
+    are returned only if the model keeps repeating itself.
+    Returns (items, generated_count).
+    """
+    key = resolve_topic(bank, topic)
+    items = sample_questions(bank, key, count, difficulty, exclude)
+    shortfall = count - len(items)
+    record_cache(f"question_bank:{bank.split(':')[0]}", hit=shortfall <= 0)
+    generated = 0
+    for _ in range(MAX_GENERATION_ROUNDS):
+        if shortfall <= 0:
+            break
+        stored = add_questions(bank, key, generate(topic, shortfall, difficulty), difficulty)
+        items.extend(stored[:shortfall])
+        generated += len(stored)
+        shortfall = count - len(items)
+    return items, generated
+
+def top_up(bank, key, topic, generate, count, difficulty=None):
+    """
+    Generates `count` more items for a resolved topic and banks them. Only
+    one process or thread tops up a topic at a time; returns the number of
+    items stored (0 if another is already topping it up).
+    """
+    lease = f"question_bank:{bank}:{key}"
+    if not acquire_lease(lease, TOP_UP_LEASE_TTL):
+        return 0
+    try:
+        return len(add_questions(bank, key, generate(topic, count, difficulty), difficulty))
+    finally:
+        release_lease(lease)
@@ -1,14 +1,27 @@
 import streamlit as st
-import os
-import google.generativeai as genai
+import io
+import uuid
 from PyPDF2 import PdfReader
 from dotenv import load_dotenv
-import matplotlib.pyplot as plt
+
+import llm
 import numpy as np
 
+from structured_output import (
+    QUIZ_JSON_FORMAT, JSON_GENERATION_CONFIG, JsonArrayStreamParser,
+    validate_quiz_question, parse_json_items, parse_answer_letter, stream_response_text,
+)
+from question_bank import DIFFICULTIES, assemble_questions, resolve_topic, topic_name
+from quiz_analytics import record_attempt, topic_stats, question_difficulty, accuracy_over_time
+from document_index import build_index, file_hash
+from prompt_budget import fit_contexts
+from startup import warm_up
+
 # Load environment variables
 load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+
+# Questions from an uploaded PDF are generated concurrently, one per excerpt
+MAX_CONCURRENT_QUESTIONS = 8
 
 # Quiz Generation Prompt
 quiz_prompt = """Generate {num_questions} multiple-choice questions on {topic}.
@@ -22,12 +35,101 @@ Each question should have 4 options and 1 correct answer. Format:
    Answer: (correct option letter)
 """
 
+# Structured variant: the model returns a JSON array that is parsed as it streams
+# (QUIZ_JSON_FORMAT is appended after formatting since it contains literal braces)
+quiz_json_prompt = (
+    "Generate {num_questions} multiple-choice questions on {topic}.\n"
+    "Each question should have 4 options and 1 correct answer.\n"
+)
+
 def generate_quiz(topic, num_questions):
     # Updated to use "gemini-1.5-pro"
-    model = genai.GenerativeModel("gemini-1.5-pro")
-    response = model.generate_content(quiz_prompt.format(topic=topic, num_questions=num_questions))
+    model = llm.get_model("gemini-1.5-pro")
+    response = llm.generate_content(
+        model, quiz_prompt.format(topic=topic, num_questions=num_questions), tool="quiz"
+    )
     return response.text
 
+def generate_quiz_structured(topic, num_questions, on_question=None, difficulty=None):
+    """
+    Generates a quiz as structured JSON and parses it while it streams, calling
+    on_question(question) as each question completes. If the model ignores the
+    JSON format, the accumulated text is parsed with parse_quiz_response instead
+    of generating again.
+    """
+    prompt = quiz_json_prompt.format(topic=topic, num_questions=num_questions) + QUIZ_JSON_FORMAT
+    if difficulty:
+        prompt += f"\nAll questions should be of {difficulty} difficulty."
+    model = llm.get_model("gemini-1.5-pro")
+    response = llm.generate_content(
+        model,
+        prompt,
+        tool="quiz",
+        operation="generate_structured",
+        generation_config=JSON_GENERATION_CONFIG,
+        stream=True,
+    )
+    parser = JsonArrayStreamParser(validate_quiz_question)
+    questions, raw_text = [], []
+    for text in stream_response_text(response):
+        raw_text.append(text)
+        for question in parser.feed(text):
+            questions.append(question)
+            if on_question:
+                on_question(question)
+    if not questions:
+        full_text = "".join(raw_text)
+        questions = parse_json_items(full_text, validate_quiz_question) or parse_quiz_response(full_text)
+    return questions
+
+# Grounded variant for documents: one question from a few related excerpts
+excerpt_question_prompt = (
+    "Generate 1 multiple-choice question that tests understanding of the following "
+    "excerpts from a document. Use only information stated in the excerpts.\n"
+    "The question should have 4 options and 1 correct answer.\n\n"
+    "Excerpts:\n{excerpts}\n\n"
+)
+
+async def generate_question_from_excerpts(excerpts, difficulty=None):
+    excerpts = fit_contexts(excerpts, "quiz")
+    prompt = excerpt_question_prompt.format(excerpts="\n\n---\n\n".join(excerpts)) + QUIZ_JSON_FORMAT
+    if difficulty:
+        prompt += f"\nThe question should be of {difficulty} difficulty."
+    text = await llm.generate(
+        prompt, generation_config=JSON_GENERATION_CONFIG, tool="quiz", operation="excerpt_question"
+    )
+    return parse_json_items(text, validate_quiz_question)[:1]
+
+@st.cache_resource(max_entries=8, show_spinner="Indexing document...")
+def load_pdf_index(pdf_hash, _pdf_bytes):
+    """
+    Extracts and indexes an uploaded PDF once per file content.
+    """
+    return build_index(extract_text_from_pdf(io.BytesIO(_pdf_bytes)))
+
+def generate_pdf_quiz(index, num_questions, difficulty=None, focus=None, on_question=None):
+    """
+    Generates a quiz from an indexed document. Each question is generated
+    concurrently from a small set of related chunks, so prompt size does not
+    grow with the length of the document. Questions are returned in document
+    order; on_question is called as each one arrives.
+    """
+    contexts = index.sample_contexts(num_questions, focus=focus)
+    if not contexts:
+        return []
+    results = [[] for _ in contexts]
+    generations = [
+        generate_question_from_excerpts([index.chunks[i] for i in context], difficulty) for context in contexts
+    ]
+    for n, questions in llm.iter_completed(generations, limit=MAX_CONCURRENT_QUESTIONS):
+        if isinstance(questions, Exception):
+            raise questions
+        results[n] = questions
+        if on_question:
+            for question in questions:
+                on_question(question)
+    return [question for questions in results for question in questions]
+
 def extract_text_from_pdf(pdf):
     text = ""
     pdf_reader = PdfReader(pdf)
@@ -62,39 +164,126 @@ def parse_quiz_response(response):
         # Check for answer line; use split with maxsplit=1
         elif line.lower().startswith('answer:') and current_question is not None:
             answer_line = line.split(':', 1)[1].strip().lower()
-            if answer_line:
-                # Clean the answer by taking only alphabetic characters.
-                current_question['answer'] = ''.join(filter(str.isalpha, answer_line))[0]
+            # Extract the option letter; lines without one leave the answer empty
+            current_question['answer'] = parse_answer_letter(answer_line)
     if current_question:
         questions.append(current_question)
     
     return questions
 
+def figure_to_png(fig):
+    import matplotlib.pyplot as plt
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", bbox_inches="tight")
+    plt.close(fig)
+    return buf.getvalue()
+
+@st.cache_data(max_entries=256)
+def render_results_chart(correctness):
+    """
+    Score pie and per-question bars for a tuple of correct/incorrect flags,
+    rendered once per result pattern instead of on every rerun.
+    """
+    import matplotlib.pyplot as plt
+
+    correct_count = sum(correctness)
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 5))
+
+    # Pie Chart
+    labels = ['Correct', 'Incorrect']
+    sizes = [correct_count, len(correctness) - correct_count]
+    colors = ['#4CAF50', '#F44336']
+    ax1.pie(sizes, labels=labels, colors=colors, autopct='%1.1f%%', startangle=90)
+    ax1.set_title('Score Distribution')
+
+    # Bar Chart
+    question_numbers = [f'Q{i+1}' for i in range(len(correctness))]
+    bar_colors = [colors[0] if c == 1 else colors[1] for c in correctness]
+    ax2.bar(question_numbers, correctness, color=bar_colors)
+    ax2.set_title('Question-wise Performance')
+    ax2.set_ylim(0, 1)
+    ax2.set_yticks([0, 1])
+    ax2.set_yticklabels(['Incorrect', 'Correct'])
+
+    plt.tight_layout()
+    return figure_to_png(fig)
+
 def quiz_app():
     st.subheader("📝 Quiz Generator")
+    warm_up(llm.SDK_MODULE)
 
     # Choose Input Source
     quiz_source = st.radio("Choose Input Source:", ("Topic Name", "Upload PDF"))
     
     topic = ""
+    pdf_index = None
     if quiz_source == "Topic Name":
         topic = st.text_input("Enter a topic:")
     else:
         uploaded_pdf = st.file_uploader("Upload a PDF", type=["pdf"])
+        focus = st.text_input("Focus on (optional):", help="Draw questions from the parts of the document about this.")
         if uploaded_pdf:
-            topic = extract_text_from_pdf(uploaded_pdf)
+            pdf_bytes = uploaded_pdf.getvalue()
+            pdf_index = load_pdf_index(file_hash(pdf_bytes), pdf_bytes)
+            topic = uploaded_pdf.name if len(pdf_index) else ""
 
     num_questions = st.number_input("Enter number of questions:", min_value=1, max_value=20, value=5)
+    difficulty = st.selectbox("Difficulty:", ("Any",) + tuple(d.title() for d in DIFFICULTIES))
+    difficulty = None if difficulty == "Any" else difficulty.lower()
 
     if st.button("Generate Quiz"):
         if topic.strip():
-            quiz_response = generate_quiz(topic, num_questions)
-            parsed_questions = parse_quiz_response(quiz_response)
+            # Show each question as soon as it has streamed in
+            preview = st.empty()
+            streamed = []
+
+            def show_question(question):
+                streamed.append(question)
+                preview.markdown(
+                    "\n\n".join(f"**Q{i}: {q['question']}**" for i, q in enumerate(streamed, 1))
+                    + "\n\n_Generating more questions..._"
+                )
+
+            if quiz_source == "Topic Name":
+                # Reuse banked questions the user has not seen; generate only the shortfall
+                seen = st.session_state.setdefault('seen_question_ids', set())
+                parsed_questions, generated = assemble_questions(
+                    "quiz", topic, int(num_questions),
+                    lambda topic, count, difficulty: generate_quiz_structured(
+                        topic, count, on_question=show_question, difficulty=difficulty
+                    ),
+                    difficulty=difficulty,
+                    exclude=seen,
+                )
+                seen.update(q['id'] for q in parsed_questions)
+                generated = min(generated, len(parsed_questions))
+                st.caption(
+                    f"{len(parsed_questions) - generated} questions from the question bank, "
+                    f"{generated} newly generated."
+                )
+                if len(parsed_questions) < num_questions:
+                    st.warning(
+                        f"Only {len(parsed_questions)} questions could be found for this topic "
+                        "that you have not already seen."
+                    )
+            else:
+                parsed_questions = generate_pdf_quiz(
+                    pdf_index, int(num_questions), difficulty=difficulty,
+                    focus=focus.strip() or None, on_question=show_question,
+                )
+            preview.empty()
             
             # Initialize session state with parsed questions and reset answers/results
             st.session_state['quiz_data'] = parsed_questions
-            st.session_state['user_answers'] = {}
+            st.session_state['quiz_answers'] = {}
             st.session_state['show_results'] = False
+            st.session_state['attempt_recorded'] = False
+            st.session_state['quiz_difficulty'] = difficulty
+            if quiz_source == "Topic Name":
+                st.session_state['quiz_topic'] = topic_name("quiz", resolve_topic("quiz", topic))
+            else:
+                st.session_state['quiz_topic'] = topic
 
     if 'quiz_data' in st.session_state:
         for idx, question_data in enumerate(st.session_state['quiz_data']):
@@ -116,7 +305,7 @@ def quiz_app():
             new_options = ["Select an answer"] + options
             
             # Retrieve any previously selected answer; if exists, set default index accordingly
-            previous_answer = st.session_state['user_answers'].get(idx, None)
+            previous_answer = st.session_state['quiz_answers'].get(idx, None)
             if previous_answer and previous_answer in option_letters:
                 # Find the index in options corresponding to the previous answer and add 1 for placeholder
                 default_index = options.index(options[option_letters.index(previous_answer)]) + 1
@@ -133,9 +322,9 @@ def quiz_app():
             # Map the user's selected text back to its corresponding option letter, if an option is chosen
             if user_answer_text != "Select an answer":
                 selected_index = options.index(user_answer_text)
-                st.session_state['user_answers'][idx] = option_letters[selected_index].lower().strip()
+                st.session_state['quiz_answers'][idx] = option_letters[selected_index].lower().strip()
             else:
-                st.session_state['user_answers'][idx] = None
+                st.session_state['quiz_answers'][idx] = None
 
         if st.button("Submit Answers"):
             st.session_state['show_results'] = True
@@ -145,7 +334,7 @@ def quiz_app():
             results = []
             
             for idx, question_data in enumerate(st.session_state['quiz_data']):
-                user_ans_letter = st.session_state['user_answers'].get(idx)
+                user_ans_letter = st.session_state['quiz_answers'].get(idx)
                 # If no answer was selected, treat as "No answer"
                 if user_ans_letter is None:
                     user_ans_letter = "No answer"
@@ -170,27 +359,15 @@ def quiz_app():
             st.write(f"❌ Incorrect: {len(results) - correct_count}/{len(results)}")
 
             # Visualization Section
-            fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 5))
-            
-            # Pie Chart
-            labels = ['Correct', 'Incorrect']
-            sizes = [correct_count, len(results) - correct_count]
-            colors = ['#4CAF50', '#F44336']
-            ax1.pie(sizes, labels=labels, colors=colors, autopct='%1.1f%%', startangle=90)
-            ax1.set_title('Score Distribution')
-
-            # Bar Chart
-            question_numbers = [f'Q{i+1}' for i in range(len(results))]
-            correctness = [1 if res['is_correct'] else 0 for res in results]
-            bar_colors = [colors[0] if c == 1 else colors[1] for c in correctness]
-            ax2.bar(question_numbers, correctness, color=bar_colors)
-            ax2.set_title('Question-wise Performance')
-            ax2.set_ylim(0, 1)
-            ax2.set_yticks([0, 1])
-            ax2.set_yticklabels(['Incorrect', 'Correct'])
-            
-            plt.tight_layout()
-            st.pyplot(fig)
+            st.image(render_results_chart(tuple(res['is_correct'] for res in results)))
+
+            if not st.session_state.get('attempt_recorded'):
+                record_attempt(
+                    st.session_state.get('quiz_topic', "Unknown"), results,
+                    difficulty=st.session_state.get('quiz_difficulty'),
+                    session_id=st.session_state.setdefault('analytics_session', uuid.uuid4().hex),
+                )
+                st.session_state['attempt_recorded'] = True
 
             # Detailed Results
             st.subheader("Detailed Breakdown")
@@ -201,7 +378,47 @@ def quiz_app():
                 st.write("Result: " + ("✅ Correct" if result['is_correct'] else "❌ Incorrect"))
                 st.write("---")
 
-if __name__ == "__main__":
+def analytics_app():
+    st.subheader("📊 Quiz Analytics")
+    st.write("Results across every recorded quiz attempt.")
+
+    topics = topic_stats()
+    if not topics:
+        st.info("No quiz attempts have been recorded yet.")
+        return
+
+    st.write("**Accuracy by topic**")
+    st.dataframe(
+        [{**row, "accuracy": f"{row['accuracy']:.0%}"} for row in topics],
+        use_container_width=True,
+    )
+
+    dates, answers, accuracy = accuracy_over_time()
+    st.write("**Daily accuracy**")
+    st.line_chart({"date": dates, "accuracy": accuracy, "answers": answers}, x="date", y="accuracy")
+
+    st.write("**Hardest questions**")
+    topic_filter = st.selectbox("Topic:", ["All topics"] + [row["topic"] for row in topics])
+    min_answers = st.number_input("Minimum answers per question:", min_value=1, value=5)
+    hardest = question_difficulty(
+        topic=None if topic_filter == "All topics" else topic_filter, min_attempts=int(min_answers)
+    )
+    if hardest:
+        st.dataframe(
+            [{**row, "accuracy": f"{row['accuracy']:.0%}"} for row in hardest],
+            use_container_width=True,
+        )
+    else:
+        st.write("No questions have enough answers yet.")
+
+def main():
     st.set_page_config(page_title="Quiz Generator", layout="wide")
     st.title("📝 Quiz Generator with Performance Analytics")
-    quiz_app()
+    page = st.sidebar.radio("Page:", ("Take a Quiz", "Analytics"))
+    if page == "Analytics":
+        analytics_app()
+    else:
+        quiz_app()
+
+if __name__ == "__main__":
+    main()
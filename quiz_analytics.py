@@ -0,0 +1,303 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialized within this process
+    fcntl = None
+
+# Append-only attempt log shared by every server process (override with QUIZ_ANALYTICS_DIR)
+ANALYTICS_DIR = os.getenv("QUIZ_ANALYTICS_DIR", "quiz_analytics")
+
+# One row per answered question; each column is a raw little-endian array file
+COLUMNS = {
+    "timestamp": np.dtype("<f8"),
+    "session": np.dtype("<i8"),
+    "attempt": np.dtype("<i8"),
+    "topic": np.dtype("<i4"),
+    "question": np.dtype("<i4"),
+    "difficulty": np.dtype("<i1"),
+    "correct": np.dtype("<i1"),
+}
+
+# Difficulty codes stored in the "difficulty" column
+DIFFICULTY_CODES = {None: 0, "easy": 1, "medium": 2, "hard": 3}
+
+SECONDS_PER_DAY = 86400
+
+# Bumped when the rollup's layout changes; older saved rollups are rebuilt
+ROLLUP_VERSION = 2
+
+_lock = threading.Lock()
+_dictionaries = {}
+_rollup = None
+
+def _path(name):
+    return os.path.join(ANALYTICS_DIR, name)
+
+class _FileLock:
+    """
+    Exclusive lock across processes (and threads, via _lock) for appends and
+    rollup updates.
+    """
+
+    def __enter__(self):
+        _lock.acquire()
+        os.makedirs(ANALYTICS_DIR, exist_ok=True)
+        self.file = open(_path("log.lock"), "a")
+        if fcntl:
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+        _lock.release()
+
+# -------------------- DICTIONARY ENCODING --------------------
+def _load_dictionary(name):
+    """
+    Returns the (values, ids) of an append-only string dictionary, reading
+    only the entries added since it was last loaded.
+    """
+    values, ids, offset = _dictionaries.get(name, ([], {}, 0))
+    path = _path(f"{name}.jsonl")
+    if os.path.exists(path) and os.path.getsize(path) > offset:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Entry still being written by another process
+                offset += len(line)
+                value = json.loads(line)
+                ids[value] = len(values)
+                values.append(value)
+    _dictionaries[name] = (values, ids, offset)
+    return values, ids
+
+def _encode(name, values):
+    """
+    Maps strings to stable integer ids, appending unseen ones. Must be called
+    while holding the file lock.
+    """
+    known, ids = _load_dictionary(name)
+    new = [value for value in dict.fromkeys(values) if value not in ids]
+    if new:
+        with open(_path(f"{name}.jsonl"), "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(value) + "\n" for value in new))
+        known, ids = _load_dictionary(name)
+    return [ids[value] for value in values]
+
+def decode(name, codes):
+    values, _ = _load_dictionary(name)
+    return [values[code] for code in codes]
+
+# -------------------- LOG --------------------
+def _row_count():
+    counts = [
+        os.path.getsize(_path(f"{column}.bin")) // dtype.itemsize if os.path.exists(_path(f"{column}.bin")) else 0
+        for column, dtype in COLUMNS.items()
+    ]
+    return min(counts)
+
+def _stable_id(value):
+    # Unlike hash(), stable across processes
+    return int.from_bytes(hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).digest(), "little", signed=True)
+
+def record_attempt(topic, results, difficulty=None, session_id=None):
+    """
+    Appends one quiz attempt to the log. `results` is a list of
+    {'question': text, 'is_correct': bool} dicts, one per question.
+    """
+    if not results:
+        return
+    n = len(results)
+    now = time.time()
+    with _FileLock():
+        # A crash between column writes leaves columns of different lengths;
+        # trim them back to the last complete row before appending
+        rows = _row_count()
+        for column, dtype in COLUMNS.items():
+            path = _path(f"{column}.bin")
+            if os.path.exists(path) and os.path.getsize(path) > rows * dtype.itemsize:
+                os.truncate(path, rows * dtype.itemsize)
+        topic_id = _encode("topics", [topic])[0]
+        data = {
+            "timestamp": np.full(n, now),
+            "session": np.full(n, _stable_id(session_id) if session_id is not None else 0),
+            "attempt": np.full(n, time.time_ns()),
+            "topic": np.full(n, topic_id),
+            "question": _encode("questions", [result["question"] for result in results]),
+            "difficulty": np.full(n, DIFFICULTY_CODES.get(difficulty, 0)),
+            "correct": [bool(result["is_correct"]) for result in results],
+        }
+        for column, dtype in COLUMNS.items():
+            with open(_path(f"{column}.bin"), "ab") as f:
+                f.write(np.asarray(data[column], dtype=dtype).tobytes())
+
+def read_columns(columns, start=0):
+    """
+    Reads the given columns for rows [start, end) of the log as numpy arrays,
+    where end is the number of complete rows.
+    """
+    end = _row_count()
+    arrays = {}
+    for column in columns:
+        dtype = COLUMNS[column]
+        if end <= start:
+            arrays[column] = np.empty(0, dtype=dtype)
+            continue
+        arrays[column] = np.fromfile(
+            _path(f"{column}.bin"), dtype=dtype, count=end - start, offset=start * dtype.itemsize
+        )
+    return arrays, end
+
+# -------------------- ROLLUPS --------------------
+def _empty_rollup():
+    return {
+        "version": ROLLUP_VERSION,
+        "rows": 0,
+        # Questions are counted per (topic, question text): the same text
+        # asked under two topics is two questions. Keys are topic << 32 | question.
+        "question_keys": np.zeros(0, np.int64),
+        "question_attempts": np.zeros(0, np.int64),
+        "question_correct": np.zeros(0, np.int64),
+        "topic_attempts": np.zeros(0, np.int64),
+        "topic_correct": np.zeros(0, np.int64),
+        "topic_quizzes": np.zeros(0, np.int64),
+        "days": np.zeros(0, np.int64),
+        "day_attempts": np.zeros(0, np.int64),
+        "day_correct": np.zeros(0, np.int64),
+    }
+
+def _add_counts(totals, ids, weights=None):
+    counts = np.bincount(ids, weights=weights, minlength=len(totals)).astype(np.int64)
+    counts[:len(totals)] += totals
+    return counts
+
+def _merge_by_key(keys, attempts, correct, new_keys, new_correct):
+    """
+    Adds rows (one answer each) to per-key totals; returns the merged
+    (keys, attempts, correct), sorted by key.
+    """
+    all_keys = np.concatenate([keys, new_keys])
+    all_attempts = np.concatenate([attempts, np.ones(len(new_keys), np.int64)])
+    all_correct = np.concatenate([correct, new_correct.astype(np.int64)])
+    unique_keys, inverse = np.unique(all_keys, return_inverse=True)
+    return (
+        unique_keys,
+        np.bincount(inverse, weights=all_attempts).astype(np.int64),
+        np.bincount(inverse, weights=all_correct).astype(np.int64),
+    )
+
+def _merge_rollup(rollup, rows, end):
+    question, topic, correct = rows["question"], rows["topic"], rows["correct"].astype(np.float64)
+    question_keys = (topic.astype(np.int64) << 32) | question.astype(np.int64)
+    rollup["question_keys"], rollup["question_attempts"], rollup["question_correct"] = _merge_by_key(
+        rollup["question_keys"], rollup["question_attempts"], rollup["question_correct"], question_keys, correct
+    )
+    rollup["topic_attempts"] = _add_counts(rollup["topic_attempts"], topic)
+    rollup["topic_correct"] = _add_counts(rollup["topic_correct"], topic, correct)
+    # Rows of one quiz share an attempt id, so distinct attempts count quizzes
+    attempts, first = np.unique(rows["attempt"], return_index=True)
+    rollup["topic_quizzes"] = _add_counts(rollup["topic_quizzes"], topic[first])
+
+    days = (rows["timestamp"] // SECONDS_PER_DAY).astype(np.int64)
+    rollup["days"], rollup["day_attempts"], rollup["day_correct"] = _merge_by_key(
+        rollup["days"], rollup["day_attempts"], rollup["day_correct"], days, correct
+    )
+    rollup["rows"] = end
+    return rollup
+
+def get_rollup():
+    """
+    Returns the aggregate counts over the whole log. The rollup is kept in
+    memory and on disk with the number of rows it covers, so each call only
+    reads and aggregates the rows appended since.
+    """
+    global _rollup
+    with _lock:
+        rollup = _rollup
+    if rollup is None and os.path.exists(_path("rollup.npz")):
+        with np.load(_path("rollup.npz")) as saved:
+            if "version" in saved.files and int(saved["version"]) == ROLLUP_VERSION:
+                rollup = {key: saved[key] for key in saved.files}
+                rollup["rows"] = int(rollup["rows"])
+    if rollup is None:
+        rollup = _empty_rollup()
+    if _row_count() > rollup["rows"]:
+        rows, end = read_columns(("timestamp", "attempt", "topic", "question", "correct"), start=rollup["rows"])
+        rollup = _merge_rollup(dict(rollup), rows, end)
+        with _FileLock():
+            on_disk = 0
+            if os.path.exists(_path("rollup.npz")):
+                with np.load(_path("rollup.npz")) as saved:
+                    # A rollup of an older layout is replaced whatever it covers
+                    if "version" in saved.files and int(saved["version"]) == ROLLUP_VERSION:
+                        on_disk = int(saved["rows"])
+            if rollup["rows"] > on_disk:
+                tmp_path = _path(f"rollup.{os.getpid()}.tmp.npz")
+                np.savez(tmp_path, **rollup)
+                os.replace(tmp_path, _path("rollup.npz"))
+    with _lock:
+        if _rollup is None or rollup["rows"] > _rollup["rows"]:
+            _rollup = rollup
+        return _rollup
+
+# -------------------- QUERIES --------------------
+def topic_stats():
+    """
+    Per-topic totals: topic, quizzes, answers, accuracy. Sorted by answers.
+    """
+    rollup = get_rollup()
+    attempts = rollup["topic_attempts"]
+    active = np.flatnonzero(attempts)
+    accuracy = rollup["topic_correct"][active] / attempts[active]
+    order = np.argsort(-attempts[active], kind="stable")
+    topics = decode("topics", active[order])
+    return [
+        {"topic": topic, "quizzes": int(quizzes), "answers": int(answers), "accuracy": float(acc)}
+        for topic, quizzes, answers, acc in zip(
+            topics, rollup["topic_quizzes"][active][order], attempts[active][order], accuracy[order]
+        )
+    ]
+
+def question_difficulty(topic=None, min_attempts=5, limit=20):
+    """
+    The hardest questions by observed accuracy, optionally for one topic.
+    Questions with fewer than `min_attempts` answers are left out.
+    """
+    rollup = get_rollup()
+    attempts = rollup["question_attempts"]
+    question_topics = rollup["question_keys"] >> 32
+    mask = attempts >= max(min_attempts, 1)
+    if topic is not None:
+        _, topic_ids = _load_dictionary("topics")
+        if topic not in topic_ids:
+            return []
+        mask &= question_topics == topic_ids[topic]
+    candidates = np.flatnonzero(mask)
+    accuracy = rollup["question_correct"][candidates] / attempts[candidates]
+    order = np.argsort(accuracy, kind="stable")[:limit]
+    questions = decode("questions", rollup["question_keys"][candidates[order]] & 0xFFFFFFFF)
+    topics = decode("topics", question_topics[candidates[order]])
+    return [
+        {"question": question, "topic": t, "answers": int(n), "accuracy": float(acc)}
+        for question, t, n, acc in zip(questions, topics, attempts[candidates[order]], accuracy[order])
+    ]
+
+def accuracy_over_time():
+    """
+    Daily answers and accuracy as (dates, answers, accuracy) arrays.
+    """
+    rollup = get_rollup()
+    dates = (rollup["days"] * SECONDS_PER_DAY).astype("datetime64[s]").astype("datetime64[D]")
+    answers = rollup["day_attempts"]
+    accuracy = np.divide(rollup["day_correct"], answers, out=np.zeros(len(answers)), where=answers > 0)
+    return dates, answers, accuracy
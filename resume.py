@@ -1,29 +1,41 @@
 import os
+import io
 import re
-import spacy
+import base64
+import threading
 import streamlit as st
 from PyPDF2 import PdfReader
-import google.generativeai as genai
 from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
-gemini_api_key = os.getenv("GOOGLE_API_KEY")
+import llm
+from metrics import record_event
+from prompt_budget import fit_context
+from job_queue import report_progress
+from job_ui import submit_tracked_job, wait_for_job
+from startup import warm_up
 
-if not gemini_api_key:
-    st.error("Gemini API key not found in .env file. Please add GEMINI_API_KEY to your .env file.")
-    st.stop()
+# Load environment variables from .env file (the model client reads GOOGLE_API_KEY)
+load_dotenv()
 
-# Configure GenAI with the API key from the .env file
-genai.configure(api_key=gemini_api_key)
+_nlp = None
+_nlp_lock = threading.Lock()
 
-# Ensure the spaCy model is available
-try:
-    nlp = spacy.load("en_core_web_sm")
-except OSError:
-    import spacy.cli
-    spacy.cli.download("en_core_web_sm")
-    nlp = spacy.load("en_core_web_sm")
+def get_nlp():
+    """
+    The spaCy pipeline, loaded on first use rather than at import since it
+    takes seconds (and downloads en_core_web_sm if it is missing).
+    """
+    global _nlp
+    with _nlp_lock:
+        if _nlp is None:
+            import spacy
+            try:
+                _nlp = spacy.load("en_core_web_sm")
+            except OSError:
+                import spacy.cli
+                spacy.cli.download("en_core_web_sm")
+                _nlp = spacy.load("en_core_web_sm")
+    return _nlp
 
 # Function to extract text from a PDF file-like object
 def extract_text_from_pdf_file(file_obj):
@@ -37,60 +49,116 @@ def extract_text_from_pdf_file(file_obj):
 def clean_text(text):
     text = re.sub(r'[^a-zA-Z0-9\s]', '', text)
     text = text.lower()
-    doc = nlp(text)
+    doc = get_nlp()(text)
     tokens = [token.lemma_ for token in doc if not token.is_stop]
     return " ".join(tokens)
 
-# Function to rank resumes using GenAI
+def parse_rating(text):
+    """
+    Extracts a 0-10 rating from replies such as "8", "8.5/10" or "Rating: 7".
+    Returns None if there is no rating in range.
+    """
+    match = re.search(r"\d+(?:\.\d+)?", text)
+    if not match:
+        return None
+    rating = float(match.group())
+    return rating if 0 <= rating <= 10 else None
+
+# Function to rank resumes using GenAI. Returns (ranking, unrated): resumes
+# whose rating could not be parsed are left out of the ranking and listed in
+# `unrated` with the model's reply, rather than being scored 0.
 def rank_resumes_with_genai(job_description, uploaded_files):
     ranked_resumes = []
-    model = genai.GenerativeModel("gemini-1.5-pro")
-    
+    unrated = []
+    names, prompts = [], []
+    job_context = fit_context(job_description, "job_description")
     for uploaded_file in uploaded_files:
         if uploaded_file.name.endswith(".pdf"):
             raw_text = extract_text_from_pdf_file(uploaded_file)
-            resume_text = clean_text(raw_text)
+            # Long resumes are cut to the sentences most relevant to the job
+            # before the spaCy pass, which then has less text to process
+            resume_text = clean_text(fit_context(raw_text, "resume", query=job_context))
             # Construct prompt for GenAI
-            prompt = (
-                f"Job Description:\n{job_description}\n\n"
+            names.append(uploaded_file.name)
+            prompts.append(
+                f"Job Description:\n{job_context}\n\n"
                 f"Resume:\n{resume_text}\n\n"
                 "On a scale of 1 to 10, where 10 is a perfect match, "
                 "please rate the suitability of this resume for the job description. "
                 "Provide only the numerical rating."
             )
-            response = model.generate_content(prompt)
-            # Try to extract the first float number from the response
-            try:
-                rating = float(response.text.strip().split()[0])
-            except Exception as e:
-                rating = 0.0  # Default to 0 if parsing fails
-            ranked_resumes.append((uploaded_file.name, rating))
+
+    # Rate all resumes concurrently
+    ratings = llm.iter_completed(llm.generate(prompt, tool="resume", operation="rate") for prompt in prompts)
+    for done, (i, text) in enumerate(ratings, 1):
+        if isinstance(text, Exception):
+            raise text
+        report_progress(0.1 + 0.9 * done / len(prompts), f"Rated {names[i]}")
+        rating = parse_rating(text)
+        if rating is None:
+            record_event("resume", "unparsed_rating", resume=names[i], reply=text[:200])
+            unrated.append((names[i], text.strip()))
+        else:
+            ranked_resumes.append((names[i], rating))
     
     # Sort resumes descending by rating
     ranked_resumes = sorted(ranked_resumes, key=lambda x: x[1], reverse=True)
-    return ranked_resumes
+    return ranked_resumes, unrated
 
 # Function to summarize job description using GenAI
 def summarize_job_description(job_description):
-    model = genai.GenerativeModel("gemini-1.5-pro")
-    response = model.generate_content(job_description)
+    model = llm.get_model("gemini-1.5-pro")
+    response = llm.generate_content(
+        model, fit_context(job_description, "job_description"), tool="resume", operation="summarize_job"
+    )
     return response.text if hasattr(response, "text") else "No summary available."
 
+# Background job: summarize the job description and rank the resumes.
+# Resumes arrive as {"name": ..., "data": <base64 PDF bytes>} so they can be queued.
+def rank_resumes_job(job_description, resumes):
+    files = []
+    for resume in resumes:
+        file_obj = io.BytesIO(base64.b64decode(resume["data"]))
+        file_obj.name = resume["name"]
+        files.append(file_obj)
+    report_progress(0.05, "Summarizing job description")
+    summary = summarize_job_description(job_description)
+    ranking, unrated = rank_resumes_with_genai(job_description, files)
+    return {"summary": summary, "ranking": ranking, "unrated": unrated}
+
 # Streamlit UI
-st.title("AI-powered Resume Screening and Ranking System")
+def main():
+    if not os.getenv("GOOGLE_API_KEY"):
+        st.error("Gemini API key not found in .env file. Please add GEMINI_API_KEY to your .env file.")
+        st.stop()
+    warm_up(llm.SDK_MODULE, get_nlp)
+
+    st.title("AI-powered Resume Screening and Ranking System")
 
-job_desc = st.text_area("Enter Job Description")
-uploaded_files = st.file_uploader("Upload Resume PDFs", type=["pdf"], accept_multiple_files=True)
+    job_desc = st.text_area("Enter Job Description")
+    uploaded_files = st.file_uploader("Upload Resume PDFs", type=["pdf"], accept_multiple_files=True)
 
-if st.button("Rank Resumes"):
-    if job_desc and uploaded_files:
-        summary = summarize_job_description(job_desc)
+    if st.button("Rank Resumes"):
+        if job_desc and uploaded_files:
+            resumes = [
+                {"name": f.name, "data": base64.b64encode(f.getvalue()).decode("ascii")}
+                for f in uploaded_files
+            ]
+            submit_tracked_job("ranking_job", "resume:rank_resumes_job", job_desc, resumes)
+        else:
+            st.error("Please enter a valid job description and upload at least one resume PDF.")
+
+    # Ranking runs in the background job queue and survives reruns and page reloads
+    job = wait_for_job("ranking_job", "Ranking resumes")
+    if job:
         st.subheader("Job Description Summary:")
-        st.write(summary)
-        
-        results = rank_resumes_with_genai(job_desc, uploaded_files)
+        st.write(job["result"]["summary"])
+
         st.subheader("Ranked Resumes:")
-        for rank, (filename, score) in enumerate(results, 1):
+        for rank, (filename, score) in enumerate(job["result"]["ranking"], 1):
             st.write(f"{rank}. {filename} - Score: {score:.2f}")
-    else:
-        st.error("Please enter a valid job description and upload at least one resume PDF.")
+        for filename, reply in job["result"].get("unrated", []):
+            st.warning(f"{filename} could not be scored; the model replied: {reply[:200]!r}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import argparse
+import importlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# The Streamlit entry points, for the startup profile
+APPS = (
+    "app", "chatpdf", "dashboard", "demo", "falshcard", "game", "interview",
+    "notes", "pathGenerator", "quiz", "resume", "summerizer", "launcher",
+)
+
+# Set WARM_UP=0 to turn background warm-up off (the profile does, so that
+# import times are not inflated by a warm-up running alongside)
+WARM_UP_ENABLED = os.getenv("WARM_UP", "1") != "0"
+
+_warm_lock = threading.Lock()
+_warmed = set()
+# Seconds each warm-up target took, or the error it raised
+warm_up_results = {}
+
+# -------------------- WARM-UP --------------------
+def _target_name(target):
+    return target if isinstance(target, str) else f"{target.__module__}.{target.__qualname__}"
+
+def _run_warm_up(targets):
+    for target in targets:
+        start = time.perf_counter()
+        try:
+            if isinstance(target, str):
+                importlib.import_module(target)
+            else:
+                target()
+            warm_up_results[_target_name(target)] = time.perf_counter() - start
+        except Exception as e:
+            # The page's own call will report it
+            warm_up_results[_target_name(target)] = repr(e)
+
+def warm_up(*targets):
+    """
+    Imports modules (given by name) and calls loader functions on a
+    background thread, each once per process. Apps call this as their page
+    renders with what their actions will need, so heavy libraries are loaded
+    while the user reads the page instead of when they click. Returns the
+    thread, or None if there was nothing left to warm up.
+    """
+    if not WARM_UP_ENABLED:
+        return None
+    with _warm_lock:
+        pending = [target for target in targets if _target_name(target) not in _warmed]
+        _warmed.update(_target_name(target) for target in pending)
+    if not pending:
+        return None
+    thread = threading.Thread(target=_run_warm_up, args=(pending,), name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+# -------------------- PROFILE --------------------
+def parse_importtime(output, module):
+    """
+    Returns (total seconds, [(name, seconds)]) for `module` and its direct
+    imports from `python -X importtime` output. Modules that an earlier
+    import already loaded do not appear.
+    """
+    children, total = [], None
+    for line in output.splitlines():
+        if not line.startswith("import time:") or line.endswith("| package"):
+            continue
+        _, cumulative, name = line.split("|", 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            children.append((name.strip(), int(cumulative) / 1e6))
+        elif depth == 0:
+            if name.strip() == module:
+                total = int(cumulative) / 1e6
+                break
+            children = []
+    return total, sorted(children, key=lambda child: -child[1])
+
+def profile_import(module):
+    """
+    Imports `module` in a fresh interpreter, as on a cold start.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_DIR, env={**os.environ, "WARM_UP": "0"}, capture_output=True, text=True,
+    )
+    if result.returncode:
+        return {"error": result.stderr.strip().splitlines()[-1]}
+    total, children = parse_importtime(result.stderr, module)
+    return {"import_seconds": total, "imports": children}
+
+RENDER_SCRIPT = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file(sys.argv[1], default_timeout=120)
+start = time.perf_counter()
+app.run()
+print(json.dumps({"seconds": time.perf_counter() - start, "error": [e.message for e in app.exception]}))
+"""
+
+def profile_render(module):
+    """
+    Time until the first page of the app has rendered in a fresh
+    interpreter, including its imports (Streamlit itself excluded).
+    """
+    result = subprocess.run(
+        [sys.executable, "-c", RENDER_SCRIPT, os.path.join(REPO_DIR, f"{module}.py")],
+        cwd=REPO_DIR, capture_output=True, text=True,
+    )
+    try:
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+    except (IndexError, json.JSONDecodeError):
+        return {"render_error": (result.stderr.strip().splitlines() or ["no output"])[-1]}
+    if report["error"]:
+        return {"render_seconds": report["seconds"], "render_error": report["error"][0].splitlines()[0]}
+    return {"render_seconds": report["seconds"]}
+
+def main():
+    parser = argparse.ArgumentParser(description="Report import and first-render times of the Streamlit apps")
+    parser.add_argument("apps", nargs="*", default=list(APPS))
+    parser.add_argument("--render", action="store_true", help="Also time the first render of each app")
+    parser.add_argument("--top", type=int, default=5, help="Heaviest direct imports to list per app")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    report = {}
+    for app in args.apps:
+        report[app] = profile_import(app)
+        if args.render:
+            report[app].update(profile_render(app))
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{'app':<15} {'import s':>9} {'render s':>9}  heaviest imports")
+    for app, result in report.items():
+        if "error" in result:
+            print(f"{app:<15} {'-':>9} {'-':>9}  {result['error']}")
+            continue
+        render = f"{result['render_seconds']:.2f}" if "render_seconds" in result else "-"
+        heaviest = ", ".join(f"{name} {seconds:.2f}" for name, seconds in result["imports"][:args.top])
+        print(f"{app:<15} {result['import_seconds']:>9.2f} {render:>9}  {heaviest}")
+        if "render_error" in result:
+            print(f"{'':<15} render failed: {result['render_error']}")
+
+if __name__ == "__main__":
+    main()
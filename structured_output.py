@@ -0,0 +1,220 @@
+import json
+import re
+
+# -------------------- PROMPT SCHEMAS --------------------
+QUIZ_JSON_FORMAT = (
+    "Respond with a JSON array only. Each element must be an object of the form "
+    '{"question": "<question text>", "options": ["<option a>", "<option b>", "<option c>", "<option d>"], '
+    '"answer": "<a, b, c or d>"}.'
+)
+
+FLASHCARD_JSON_FORMAT = (
+    "Respond with a JSON array only. Each element must be an object of the form "
+    '{"question": "<question>", "answer": "<concise answer>"}.'
+)
+
+INTERVIEW_JSON_FORMAT = (
+    "Respond with a JSON array only. Each element must be an object of the form "
+    '{"question": "<interview question>"}.'
+)
+
+# Generation config asking Gemini for raw JSON instead of Markdown-wrapped text
+JSON_GENERATION_CONFIG = {"response_mime_type": "application/json"}
+
+# -------------------- VALIDATORS --------------------
+def parse_answer_letter(answer, options=()):
+    """
+    Extracts the option letter from answers such as "b", "B)", "Answer: c" or
+    the option text itself. Returns "" if no letter can be found.
+    """
+    answer = str(answer).strip()
+    lowered = re.sub(r"^\s*(?:answer|option)\s*[:\-]?\s*", "", answer.lower())
+    match = re.match(r"\(?([a-d])\b", lowered)
+    if match:
+        return match.group(1)
+    for letter, option in zip("abcd", options):
+        if option and option.lower() == answer.lower():
+            return letter
+    return ""
+
+def validate_quiz_question(item):
+    """
+    Normalizes a quiz question to the format used by quiz.py:
+    {'question', 'options': ['a) ...', ...], 'answer': 'a'}.
+    Returns None if the item is malformed.
+    """
+    if not isinstance(item, dict):
+        return None
+    question = str(item.get("question", "")).strip()
+    options = item.get("options")
+    if not question or not isinstance(options, list) or len(options) != 4:
+        return None
+    # Drop any "a)" / "A." prefixes the model added itself
+    options = [re.sub(r"^\s*[a-dA-D][).:]\s*", "", str(option)).strip() for option in options]
+    answer = parse_answer_letter(item.get("answer", ""), options)
+    if not answer:
+        return None
+    return {
+        "question": question,
+        "options": [f"{letter}) {text}" for letter, text in zip("abcd", options)],
+        "answer": answer,
+    }
+
+def validate_flashcard(item):
+    """
+    Returns a (question, answer) tuple, or None if the item is malformed.
+    """
+    if not isinstance(item, dict):
+        return None
+    question = str(item.get("question", "")).strip()
+    answer = str(item.get("answer", "")).strip()
+    return (question, answer) if question and answer else None
+
+# Numbering or bullets a model puts before a question: "1.", "2)", "-", "Q3:", "**"
+QUESTION_PREFIX = re.compile(r"^\s*(?:(?:q(?:uestion)?\s*)?\d+\s*[.):]|[-*\u2022#]+)\s*", re.IGNORECASE)
+
+def clean_question(text):
+    """
+    Strips numbering, bullets and Markdown emphasis from a question.
+    """
+    text = str(text).strip()
+    while True:
+        stripped = QUESTION_PREFIX.sub("", text, count=1).strip("*_ \t")
+        if stripped == text:
+            return text
+        text = stripped
+
+def validate_interview_question(item):
+    """
+    Returns the question text of an interview question item (an object with
+    "question", or a bare string), or None if it is empty.
+    """
+    if isinstance(item, dict):
+        item = item.get("question", "")
+    if not isinstance(item, str):
+        return None
+    return clean_question(item) or None
+
+# -------------------- PARSERS --------------------
+def strip_code_fence(text):
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        if text.rstrip().endswith("```"):
+            text = text.rstrip()[:-3]
+    return text.strip()
+
+def parse_json_items(text, validate):
+    """
+    Parses a complete JSON array response in one pass and keeps the items that
+    pass `validate`. Returns an empty list if the text is not a JSON array.
+    """
+    try:
+        data = json.loads(strip_code_fence(text))
+    except json.JSONDecodeError:
+        return []
+    if isinstance(data, dict):
+        # Some responses wrap the array, e.g. {"questions": [...]}
+        data = next((value for value in data.values() if isinstance(value, list)), [])
+    if not isinstance(data, list):
+        return []
+    items = [validate(item) for item in data]
+    return [item for item in items if item is not None]
+
+def parse_json_object(text, validate):
+    """
+    Parses a complete JSON object response and returns validate(object), or
+    None if the text is not a JSON object.
+    """
+    try:
+        data = json.loads(strip_code_fence(text))
+    except json.JSONDecodeError:
+        return None
+    return validate(data) if isinstance(data, dict) else None
+
+class JsonArrayStreamParser:
+    """
+    Incremental parser for a streamed JSON array of objects. feed() takes the
+    next chunk of text and returns the validated objects completed by it, so
+    callers can show each item as soon as it has arrived. Every character is
+    scanned once.
+
+    Items are the objects directly inside an array, so an array wrapped in an
+    object (e.g. {"questions": [...]}) streams like a bare one. A response
+    that is a single object with no such items is returned as one item.
+    """
+
+    def __init__(self, validate):
+        self.validate = validate
+        self.buffer = ""
+        self.pos = 0
+        # Open brackets, innermost last
+        self.stack = []
+        # Start and nesting depth of the item being read
+        self.start = None
+        self.item_depth = None
+        # Start of an object at the top level, and whether items came from it
+        self.top_start = None
+        self.emitted = False
+        self.in_string = False
+        self.escaped = False
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        items = []
+        while self.pos < len(self.buffer):
+            ch = self.buffer[self.pos]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch in "[{":
+                if ch == "{" and self.start is None and self.stack and self.stack[-1] == "[":
+                    self.start, self.item_depth = self.pos, len(self.stack)
+                elif ch == "{" and not self.stack:
+                    self.top_start = self.pos
+                self.stack.append(ch)
+            elif ch in "]}" and self.stack:
+                self.stack.pop()
+                if self.start is not None and len(self.stack) == self.item_depth:
+                    items.extend(self._complete(self.start))
+                    self.start = None
+                elif ch == "}" and not self.stack and self.top_start is not None and not self.emitted:
+                    items.extend(self._complete(self.top_start))
+            self.pos += 1
+        return items
+
+    def _complete(self, start):
+        item = self._decode(self.buffer[start:self.pos + 1])
+        # Completed objects are no longer needed
+        self.buffer = self.buffer[self.pos + 1:]
+        self.pos = -1
+        self.top_start = None
+        if item is None:
+            return []
+        self.emitted = True
+        return [item]
+
+    def _decode(self, text):
+        try:
+            return self.validate(json.loads(text))
+        except json.JSONDecodeError:
+            return None
+
+def stream_response_text(response):
+    """
+    Yields the text of each chunk of a streamed generate_content response,
+    skipping chunks without text (e.g. safety or finish markers).
+    """
+    for chunk in response:
+        try:
+            text = chunk.text
+        except Exception:
+            continue
+        if text:
+            yield text
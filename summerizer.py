@@ -1,14 +1,14 @@
 import streamlit as st
 import re
-from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled, NoTranscriptFound
-import google.generativeai as genai
 from dotenv import load_dotenv
-from fpdf import FPDF
-import os
 
-# Load environment variables and configure the API key for Google Generative AI
+import llm
+from pdf_renderer import render_pdf, add_title, get_font_family, pdf_text
+from prompt_budget import fit_context
+from startup import warm_up
+
+# Load environment variables (the model client reads GOOGLE_API_KEY)
 load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 
 # Function to extract YouTube video ID from URL
 def extract_video_id(url):
@@ -18,6 +18,8 @@ def extract_video_id(url):
 
 # Function to fetch transcript using youtube_transcript_api
 def fetch_transcript(youtube_url):
+    from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled, NoTranscriptFound
+
     video_id = extract_video_id(youtube_url)
     if not video_id:
         return None, "Invalid YouTube URL."
@@ -36,13 +38,12 @@ def fetch_transcript(youtube_url):
 
 # Function to generate key point summary using Google Generative AI
 def generate_summary(transcript):
-    MAX_LENGTH = 3000  # Truncate transcript to limit token usage
-    if len(transcript) > MAX_LENGTH:
-        transcript = transcript[:MAX_LENGTH] + "..."
+    # Long transcripts are cut to their most representative passages to limit token usage
+    transcript = fit_context(transcript, "summarizer")
     prompt = f"Summarize the following YouTube video transcript into concise key bullet points in English:\n\n{transcript}"
-    model = genai.GenerativeModel("gemini-1.5-pro")
+    model = llm.get_model("gemini-1.5-pro")
     try:
-        response = model.generate_content(prompt)
+        response = llm.generate_content(model, prompt, tool="summarizer")
         # Debug info: If no text is returned, show a message to help with troubleshooting.
         if not response.text:
             st.error("Debug Info: Model response was empty. Check your API key, model configuration, or try shortening the transcript.")
@@ -51,22 +52,18 @@ def generate_summary(transcript):
     except Exception as e:
         return None, f"Error generating summary: {str(e)}"
 
-# Function to generate a PDF from the summary text
+# Function to generate a PDF (as bytes) from the summary text
 def generate_pdf(summary):
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", "B", 16)
-    pdf.cell(0, 10, "YouTube Video Key Points", ln=True, align="C")
-    pdf.ln(10)
-    pdf.set_font("Arial", "", 12)
-    pdf.multi_cell(0, 10, summary)
-    pdf_file = "youtube_summary.pdf"
-    pdf.output(pdf_file)
-    return pdf_file
+    def layout(pdf):
+        add_title(pdf, "YouTube Video Key Points")
+        pdf.set_font(get_font_family(), "", 12)
+        pdf.multi_cell(0, 10, pdf_text(summary))
+    return render_pdf(layout, summary)
 
 # Main Streamlit UI
 def main():
     st.title("YouTube Video Summarizer")
+    warm_up(llm.SDK_MODULE, "youtube_transcript_api")
     youtube_url = st.text_input("Enter YouTube Video URL:")
 
     if youtube_url:
@@ -99,12 +96,11 @@ def main():
 
         st.subheader("Key Points:")
         st.write(summary)
-        st.session_state["summary"] = summary
+        st.session_state["key_points"] = summary
 
-    if st.button("Download Summary as PDF") and "summary" in st.session_state:
-        pdf_file = generate_pdf(st.session_state["summary"])
-        with open(pdf_file, "rb") as f:
-            st.download_button("Download PDF", f, file_name="youtube_summary.pdf")
+    if st.button("Download Summary as PDF") and "key_points" in st.session_state:
+        pdf_bytes = generate_pdf(st.session_state["key_points"])
+        st.download_button("Download PDF", pdf_bytes, file_name="youtube_summary.pdf", mime="application/pdf")
 
 if __name__ == "__main__":
     main()